@@ -2,22 +2,24 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import customtkinter as ctk
 from sqlalchemy.orm import Session
-from database import init_db, get_session
+from database import init_db
+from ejecutor_db import EjecutorDB
 from models import Ingrediente, Menu, Cliente, Pedido
 from crud.ingrediente_crud import (
-    crear_ingrediente, listar_ingredientes, actualizar_ingrediente, eliminar_ingrediente
+    crear_ingrediente, listar_ingredientes, actualizar_ingrediente, eliminar_ingrediente, buscar_ingredientes
 )
 from crud.menu_crud import (
-    crear_menu, listar_menus, actualizar_menu, eliminar_menu, obtener_ingredientes_menu
+    crear_menu, listar_menus, actualizar_menu, eliminar_menu, obtener_ingredientes_menu, buscar_menus
 )
 from crud.cliente_crud import (
-    crear_cliente, listar_clientes, actualizar_cliente, eliminar_cliente
+    crear_cliente, listar_clientes, actualizar_cliente, eliminar_cliente, buscar_clientes
 )
 from crud.pedido_crud import (
-    crear_pedido, listar_pedidos, listar_pedidos_por_cliente, eliminar_pedido
+    crear_pedidos, listar_pedidos, listar_pedidos_por_cliente, listar_pedidos_por_ids, eliminar_pedido
 )
-from graficos import GraficoFactory
-import matplotlib.pyplot as plt
+from crud import catalogo
+from graficos import CacheGraficos
+from reportes import guardar_boleta
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime
 
@@ -25,6 +27,166 @@ from datetime import datetime
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
+class TablaVirtual:
+    # Treeview que carga las filas por páginas (keyset) a medida que el usuario se desplaza:
+    # solo se consulta y dibuja lo visible más un margen de precarga. Las páginas se
+    # consultan en el EjecutorDB, fuera del hilo de la interfaz.
+    def __init__(self, tree, ejecutor, clave, cargar_pagina, formatear, al_fallar=None, tamaño_pagina=200, margen=0.25, nuevas_al_inicio=False):
+        self.tree = tree
+        self.ejecutor = ejecutor
+        self.clave = clave
+        self.cargar_pagina = cargar_pagina  # (session, after_id, limit) -> filas con atributo id
+        self.formatear = formatear  # fila -> valores de la fila del treeview
+        self.al_fallar = al_fallar
+        self.tamaño_pagina = tamaño_pagina
+        self.margen = margen
+        self.nuevas_al_inicio = nuevas_al_inicio  # True si la tabla se ordena de más nuevo a más viejo
+        self.ultimo_id = None
+        self.agotado = True
+        self.pendiente = False
+        
+        self.tree.configure(yscrollcommand=self.al_desplazar)
+        self.tree.bind("<Map>", lambda event: self.al_desplazar(*self.tree.yview()))
+    
+    def reiniciar(self, cargar_pagina=None):
+        if cargar_pagina is not None:
+            self.cargar_pagina = cargar_pagina
+        
+        # La nueva carga reemplaza a cualquier página que aún esté en camino
+        self.tree.delete(*self.tree.get_children())
+        self.ultimo_id = None
+        self.agotado = False
+        self.pendiente = False
+        self.cargar_siguiente()
+    
+    def cargar_siguiente(self):
+        if self.agotado or self.pendiente:
+            return
+        
+        self.pendiente = True
+        cargar_pagina, after_id, limit = self.cargar_pagina, self.ultimo_id, self.tamaño_pagina
+        self.ejecutor.enviar(
+            self.clave,
+            lambda session: cargar_pagina(session, after_id, limit),
+            self.agregar_pagina,
+            self.fallo_pagina
+        )
+    
+    def agregar_pagina(self, filas):
+        if filas:
+            self.ultimo_id = filas[-1].id
+        if len(filas) < self.tamaño_pagina:
+            self.agotado = True
+        
+        for fila in filas:
+            iid = str(fila.id)
+            if self.tree.exists(iid):
+                # Ya se agregó como fila nueva mientras la página estaba en camino
+                self.tree.item(iid, values=self.formatear(fila))
+            else:
+                self.tree.insert("", "end", iid=iid, values=self.formatear(fila))
+        
+        self.pendiente = False
+        self.al_desplazar(*self.tree.yview())
+    
+    def fallo_pagina(self, error):
+        self.pendiente = False
+        if self.al_fallar:
+            self.al_fallar(error)
+    
+    # ---- Cambios por fila: sin recargar la tabla, conservando desplazamiento y selección ----
+    
+    def actualizar_fila(self, fila):
+        # Alta o modificación de una fila, identificada por su id
+        iid = str(fila.id)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.formatear(fila))
+        elif self.nuevas_al_inicio:
+            primero = self.tree.yview()[0]
+            self.tree.insert("", 0, iid=iid, values=self.formatear(fila))
+            if primero > 0:
+                self.tree.yview_scroll(1, "units")  # Mantener a la vista las mismas filas
+        elif self.agotado:
+            # Las filas nuevas tienen el id más alto: van al final si ya se cargó todo;
+            # si no, llegarán con la página que les corresponda
+            self.tree.insert("", "end", iid=iid, values=self.formatear(fila))
+            self.ultimo_id = fila.id
+    
+    def refrescar_filas(self, filas):
+        # Actualizar solo las filas que ya están cargadas
+        for fila in filas:
+            iid = str(fila.id)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=self.formatear(fila))
+    
+    def eliminar_fila(self, id):
+        iid = str(id)
+        if not self.tree.exists(iid):
+            return
+        
+        # La paginación continúa desde la última fila cargada: si se elimina, usar la anterior
+        if self.ultimo_id == id:
+            anterior = self.tree.prev(iid)
+            self.ultimo_id = int(anterior) if anterior else None
+        self.tree.delete(iid)
+    
+    def al_desplazar(self, primero, ultimo):
+        # Precargar la siguiente página cuando la vista se acerca al final de lo cargado
+        if self.agotado or self.pendiente or not self.tree.winfo_ismapped():
+            return
+        if float(ultimo) >= 1.0 - self.margen:
+            self.cargar_siguiente()
+
+class BusquedaIncremental:
+    # Entrada que filtra las opciones de un combo mientras se escribe: espera a que el
+    # usuario deje de teclear y busca en el EjecutorDB; una búsqueda nueva reemplaza a la
+    # anterior. Con el texto vacío se restauran las opciones completas.
+    def __init__(self, entry, combo, ejecutor, clave, buscar, formatear, restaurar, al_elegir=None, al_fallar=None, retardo_ms=250, minimo=2, limite=20):
+        self.entry = entry
+        self.combo = combo
+        self.ejecutor = ejecutor
+        self.clave = clave
+        self.buscar = buscar  # (session, texto, limite) -> filas
+        self.formatear = formatear  # fila -> opción del combo
+        self.restaurar = restaurar
+        self.al_elegir = al_elegir
+        self.al_fallar = al_fallar
+        self.retardo_ms = retardo_ms
+        self.minimo = minimo
+        self.limite = limite
+        self.programada = None
+        
+        self.entry.bind("<KeyRelease>", self.al_escribir)
+    
+    def al_escribir(self, event=None):
+        if self.programada:
+            self.entry.after_cancel(self.programada)
+        self.programada = self.entry.after(self.retardo_ms, self.buscar_ahora)
+    
+    def buscar_ahora(self):
+        self.programada = None
+        texto = self.entry.get().strip()
+        if len(texto) < self.minimo:
+            self.ejecutor.cancelar(self.clave)
+            if not texto:
+                self.restaurar()
+            return
+        
+        buscar, limite = self.buscar, self.limite
+        self.ejecutor.enviar(
+            self.clave,
+            lambda session: buscar(session, texto, limite),
+            self.mostrar,
+            self.al_fallar
+        )
+    
+    def mostrar(self, filas):
+        opciones = [self.formatear(fila) for fila in filas]
+        self.combo.configure(values=opciones)
+        self.combo.set(opciones[0] if opciones else "")
+        if opciones and self.al_elegir:
+            self.al_elegir()
+
 class RestauranteApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -35,10 +197,24 @@ class RestauranteApp(ctk.CTk):
         
         # Inicializar la base de datos
         self.engine = init_db()
-        self.session = get_session(self.engine)
+        
+        # Consultas y escrituras en segundo plano para no bloquear la interfaz: la interfaz
+        # no tiene sesión propia, todo acceso a la base pasa por el ejecutor
+        self.ejecutor = EjecutorDB(self.engine, self)
+        self.ejecutor.al_cambiar_ocupado = self.mostrar_cargando
+        
+        # Gráficos ya dibujados (figura y canvas) para volver a mostrarlos sin rehacerlos
+        self.graficos = CacheGraficos(al_descartar=self.descartar_canvas)
+        self.canvas_graficos = {}
+        self.grafico_actual = None
+        self.protocol("WM_DELETE_WINDOW", self.cerrar)
+        
+        # Indicador de carga
+        self.cargando_label = ctk.CTkLabel(self, text="")
+        self.cargando_label.pack(side="bottom", anchor="w", padx=10)
         
         # Crear pestañas
-        self.tabview = ctk.CTkTabview(self)
+        self.tabview = ctk.CTkTabview(self, command=self.al_cambiar_pestaña)
         self.tabview.pack(fill="both", expand=True, padx=10, pady=10)
         
         # Añadir pestañas
@@ -63,6 +239,54 @@ class RestauranteApp(ctk.CTk):
         self.cargar_clientes()
         self.cargar_pedidos()
     
+    # ========== Carga en segundo plano ==========
+    
+    def mostrar_cargando(self, ocupado):
+        self.cargando_label.configure(text="Cargando..." if ocupado else "")
+    
+    def mostrar_error_carga(self, error):
+        messagebox.showerror("Error", f"No se pudieron cargar los datos: {str(error)}")
+    
+    def escribir(self, botones, funcion, al_terminar, error):
+        # Escritura en el EjecutorDB; los botones del formulario quedan deshabilitados hasta
+        # que termina, para no enviarla dos veces
+        for boton in botones:
+            boton.configure(state="disabled")
+        
+        def habilitar():
+            for boton in botones:
+                boton.configure(state="normal")
+        
+        def terminar(resultado):
+            habilitar()
+            al_terminar(resultado)
+        
+        def fallar(e):
+            habilitar()
+            messagebox.showerror("Error", f"{error}: {str(e)}")
+        
+        self.ejecutor.escribir(funcion, terminar, fallar)
+    
+    def refrescar_stock(self):
+        # El stock descontado o repuesto cambia ingredientes y porciones disponibles
+        self.ejecutor.enviar(
+            "stock", catalogo.ingredientes.listar, self.ing_tabla.refrescar_filas, self.mostrar_error_carga
+        )
+        self.actualizar_combo_menus_compra()
+    
+    def al_cambiar_pestaña(self):
+        # Un gráfico pedido en Estadísticas ya no interesa si el usuario salió de la pestaña;
+        # al volver, el gráfico visible se pone al día si cambiaron sus datos
+        if self.tabview.get() != "Estadísticas":
+            self.ejecutor.cancelar("grafico")
+        elif self.grafico_actual is not None:
+            self.consultar_grafico(self.grafico_actual)
+    
+    def cerrar(self):
+        self.ejecutor.cerrar()
+        self.graficos.limpiar()
+        self.destroy()
+    
     # ========== Configuración de pestañas ==========
     
     def setup_ingredientes_tab(self):
@@ -93,9 +317,13 @@ class RestauranteApp(ctk.CTk):
         button_frame = ctk.CTkFrame(form_frame)
         button_frame.grid(row=4, column=0, columnspan=2, pady=10)
         
-        ctk.CTkButton(button_frame, text="Agregar", command=self.agregar_ingrediente).pack(side="left", padx=5)
-        ctk.CTkButton(button_frame, text="Actualizar", command=self.actualizar_ingrediente).pack(side="left", padx=5)
-        ctk.CTkButton(button_frame, text="Eliminar", command=self.eliminar_ingrediente).pack(side="left", padx=5)
+        self.ing_botones = [
+            ctk.CTkButton(button_frame, text="Agregar", command=self.agregar_ingrediente),
+            ctk.CTkButton(button_frame, text="Actualizar", command=self.actualizar_ingrediente),
+            ctk.CTkButton(button_frame, text="Eliminar", command=self.eliminar_ingrediente)
+        ]
+        for boton in self.ing_botones:
+            boton.pack(side="left", padx=5)
         ctk.CTkButton(button_frame, text="Limpiar", command=self.limpiar_formulario_ingrediente).pack(side="left", padx=5)
         
         # Treeview para mostrar ingredientes
@@ -113,6 +341,12 @@ class RestauranteApp(ctk.CTk):
         self.ing_tree.column("Unidad", width=80)
         
         self.ing_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.ing_tabla = TablaVirtual(
+            self.ing_tree, self.ejecutor, "ingredientes",
+            lambda session, after_id, limit: listar_ingredientes(session, after_id=after_id, limit=limit),
+            lambda ing: (ing.id, ing.nombre, ing.tipo, f"{ing.cantidad}", ing.unidad_medida),
+            self.mostrar_error_carga
+        )
         
         # Configurar evento de selección
         self.ing_tree.bind("<<TreeviewSelect>>", self.seleccionar_ingrediente)
@@ -148,9 +382,13 @@ class RestauranteApp(ctk.CTk):
         menu_button_frame = ctk.CTkFrame(menu_form_frame)
         menu_button_frame.grid(row=3, column=0, columnspan=2, pady=10)
         
-        ctk.CTkButton(menu_button_frame, text="Agregar Menú", command=self.agregar_menu).pack(side="left", padx=5)
-        ctk.CTkButton(menu_button_frame, text="Actualizar Menú", command=self.actualizar_menu).pack(side="left", padx=5)
-        ctk.CTkButton(menu_button_frame, text="Eliminar Menú", command=self.eliminar_menu).pack(side="left", padx=5)
+        self.menu_botones = [
+            ctk.CTkButton(menu_button_frame, text="Agregar Menú", command=self.agregar_menu),
+            ctk.CTkButton(menu_button_frame, text="Actualizar Menú", command=self.actualizar_menu),
+            ctk.CTkButton(menu_button_frame, text="Eliminar Menú", command=self.eliminar_menu)
+        ]
+        for boton in self.menu_botones:
+            boton.pack(side="left", padx=5)
         ctk.CTkButton(menu_button_frame, text="Limpiar", command=self.limpiar_formulario_menu).pack(side="left", padx=5)
         
         # Frame para ingredientes del menú
@@ -179,8 +417,15 @@ class RestauranteApp(ctk.CTk):
         
         ctk.CTkLabel(add_ing_frame, text="Agregar Ingrediente:").pack(side="left", padx=5)
         
+        self.menu_ing_buscar = ctk.CTkEntry(add_ing_frame, placeholder_text="Buscar...", width=110)
+        self.menu_ing_buscar.pack(side="left", padx=5)
         self.menu_ing_combo = ctk.CTkComboBox(add_ing_frame, state="readonly")
         self.menu_ing_combo.pack(side="left", padx=5, expand=True, fill="x")
+        BusquedaIncremental(
+            self.menu_ing_buscar, self.menu_ing_combo, self.ejecutor, "buscar_ingredientes",
+            buscar_ingredientes, self.formatear_ingrediente_combo, self.actualizar_combo_ingredientes,
+            al_fallar=self.mostrar_error_carga
+        )
         
         ctk.CTkLabel(add_ing_frame, text="Cantidad:").pack(side="left", padx=5)
         self.menu_ing_cantidad = ctk.CTkEntry(add_ing_frame, width=60)
@@ -208,9 +453,16 @@ class RestauranteApp(ctk.CTk):
         self.menu_tree.column("Precio", width=80)
         
         self.menu_tree.pack(fill="both", expand=True, padx=5, pady=5)
+        self.menu_tabla = TablaVirtual(
+            self.menu_tree, self.ejecutor, "menus",
+            lambda session, after_id, limit: listar_menus(session, after_id=after_id, limit=limit),
+            lambda menu: (menu.id, menu.nombre, menu.descripcion, f"${menu.precio:.2f}"),
+            self.mostrar_error_carga
+        )
         
         # Configurar evento de selección
         self.menu_tree.bind("<<TreeviewSelect>>", self.seleccionar_menu)
+        self.menu_receta_pendiente = False
         
         # Actualizar combo de ingredientes
         self.actualizar_combo_ingredientes()
@@ -235,9 +487,13 @@ class RestauranteApp(ctk.CTk):
         button_frame = ctk.CTkFrame(form_frame)
         button_frame.grid(row=2, column=0, columnspan=2, pady=10)
         
-        ctk.CTkButton(button_frame, text="Agregar", command=self.agregar_cliente).pack(side="left", padx=5)
-        ctk.CTkButton(button_frame, text="Actualizar", command=self.actualizar_cliente).pack(side="left", padx=5)
-        ctk.CTkButton(button_frame, text="Eliminar", command=self.eliminar_cliente).pack(side="left", padx=5)
+        self.cli_botones = [
+            ctk.CTkButton(button_frame, text="Agregar", command=self.agregar_cliente),
+            ctk.CTkButton(button_frame, text="Actualizar", command=self.actualizar_cliente),
+            ctk.CTkButton(button_frame, text="Eliminar", command=self.eliminar_cliente)
+        ]
+        for boton in self.cli_botones:
+            boton.pack(side="left", padx=5)
         ctk.CTkButton(button_frame, text="Limpiar", command=self.limpiar_formulario_cliente).pack(side="left", padx=5)
         
         # Treeview para mostrar clientes
@@ -251,6 +507,12 @@ class RestauranteApp(ctk.CTk):
         self.cli_tree.column("Email", width=200)
         
         self.cli_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.cli_tabla = TablaVirtual(
+            self.cli_tree, self.ejecutor, "clientes",
+            lambda session, after_id, limit: listar_clientes(session, after_id=after_id, limit=limit),
+            lambda cliente: (cliente.id, cliente.nombre, cliente.email),
+            self.mostrar_error_carga
+        )
         
         # Configurar evento de selección
         self.cli_tree.bind("<<TreeviewSelect>>", self.seleccionar_cliente)
@@ -287,12 +549,19 @@ class RestauranteApp(ctk.CTk):
         self.ped_tree.column("Fecha", width=120)
         
         self.ped_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.ped_tabla = TablaVirtual(
+            self.ped_tree, self.ejecutor, "pedidos", None, self.formatear_pedido, self.mostrar_error_carga,
+            nuevas_al_inicio=True
+        )
         
         # Botón para eliminar pedido
         button_frame = ctk.CTkFrame(tab)
         button_frame.pack(fill="x", padx=10, pady=5)
         
-        ctk.CTkButton(button_frame, text="Eliminar Pedido Seleccionado", command=self.eliminar_pedido).pack(side="left", padx=5)
+        self.ped_botones = [
+            ctk.CTkButton(button_frame, text="Eliminar Pedido Seleccionado", command=self.eliminar_pedido)
+        ]
+        self.ped_botones[0].pack(side="left", padx=5)
         
         # Actualizar combo de clientes
         self.actualizar_combo_clientes_pedidos()
@@ -313,23 +582,38 @@ class RestauranteApp(ctk.CTk):
         cliente_frame.pack(fill="x", padx=5, pady=5)
         
         ctk.CTkLabel(cliente_frame, text="Cliente:").pack(side="left", padx=5)
+        self.compra_cliente_buscar = ctk.CTkEntry(cliente_frame, placeholder_text="Buscar...", width=110)
+        self.compra_cliente_buscar.pack(side="left", padx=5)
         self.compra_cliente_combo = ctk.CTkComboBox(cliente_frame, state="readonly")
         self.compra_cliente_combo.pack(side="left", padx=5, expand=True, fill="x")
+        BusquedaIncremental(
+            self.compra_cliente_buscar, self.compra_cliente_combo, self.ejecutor, "buscar_clientes",
+            buscar_clientes, self.formatear_cliente_combo, self.actualizar_combo_clientes_compra,
+            al_fallar=self.mostrar_error_carga
+        )
         
         # Selección de menú
         menu_frame = ctk.CTkFrame(left_frame)
         menu_frame.pack(fill="x", padx=5, pady=5)
         
         ctk.CTkLabel(menu_frame, text="Menú:").pack(side="left", padx=5)
+        self.compra_menu_buscar = ctk.CTkEntry(menu_frame, placeholder_text="Buscar...", width=110)
+        self.compra_menu_buscar.pack(side="left", padx=5)
         self.compra_menu_combo = ctk.CTkComboBox(menu_frame, state="readonly")
         self.compra_menu_combo.pack(side="left", padx=5, expand=True, fill="x")
+        BusquedaIncremental(
+            self.compra_menu_buscar, self.compra_menu_combo, self.ejecutor, "buscar_menus",
+            buscar_menus, self.formatear_menu_compra, self.actualizar_combo_menus_compra,
+            al_elegir=self.mostrar_detalles_menu, al_fallar=self.mostrar_error_carga
+        )
         
         ctk.CTkLabel(menu_frame, text="Cantidad:").pack(side="left", padx=5)
         self.compra_cantidad = ctk.CTkEntry(menu_frame, width=60)
         self.compra_cantidad.pack(side="left", padx=5)
         self.compra_cantidad.insert(0, "1")
         
-        ctk.CTkButton(menu_frame, text="Agregar", command=self.agregar_a_carrito).pack(side="left", padx=5)
+        agregar_boton = ctk.CTkButton(menu_frame, text="Agregar", command=self.agregar_a_carrito)
+        agregar_boton.pack(side="left", padx=5)
         
         # Detalles del menú seleccionado
         detalles_frame = ctk.CTkFrame(left_frame)
@@ -374,9 +658,15 @@ class RestauranteApp(ctk.CTk):
         button_frame = ctk.CTkFrame(right_frame)
         button_frame.pack(fill="x", padx=5, pady=5)
         
-        ctk.CTkButton(button_frame, text="Eliminar del Carrito", command=self.eliminar_del_carrito).pack(side="left", padx=5)
-        ctk.CTkButton(button_frame, text="Limpiar Carrito", command=self.limpiar_carrito).pack(side="left", padx=5)
-        ctk.CTkButton(button_frame, text="Realizar Pedido", command=self.realizar_pedido).pack(side="right", padx=5)
+        eliminar_boton = ctk.CTkButton(button_frame, text="Eliminar del Carrito", command=self.eliminar_del_carrito)
+        eliminar_boton.pack(side="left", padx=5)
+        limpiar_boton = ctk.CTkButton(button_frame, text="Limpiar Carrito", command=self.limpiar_carrito)
+        limpiar_boton.pack(side="left", padx=5)
+        realizar_boton = ctk.CTkButton(button_frame, text="Realizar Pedido", command=self.realizar_pedido)
+        realizar_boton.pack(side="right", padx=5)
+        
+        # El carrito no se modifica mientras se registra el pedido
+        self.compra_botones = [agregar_boton, eliminar_boton, limpiar_boton, realizar_boton]
         
         # Inicializar carrito
         self.carrito = []
@@ -412,35 +702,43 @@ class RestauranteApp(ctk.CTk):
         self.grafico_periodo.pack(side="left", padx=5)
         self.grafico_periodo.set("diario")
         
-        ctk.CTkButton(control_frame, text="Generar Gráfico", command=self.generar_grafico).pack(side="left", padx=5)
+        # Opciones para menús populares: criterio del ranking
+        self.grafico_criterio_frame = ctk.CTkFrame(control_frame)
+        ctk.CTkLabel(self.grafico_criterio_frame, text="Ordenar por:").pack(side="left", padx=5)
+        self.grafico_criterio = ctk.CTkComboBox(self.grafico_criterio_frame, values=[
+            "pedidos", "unidades", "ingresos"
+        ], width=110)
+        self.grafico_criterio.pack(side="left", padx=5)
+        self.grafico_criterio.set("pedidos")
+        
+        # Rango de fechas opcional (AAAA-MM-DD), para ventas y menús populares
+        self.grafico_fechas_frame = ctk.CTkFrame(control_frame)
+        self.grafico_fechas_frame.pack(side="left", padx=5)
+        
+        ctk.CTkLabel(self.grafico_fechas_frame, text="Desde:").pack(side="left", padx=5)
+        self.grafico_desde = ctk.CTkEntry(self.grafico_fechas_frame, width=100, placeholder_text="AAAA-MM-DD")
+        self.grafico_desde.pack(side="left", padx=5)
+        
+        ctk.CTkLabel(self.grafico_fechas_frame, text="Hasta:").pack(side="left", padx=5)
+        self.grafico_hasta = ctk.CTkEntry(self.grafico_fechas_frame, width=100, placeholder_text="AAAA-MM-DD")
+        self.grafico_hasta.pack(side="left", padx=5)
+        
+        self.grafico_boton = ctk.CTkButton(control_frame, text="Generar Gráfico", command=self.generar_grafico)
+        self.grafico_boton.pack(side="left", padx=5)
         
         # Frame para el gráfico
         self.grafico_frame = ctk.CTkFrame(tab)
         self.grafico_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
         # Configurar evento de cambio de tipo de gráfico
-        self.grafico_tipo.bind("<<ComboboxSelected>>", self.actualizar_opciones_grafico)
+        self.grafico_tipo.configure(command=self.actualizar_opciones_grafico)
         self.actualizar_opciones_grafico()
     
     # ========== Métodos para la pestaña de Ingredientes ==========
     
     def cargar_ingredientes(self):
-        # Limpiar treeview
-        for item in self.ing_tree.get_children():
-            self.ing_tree.delete(item)
-        
-        # Obtener ingredientes de la base de datos
-        ingredientes = listar_ingredientes(self.session)
-        
-        # Agregar al treeview
-        for ingrediente in ingredientes:
-            self.ing_tree.insert("", "end", values=(
-                ingrediente.id,
-                ingrediente.nombre,
-                ingrediente.tipo,
-                f"{ingrediente.cantidad}",
-                ingrediente.unidad_medida
-            ))
+        # Recargar el treeview desde la primera página
+        self.ing_tabla.reiniciar()
     
     def limpiar_formulario_ingrediente(self):
         self.ing_nombre.delete(0, "end")
@@ -482,20 +780,24 @@ class RestauranteApp(ctk.CTk):
             messagebox.showerror("Error", "La cantidad debe ser un número válido mayor que cero")
             return
         
-        try:
-            ingrediente = crear_ingrediente(
-                self.session,
+        def creado(ingrediente):
+            messagebox.showinfo("Éxito", f"Ingrediente '{ingrediente.nombre}' creado correctamente")
+            self.ing_tabla.actualizar_fila(ingrediente)
+            self.limpiar_formulario_ingrediente()
+            self.actualizar_combo_ingredientes()
+        
+        self.escribir(
+            self.ing_botones,
+            lambda session: crear_ingrediente(
+                session,
                 nombre=nombre,
                 tipo=tipo,
                 cantidad=cantidad_float,
                 unidad_medida=unidad
-            )
-            messagebox.showinfo("Éxito", f"Ingrediente '{ingrediente.nombre}' creado correctamente")
-            self.cargar_ingredientes()
-            self.limpiar_formulario_ingrediente()
-            self.actualizar_combo_ingredientes()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo crear el ingrediente: {str(e)}")
+            ),
+            creado,
+            "No se pudo crear el ingrediente"
+        )
     
     def actualizar_ingrediente(self):
         selected = self.ing_tree.focus()
@@ -521,21 +823,26 @@ class RestauranteApp(ctk.CTk):
             messagebox.showerror("Error", "La cantidad debe ser un número válido mayor que cero")
             return
         
-        try:
-            ingrediente = actualizar_ingrediente(
-                self.session,
+        def actualizado(ingrediente):
+            messagebox.showinfo("Éxito", f"Ingrediente '{ingrediente.nombre}' actualizado correctamente")
+            self.ing_tabla.actualizar_fila(ingrediente)
+            self.limpiar_formulario_ingrediente()
+            self.actualizar_combo_ingredientes()
+            self.actualizar_combo_menus_compra()  # El stock cambia las porciones disponibles
+        
+        self.escribir(
+            self.ing_botones,
+            lambda session: actualizar_ingrediente(
+                session,
                 ingrediente_id=int(ingrediente_id),
                 nombre=nombre,
                 tipo=tipo,
                 cantidad=cantidad_float,
                 unidad_medida=unidad
-            )
-            messagebox.showinfo("Éxito", f"Ingrediente '{ingrediente.nombre}' actualizado correctamente")
-            self.cargar_ingredientes()
-            self.limpiar_formulario_ingrediente()
-            self.actualizar_combo_ingredientes()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo actualizar el ingrediente: {str(e)}")
+            ),
+            actualizado,
+            "No se pudo actualizar el ingrediente"
+        )
     
     def eliminar_ingrediente(self):
         selected = self.ing_tree.focus()
@@ -546,43 +853,40 @@ class RestauranteApp(ctk.CTk):
         ingrediente_id = self.ing_tree.item(selected, "values")[0]
         nombre = self.ing_tree.item(selected, "values")[1]
         
-        if messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el ingrediente '{nombre}'?"):
-            try:
-                if eliminar_ingrediente(self.session, int(ingrediente_id)):
-                    messagebox.showinfo("Éxito", f"Ingrediente '{nombre}' eliminado correctamente")
-                    self.cargar_ingredientes()
-                    self.limpiar_formulario_ingrediente()
-                    self.actualizar_combo_ingredientes()
-                else:
-                    messagebox.showerror("Error", "No se pudo eliminar el ingrediente")
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar el ingrediente: {str(e)}")
+        if not messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el ingrediente '{nombre}'?"):
+            return
+        
+        def eliminado(exito):
+            if exito:
+                messagebox.showinfo("Éxito", f"Ingrediente '{nombre}' eliminado correctamente")
+                self.ing_tabla.eliminar_fila(int(ingrediente_id))
+                self.limpiar_formulario_ingrediente()
+                self.actualizar_combo_ingredientes()
+                self.actualizar_combo_menus_compra()
+            else:
+                messagebox.showerror("Error", "No se pudo eliminar el ingrediente")
+        
+        self.escribir(
+            self.ing_botones,
+            lambda session: eliminar_ingrediente(session, int(ingrediente_id)),
+            eliminado,
+            "No se pudo eliminar el ingrediente"
+        )
     
     # ========== Métodos para la pestaña de Menús ==========
     
     def cargar_menus(self):
-        # Limpiar treeview
-        for item in self.menu_tree.get_children():
-            self.menu_tree.delete(item)
-        
-        # Obtener menús de la base de datos
-        menus = listar_menus(self.session)
-        
-        # Agregar al treeview
-        for menu in menus:
-            self.menu_tree.insert("", "end", values=(
-                menu.id,
-                menu.nombre,
-                menu.descripcion,
-                f"${menu.precio:.2f}"
-            ))
+        # Recargar el treeview desde la primera página
+        self.menu_tabla.reiniciar()
     
     def limpiar_formulario_menu(self):
         self.menu_nombre.delete(0, "end")
         self.menu_descripcion.delete(0, "end")
         self.menu_precio.delete(0, "end")
         
-        # Limpiar ingredientes del menú
+        # Limpiar ingredientes del menú (y descartar la receta que aún esté en camino)
+        self.ejecutor.cancelar("receta_menu")
+        self.menu_receta_pendiente = False
         for item in self.menu_ing_tree.get_children():
             self.menu_ing_tree.delete(item)
     
@@ -601,10 +905,18 @@ class RestauranteApp(ctk.CTk):
         self.menu_descripcion.insert(0, values[2])
         self.menu_precio.insert(0, values[3].replace("$", ""))
         
-        # Cargar ingredientes del menú
+        # Cargar ingredientes del menú en segundo plano; hasta que lleguen no se guarda el menú
         menu_id = int(values[0])
-        ingredientes = obtener_ingredientes_menu(self.session, menu_id)
-        
+        self.menu_receta_pendiente = True
+        self.ejecutor.enviar(
+            "receta_menu",
+            lambda session: obtener_ingredientes_menu(session, menu_id),
+            self.mostrar_receta_menu,
+            self.mostrar_error_carga
+        )
+    
+    def mostrar_receta_menu(self, ingredientes):
+        self.menu_receta_pendiente = False
         for ing in ingredientes:
             self.menu_ing_tree.insert("", "end", values=(
                 ing['id'],
@@ -613,6 +925,24 @@ class RestauranteApp(ctk.CTk):
                 ing['unidad_medida']
             ))
     
+    def leer_receta_menu(self):
+        # Ingredientes del menú desde el treeview; None (con aviso) si falta la receta
+        if self.menu_receta_pendiente:
+            messagebox.showerror("Error", "Los ingredientes del menú aún se están cargando")
+            return None
+        
+        ingredientes = {}
+        for item in self.menu_ing_tree.get_children():
+            values = self.menu_ing_tree.item(item, "values")
+            ingrediente_id = int(values[0])
+            cantidad = float(values[2])
+            ingredientes[ingrediente_id] = cantidad
+        
+        if not ingredientes:
+            messagebox.showerror("Error", "Debe agregar al menos un ingrediente al menú")
+            return None
+        return ingredientes
+    
     def agregar_menu(self):
         nombre = self.menu_nombre.get().strip()
         descripcion = self.menu_descripcion.get().strip()
@@ -631,31 +961,28 @@ class RestauranteApp(ctk.CTk):
             return
         
         # Obtener ingredientes del menú
-        ingredientes = {}
-        for item in self.menu_ing_tree.get_children():
-            values = self.menu_ing_tree.item(item, "values")
-            ingrediente_id = int(values[0])
-            cantidad = float(values[2])
-            ingredientes[ingrediente_id] = cantidad
-        
-        if not ingredientes:
-            messagebox.showerror("Error", "Debe agregar al menos un ingrediente al menú")
+        ingredientes = self.leer_receta_menu()
+        if ingredientes is None:
             return
         
-        try:
-            menu = crear_menu(
-                self.session,
+        def creado(menu):
+            messagebox.showinfo("Éxito", f"Menú '{menu.nombre}' creado correctamente")
+            self.menu_tabla.actualizar_fila(menu)
+            self.limpiar_formulario_menu()
+            self.actualizar_combo_menus_compra()
+        
+        self.escribir(
+            self.menu_botones,
+            lambda session: crear_menu(
+                session,
                 nombre=nombre,
                 descripcion=descripcion,
                 precio=precio_float,
                 ingredientes=ingredientes
-            )
-            messagebox.showinfo("Éxito", f"Menú '{menu.nombre}' creado correctamente")
-            self.cargar_menus()
-            self.limpiar_formulario_menu()
-            self.actualizar_combo_menus_compra()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo crear el menú: {str(e)}")
+            ),
+            creado,
+            "No se pudo crear el menú"
+        )
     
     def actualizar_menu(self):
         selected = self.menu_tree.focus()
@@ -681,32 +1008,29 @@ class RestauranteApp(ctk.CTk):
             return
         
         # Obtener ingredientes del menú
-        ingredientes = {}
-        for item in self.menu_ing_tree.get_children():
-            values = self.menu_ing_tree.item(item, "values")
-            ingrediente_id = int(values[0])
-            cantidad = float(values[2])
-            ingredientes[ingrediente_id] = cantidad
-        
-        if not ingredientes:
-            messagebox.showerror("Error", "Debe agregar al menos un ingrediente al menú")
+        ingredientes = self.leer_receta_menu()
+        if ingredientes is None:
             return
         
-        try:
-            menu = actualizar_menu(
-                self.session,
+        def actualizado(menu):
+            messagebox.showinfo("Éxito", f"Menú '{menu.nombre}' actualizado correctamente")
+            self.menu_tabla.actualizar_fila(menu)
+            self.limpiar_formulario_menu()
+            self.actualizar_combo_menus_compra()
+        
+        self.escribir(
+            self.menu_botones,
+            lambda session: actualizar_menu(
+                session,
                 menu_id=int(menu_id),
                 nombre=nombre,
                 descripcion=descripcion,
                 precio=precio_float,
                 ingredientes=ingredientes
-            )
-            messagebox.showinfo("Éxito", f"Menú '{menu.nombre}' actualizado correctamente")
-            self.cargar_menus()
-            self.limpiar_formulario_menu()
-            self.actualizar_combo_menus_compra()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo actualizar el menú: {str(e)}")
+            ),
+            actualizado,
+            "No se pudo actualizar el menú"
+        )
     
     def eliminar_menu(self):
         selected = self.menu_tree.focus()
@@ -717,21 +1041,35 @@ class RestauranteApp(ctk.CTk):
         menu_id = self.menu_tree.item(selected, "values")[0]
         nombre = self.menu_tree.item(selected, "values")[1]
         
-        if messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el menú '{nombre}'?"):
-            try:
-                if eliminar_menu(self.session, int(menu_id)):
-                    messagebox.showinfo("Éxito", f"Menú '{nombre}' eliminado correctamente")
-                    self.cargar_menus()
-                    self.limpiar_formulario_menu()
-                    self.actualizar_combo_menus_compra()
-                else:
-                    messagebox.showerror("Error", "No se pudo eliminar el menú")
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar el menú: {str(e)}")
+        if not messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el menú '{nombre}'?"):
+            return
+        
+        def eliminado(exito):
+            if exito:
+                messagebox.showinfo("Éxito", f"Menú '{nombre}' eliminado correctamente")
+                self.menu_tabla.eliminar_fila(int(menu_id))
+                self.limpiar_formulario_menu()
+                self.actualizar_combo_menus_compra()
+            else:
+                messagebox.showerror("Error", "No se pudo eliminar el menú")
+        
+        self.escribir(
+            self.menu_botones,
+            lambda session: eliminar_menu(session, int(menu_id)),
+            eliminado,
+            "No se pudo eliminar el menú"
+        )
+    
+    def formatear_ingrediente_combo(self, ing):
+        return f"{ing.id}: {ing.nombre} ({ing.tipo})"
     
     def actualizar_combo_ingredientes(self):
-        ingredientes = listar_ingredientes(self.session)
-        opciones = [f"{ing.id}: {ing.nombre} ({ing.tipo})" for ing in ingredientes]
+        self.ejecutor.enviar(
+            "combo_ingredientes", catalogo.ingredientes.listar, self.mostrar_combo_ingredientes, self.mostrar_error_carga
+        )
+    
+    def mostrar_combo_ingredientes(self, ingredientes):
+        opciones = [self.formatear_ingrediente_combo(ing) for ing in ingredientes]
         self.menu_ing_combo.configure(values=opciones)
         if opciones:
             self.menu_ing_combo.set(opciones[0])
@@ -759,20 +1097,34 @@ class RestauranteApp(ctk.CTk):
         
         # Obtener ID del ingrediente
         ingrediente_id = int(seleccion.split(":")[0])
+        if self.ingrediente_en_menu(ingrediente_id):
+            return
         
-        # Verificar si el ingrediente ya está en el menú
+        # Obtener información del ingrediente (del catálogo, en el ejecutor)
+        self.ejecutor.enviar(
+            "ingrediente_menu",
+            lambda session: catalogo.ingredientes.obtener(session, ingrediente_id),
+            lambda ingrediente: self.insertar_ingrediente_menu(ingrediente_id, ingrediente, cantidad_float),
+            self.mostrar_error_carga
+        )
+    
+    def ingrediente_en_menu(self, ingrediente_id):
         for item in self.menu_ing_tree.get_children():
             values = self.menu_ing_tree.item(item, "values")
             if int(values[0]) == ingrediente_id:
                 messagebox.showerror("Error", "Este ingrediente ya está en el menú")
-                return
-        
-        # Obtener información del ingrediente
-        ingrediente = obtener_ingrediente(self.session, ingrediente_id)
+                return True
+        return False
+    
+    def insertar_ingrediente_menu(self, ingrediente_id, ingrediente, cantidad_float):
         if not ingrediente:
             messagebox.showerror("Error", "Ingrediente no encontrado")
             return
         
+        # La receta pudo cambiar mientras se consultaba el ingrediente
+        if self.ingrediente_en_menu(ingrediente_id):
+            return
+        
         # Agregar al treeview
         self.menu_ing_tree.insert("", "end", values=(
             ingrediente.id,
@@ -792,20 +1144,8 @@ class RestauranteApp(ctk.CTk):
     # ========== Métodos para la pestaña de Clientes ==========
     
     def cargar_clientes(self):
-        # Limpiar treeview
-        for item in self.cli_tree.get_children():
-            self.cli_tree.delete(item)
-        
-        # Obtener clientes de la base de datos
-        clientes = listar_clientes(self.session)
-        
-        # Agregar al treeview
-        for cliente in clientes:
-            self.cli_tree.insert("", "end", values=(
-                cliente.id,
-                cliente.nombre,
-                cliente.email
-            ))
+        # Recargar el treeview desde la primera página
+        self.cli_tabla.reiniciar()
     
     def limpiar_formulario_cliente(self):
         self.cli_nombre.delete(0, "end")
@@ -833,19 +1173,23 @@ class RestauranteApp(ctk.CTk):
             messagebox.showerror("Error", "Todos los campos son obligatorios")
             return
         
-        try:
-            cliente = crear_cliente(
-                self.session,
-                nombre=nombre,
-                email=email
-            )
+        def creado(cliente):
             messagebox.showinfo("Éxito", f"Cliente '{cliente.nombre}' creado correctamente")
-            self.cargar_clientes()
+            self.cli_tabla.actualizar_fila(cliente)
             self.limpiar_formulario_cliente()
             self.actualizar_combo_clientes_pedidos()
             self.actualizar_combo_clientes_compra()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo crear el cliente: {str(e)}")
+        
+        self.escribir(
+            self.cli_botones,
+            lambda session: crear_cliente(
+                session,
+                nombre=nombre,
+                email=email
+            ),
+            creado,
+            "No se pudo crear el cliente"
+        )
     
     def actualizar_cliente(self):
         selected = self.cli_tree.focus()
@@ -861,20 +1205,24 @@ class RestauranteApp(ctk.CTk):
             messagebox.showerror("Error", "Todos los campos son obligatorios")
             return
         
-        try:
-            cliente = actualizar_cliente(
-                self.session,
-                cliente_id=int(cliente_id),
-                nombre=nombre,
-                email=email
-            )
+        def actualizado(cliente):
             messagebox.showinfo("Éxito", f"Cliente '{cliente.nombre}' actualizado correctamente")
-            self.cargar_clientes()
+            self.cli_tabla.actualizar_fila(cliente)
             self.limpiar_formulario_cliente()
             self.actualizar_combo_clientes_pedidos()
             self.actualizar_combo_clientes_compra()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo actualizar el cliente: {str(e)}")
+        
+        self.escribir(
+            self.cli_botones,
+            lambda session: actualizar_cliente(
+                session,
+                cliente_id=int(cliente_id),
+                nombre=nombre,
+                email=email
+            ),
+            actualizado,
+            "No se pudo actualizar el cliente"
+        )
     
     def eliminar_cliente(self):
         selected = self.cli_tree.focus()
@@ -885,45 +1233,57 @@ class RestauranteApp(ctk.CTk):
         cliente_id = self.cli_tree.item(selected, "values")[0]
         nombre = self.cli_tree.item(selected, "values")[1]
         
-        if messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el cliente '{nombre}'?"):
-            try:
-                if eliminar_cliente(self.session, int(cliente_id)):
-                    messagebox.showinfo("Éxito", f"Cliente '{nombre}' eliminado correctamente")
-                    self.cargar_clientes()
-                    self.limpiar_formulario_cliente()
-                    self.actualizar_combo_clientes_pedidos()
-                    self.actualizar_combo_clientes_compra()
-                else:
-                    messagebox.showerror("Error", "No se pudo eliminar el cliente")
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar el cliente: {str(e)}")
+        if not messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el cliente '{nombre}'?"):
+            return
+        
+        def eliminado(exito):
+            if exito:
+                messagebox.showinfo("Éxito", f"Cliente '{nombre}' eliminado correctamente")
+                self.cli_tabla.eliminar_fila(int(cliente_id))
+                self.limpiar_formulario_cliente()
+                self.actualizar_combo_clientes_pedidos()
+                self.actualizar_combo_clientes_compra()
+            else:
+                messagebox.showerror("Error", "No se pudo eliminar el cliente")
+        
+        self.escribir(
+            self.cli_botones,
+            lambda session: eliminar_cliente(session, int(cliente_id)),
+            eliminado,
+            "No se pudo eliminar el cliente"
+        )
     
     # ========== Métodos para la pestaña de Pedidos ==========
     
     def cargar_pedidos(self, cliente_id=None):
-        # Limpiar treeview
-        for item in self.ped_tree.get_children():
-            self.ped_tree.delete(item)
-        
-        # Obtener pedidos de la base de datos
+        # Páginas de pedidos como filas planas (una sola consulta por página)
         if cliente_id:
-            pedidos = listar_pedidos_por_cliente(self.session, cliente_id)
+            cargar_pagina = lambda session, after_id, limit: listar_pedidos_por_cliente(
+                session, cliente_id, proyeccion=True, after_id=after_id, limit=limit
+            )
         else:
-            pedidos = listar_pedidos(self.session)
+            cargar_pagina = lambda session, after_id, limit: listar_pedidos(
+                session, proyeccion=True, after_id=after_id, limit=limit
+            )
         
-        # Agregar al treeview
-        for pedido in pedidos:
-            self.ped_tree.insert("", "end", values=(
-                pedido.id,
-                pedido.cliente.nombre,
-                pedido.menu.nombre,
-                pedido.cantidad,
-                f"${pedido.total:.2f}",
-                pedido.fecha.strftime("%Y-%m-%d %H:%M")
-            ))
+        self.ped_tabla.reiniciar(cargar_pagina)
+    
+    def formatear_pedido(self, pedido):
+        return (
+            pedido.id,
+            pedido.cliente or "-",
+            pedido.menu or "-",
+            pedido.cantidad,
+            f"${pedido.total:.2f}",
+            pedido.fecha.strftime("%Y-%m-%d %H:%M")
+        )
     
     def actualizar_combo_clientes_pedidos(self):
-        clientes = listar_clientes(self.session)
+        self.ejecutor.enviar(
+            "combo_clientes_pedidos", catalogo.clientes.listar, self.mostrar_combo_clientes_pedidos, self.mostrar_error_carga
+        )
+    
+    def mostrar_combo_clientes_pedidos(self, clientes):
         opciones = ["Todos"] + [f"{cli.id}: {cli.nombre}" for cli in clientes]
         self.pedido_cliente_filter.configure(values=opciones)
         self.pedido_cliente_filter.set("Todos")
@@ -950,32 +1310,66 @@ class RestauranteApp(ctk.CTk):
         cliente = self.ped_tree.item(selected, "values")[1]
         menu = self.ped_tree.item(selected, "values")[2]
         
-        if messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el pedido de {menu} para {cliente}?"):
-            try:
-                if eliminar_pedido(self.session, int(pedido_id)):
-                    messagebox.showinfo("Éxito", "Pedido eliminado correctamente")
-                    self.filtrar_pedidos()  # Mantener el filtro actual
-                else:
-                    messagebox.showerror("Error", "No se pudo eliminar el pedido")
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar el pedido: {str(e)}")
+        if not messagebox.askyesno("Confirmar", f"¿Está seguro de eliminar el pedido de {menu} para {cliente}?"):
+            return
+        
+        def eliminado(exito):
+            if exito:
+                messagebox.showinfo("Éxito", "Pedido eliminado correctamente")
+                self.ped_tabla.eliminar_fila(int(pedido_id))
+                self.refrescar_stock()
+            else:
+                messagebox.showerror("Error", "No se pudo eliminar el pedido")
+        
+        self.escribir(
+            self.ped_botones,
+            lambda session: eliminar_pedido(session, int(pedido_id)),
+            eliminado,
+            "No se pudo eliminar el pedido"
+        )
     
     # ========== Métodos para la pestaña de Panel de Compra ==========
     
+    def formatear_cliente_combo(self, cli):
+        return f"{cli.id}: {cli.nombre}"
+    
     def actualizar_combo_clientes_compra(self):
-        clientes = listar_clientes(self.session)
-        opciones = [f"{cli.id}: {cli.nombre}" for cli in clientes]
+        self.ejecutor.enviar(
+            "combo_clientes_compra", catalogo.clientes.listar, self.mostrar_combo_clientes_compra, self.mostrar_error_carga
+        )
+    
+    def mostrar_combo_clientes_compra(self, clientes):
+        opciones = [self.formatear_cliente_combo(cli) for cli in clientes]
         self.compra_cliente_combo.configure(values=opciones)
         if opciones:
             self.compra_cliente_combo.set(opciones[0])
         else:
             self.compra_cliente_combo.set("")
     
+    def formatear_menu_compra(self, menu):
+        opcion = f"{menu.id}: {menu.nombre} (${menu.precio:.2f})"
+        if menu.porciones_disponibles == 0:
+            opcion += " - Agotado"
+        elif menu.porciones_disponibles is not None:
+            opcion += f" - {menu.porciones_disponibles} porciones"
+        return opcion
+    
     def actualizar_combo_menus_compra(self):
-        menus = listar_menus(self.session)
-        opciones = [f"{menu.id}: {menu.nombre} (${menu.precio:.2f})" for menu in menus]
+        # Las porciones vienen precalculadas en la tabla de menús y el catálogo en caché
+        self.ejecutor.enviar(
+            "combo_menus_compra", catalogo.menus.listar, self.mostrar_combo_menus_compra, self.mostrar_error_carga
+        )
+    
+    def mostrar_combo_menus_compra(self, menus):
+        opciones = [self.formatear_menu_compra(menu) for menu in menus]
+        
+        # Conservar el menú seleccionado si sigue en la lista
+        anterior = self.compra_menu_combo.get().split(":")[0]
         self.compra_menu_combo.configure(values=opciones)
-        if opciones:
+        seleccion = next((opcion for opcion in opciones if opcion.split(":")[0] == anterior), None)
+        if seleccion:
+            self.compra_menu_combo.set(seleccion)
+        elif opciones:
             self.compra_menu_combo.set(opciones[0])
         else:
             self.compra_menu_combo.set("")
@@ -986,12 +1380,17 @@ class RestauranteApp(ctk.CTk):
             return
         
         menu_id = int(seleccion.split(":")[0])
-        menu = obtener_menu(self.session, menu_id)
+        self.ejecutor.enviar(
+            "detalles_menu",
+            lambda session: (catalogo.menus.obtener(session, menu_id), obtener_ingredientes_menu(session, menu_id)),
+            lambda resultado: self.mostrar_detalles(*resultado),
+            self.mostrar_error_carga
+        )
+    
+    def mostrar_detalles(self, menu, ingredientes):
         if not menu:
             return
         
-        ingredientes = obtener_ingredientes_menu(self.session, menu_id)
-        
         detalles = f"Nombre: {menu.nombre}\n"
         detalles += f"Descripción: {menu.descripcion}\n"
         detalles += f"Precio: ${menu.precio:.2f}\n\n"
@@ -1024,13 +1423,29 @@ class RestauranteApp(ctk.CTk):
             messagebox.showerror("Error", "La cantidad debe ser un número entero válido mayor que cero")
             return
         
-        # Obtener información del menú
+        # Obtener información del menú (del catálogo, en el ejecutor)
         menu_id = int(seleccion_menu.split(":")[0])
-        menu = obtener_menu(self.session, menu_id)
+        self.ejecutor.enviar(
+            "agregar_carrito",
+            lambda session: catalogo.menus.obtener(session, menu_id),
+            lambda menu: self.agregar_menu_a_carrito(menu, cantidad_int),
+            self.mostrar_error_carga
+        )
+    
+    def agregar_menu_a_carrito(self, menu, cantidad_int):
         if not menu:
             messagebox.showerror("Error", "Menú no encontrado")
             return
         
+        # Avisar antes del checkout si el carrito supera las porciones disponibles
+        en_carrito = sum(item["cantidad"] for item in self.carrito if item["menu_id"] == menu.id)
+        if menu.porciones_disponibles is not None and en_carrito + cantidad_int > menu.porciones_disponibles:
+            messagebox.showerror(
+                "Error",
+                f"Solo hay stock para {menu.porciones_disponibles} porciones de '{menu.nombre}'"
+            )
+            return
+        
         # Agregar al carrito
         self.carrito.append({
             "menu_id": menu.id,
@@ -1088,65 +1503,136 @@ class RestauranteApp(ctk.CTk):
             return
         
         cliente_id = int(seleccion_cliente.split(":")[0])
-        
-        try:
-            # Crear un pedido por cada item en el carrito
-            for item in self.carrito:
-                crear_pedido(
-                    self.session,
-                    cliente_id=cliente_id,
-                    menu_id=item["menu_id"],
-                    cantidad=item["cantidad"],
-                    descripcion=f"{item['cantidad']} x {item['nombre']}"
+        items = [{
+            "menu_id": item["menu_id"],
+            "cantidad": item["cantidad"],
+            "descripcion": f"{item['cantidad']} x {item['nombre']}"
+        } for item in self.carrito]
+        
+        def registrar(session):
+            # Crear todos los pedidos del carrito en una sola transacción y leer sus filas
+            # para la tabla de pedidos
+            pedido_ids = [pedido.id for pedido in crear_pedidos(session, cliente_id=cliente_id, items=items)]
+            return pedido_ids, listar_pedidos_por_ids(session, pedido_ids)
+        
+        def registrado(resultado):
+            pedido_ids, filas = resultado
+            
+            # Quitar del carrito lo pedido (un menú que se estaba agregando queda)
+            del self.carrito[:len(items)]
+            self.actualizar_carrito()
+            
+            # La boleta (PDF) se genera en segundo plano y se avisa al terminar; clave propia
+            # por carrito para que un pedido siguiente no reemplace a esta boleta
+            self.ejecutor.enviar(
+                f"boleta-{pedido_ids[0]}",
+                lambda session: guardar_boleta(session, pedido_ids),
+                lambda ruta: messagebox.showinfo("Éxito", f"Pedido realizado correctamente\nBoleta: {ruta}"),
+                lambda e: messagebox.showwarning(
+                    "Boleta", f"Pedido realizado correctamente, pero no se pudo generar la boleta: {str(e)}"
                 )
+            )
             
-            messagebox.showinfo("Éxito", "Pedido realizado correctamente")
-            self.limpiar_carrito()
-            self.cargar_pedidos()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo realizar el pedido: {str(e)}")
+            # Agregar arriba solo los pedidos nuevos que correspondan al filtro actual
+            filtro = self.pedido_cliente_filter.get()
+            if filtro == "Todos" or int(filtro.split(":")[0]) == cliente_id:
+                for fila in reversed(filas):
+                    self.ped_tabla.actualizar_fila(fila)
+            self.refrescar_stock()
+        
+        self.escribir(self.compra_botones, registrar, registrado, "No se pudo realizar el pedido")
     
     # ========== Métodos para la pestaña de Estadísticas ==========
     
     def actualizar_opciones_grafico(self, event=None):
         tipo = self.grafico_tipo.get()
+        
+        # Volver a empaquetar en orden, delante del botón, solo las opciones del tipo elegido
+        for frame in (self.grafico_opciones_frame, self.grafico_criterio_frame, self.grafico_fechas_frame):
+            frame.pack_forget()
         if tipo == "Ventas por Fecha":
-            self.grafico_opciones_frame.pack(side="left", padx=5)
-        else:
-            self.grafico_opciones_frame.pack_forget()
+            self.grafico_opciones_frame.pack(side="left", padx=5, before=self.grafico_boton)
+        elif tipo == "Menús Populares":
+            self.grafico_criterio_frame.pack(side="left", padx=5, before=self.grafico_boton)
+        if tipo in ("Ventas por Fecha", "Menús Populares"):
+            self.grafico_fechas_frame.pack(side="left", padx=5, before=self.grafico_boton)
+    
+    def leer_fecha(self, entry):
+        texto = entry.get().strip()
+        if not texto:
+            return None
+        return datetime.strptime(texto, "%Y-%m-%d").date()
     
     def generar_grafico(self):
-        # Limpiar frame del gráfico
-        for widget in self.grafico_frame.winfo_children():
-            widget.destroy()
-        
         tipo = self.grafico_tipo.get()
         
         try:
+            desde = hasta = None
+            if tipo in ("Ventas por Fecha", "Menús Populares"):
+                try:
+                    desde = self.leer_fecha(self.grafico_desde)
+                    hasta = self.leer_fecha(self.grafico_hasta)
+                except ValueError:
+                    messagebox.showerror("Error", "Las fechas deben tener el formato AAAA-MM-DD")
+                    return
+            
             if tipo == "Ventas por Fecha":
                 periodo = self.grafico_periodo.get()
-                grafico = GraficoFactory.crear_grafico("ventas_fecha", self.session, periodo=periodo)
+                grafico = self.graficos.obtener("ventas_fecha", periodo=periodo, desde=desde, hasta=hasta)
             elif tipo == "Menús Populares":
-                grafico = GraficoFactory.crear_grafico("menus_populares", self.session)
+                criterio = self.grafico_criterio.get()
+                grafico = self.graficos.obtener("menus_populares", criterio=criterio, desde=desde, hasta=hasta)
             elif tipo == "Uso de Ingredientes":
-                grafico = GraficoFactory.crear_grafico("uso_ingredientes", self.session)
+                grafico = self.graficos.obtener("uso_ingredientes")
             else:
                 messagebox.showerror("Error", "Tipo de gráfico no válido")
                 return
-            
-            grafico.generar()
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo generar el gráfico: {str(e)}")
+            return
+        
+        self.consultar_grafico(grafico)
+    
+    def consultar_grafico(self, grafico):
+        # Consultar los datos en segundo plano (solo si cambió su versión); un nuevo pedido
+        # de gráfico reemplaza al anterior
+        self.ejecutor.enviar(
+            "grafico",
+            grafico.preparar,
+            lambda preparado: self.mostrar_grafico(grafico, preparado),
+            lambda e: messagebox.showerror("Error", f"No se pudo generar el gráfico: {str(e)}")
+        )
+    
+    def mostrar_grafico(self, grafico, preparado):
+        try:
+            cambio = grafico.aplicar(preparado)
             figura = grafico.obtener_figura()
             
-            # Integrar el gráfico en la interfaz
-            canvas = FigureCanvasTkAgg(figura, master=self.grafico_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
-            
-            # Ajustar diseño
-            plt.tight_layout()
+            # Integrar el gráfico en la interfaz: un canvas por gráfico en caché, solo el actual visible
+            canvas = self.canvas_graficos.get(grafico)
+            if canvas is None:
+                canvas = self.canvas_graficos[grafico] = FigureCanvasTkAgg(figura, master=self.grafico_frame)
+                cambio = True
+            for otro in self.canvas_graficos.values():
+                if otro is not canvas:
+                    otro.get_tk_widget().pack_forget()
             
+            if cambio:
+                # Ajustar diseño
+                figura.tight_layout()
+                canvas.draw()
+            canvas.get_tk_widget().pack(fill="both", expand=True)
+            self.grafico_actual = grafico
+        
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo generar el gráfico: {str(e)}")
+    
+    def descartar_canvas(self, grafico):
+        canvas = self.canvas_graficos.pop(grafico, None)
+        if canvas is not None:
+            canvas.get_tk_widget().destroy()
+        if self.grafico_actual is grafico:
+            self.grafico_actual = None
 
 # Script para inicializar la aplicación
 if __name__ == "__main__":
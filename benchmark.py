@@ -0,0 +1,754 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import init_db, get_session
+from models import Ingrediente, Menu, Cliente, Pedido, menu_ingrediente
+
+# Benchmarks sobre una base SQLite sintética (nunca sobre restaurante.db).
+# Uso: python benchmark.py [escenario ...]
+
+def crear_base(nombre: str = 'benchmark.db', **opciones):
+    ruta = os.path.join(tempfile.mkdtemp(prefix='restaurante_'), nombre)
+    return init_db(f"sqlite:///{ruta}", informar=None, **opciones)
+
+def sembrar_datos(
+    session: Session,
+    ingredientes: int = 300,
+    menus: int = 200,
+    clientes: int = 1000,
+    pedidos: int = 200000,
+    ingredientes_por_menu: int = 6,
+    dias: int = 3 * 365
+):
+    azar = random.Random(42)
+    hoy = date.today()
+    
+    session.execute(Ingrediente.__table__.insert(), [
+        {'id': i, 'nombre': f"Ingrediente {i}", 'tipo': 'Otro', 'cantidad': 1000000.0, 'unidad_medida': 'g'}
+        for i in range(1, ingredientes + 1)
+    ])
+    session.execute(Menu.__table__.insert(), [
+        {'id': m, 'nombre': f"Menú {m}", 'descripcion': f"Descripción {m}", 'precio': float(azar.randint(3, 30))}
+        for m in range(1, menus + 1)
+    ])
+    session.execute(menu_ingrediente.insert(), [
+        {'menu_id': m, 'ingrediente_id': i, 'cantidad': float(azar.randint(1, 200))}
+        for m in range(1, menus + 1)
+        for i in azar.sample(range(1, ingredientes + 1), ingredientes_por_menu)
+    ])
+    session.execute(Cliente.__table__.insert(), [
+        {'id': c, 'nombre': f"Cliente {c}", 'email': f"cliente{c}@example.com"}
+        for c in range(1, clientes + 1)
+    ])
+    
+    # Insertar pedidos por lotes para no construir toda la lista en memoria
+    lote = 50000
+    for inicio in range(0, pedidos, lote):
+        filas = []
+        for _ in range(min(lote, pedidos - inicio)):
+            cantidad = azar.randint(1, 4)
+            filas.append({
+                'descripcion': None,
+                'total': 10.0 * cantidad,
+                'fecha': hoy - timedelta(days=azar.randint(0, dias)),
+                'cantidad': cantidad,
+                'cliente_id': azar.randint(1, clientes),
+                'menu_id': azar.randint(1, menus)
+            })
+        session.execute(Pedido.__table__.insert(), filas)
+    
+    session.commit()
+    
+    # Los datos sembrados no pasan por los crud: recalcular porciones y resumen de ventas
+    from crud.menu_crud import recalcular_porciones
+    from crud.estadistica_crud import reconstruir_ventas_diarias
+    recalcular_porciones(session)
+    session.commit()
+    reconstruir_ventas_diarias(session)
+
+@contextmanager
+def medir(engine, etiqueta: str):
+    consultas = [0]
+    
+    def contar(*args):
+        consultas[0] += 1
+    
+    event.listen(engine, 'before_cursor_execute', contar)
+    inicio = time.perf_counter()
+    try:
+        yield consultas  # consultas[0] tiene el total al salir del bloque
+    finally:
+        transcurrido = time.perf_counter() - inicio
+        event.remove(engine, 'before_cursor_execute', contar)
+        print(f"{etiqueta:<45} {consultas[0]:>8} consultas {transcurrido:>10.3f} s")
+
+# ========== Uso de ingredientes ==========
+
+def _uso_ingredientes_por_consultas(session: Session):
+    # Algoritmo anterior: una consulta por ingrediente y dos por cada menú que lo usa
+    uso = {}
+    for ingrediente in session.query(Ingrediente).all():
+        menus = session.query(Menu).join(
+            menu_ingrediente, Menu.id == menu_ingrediente.c.menu_id
+        ).filter(menu_ingrediente.c.ingrediente_id == ingrediente.id).all()
+        
+        total = 0.0
+        for menu in menus:
+            fila = session.execute(menu_ingrediente.select().where(
+                (menu_ingrediente.c.menu_id == menu.id) &
+                (menu_ingrediente.c.ingrediente_id == ingrediente.id)
+            )).first()
+            total += (fila.cantidad if fila else 0.0) * session.query(Pedido).filter_by(menu_id=menu.id).count()
+        uso[ingrediente.nombre] = total
+    return uso
+
+def bench_uso_ingredientes():
+    from crud.estadistica_crud import uso_ingredientes
+    
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session)
+    
+    with medir(engine, "uso_ingredientes (consulta por ingrediente)"):
+        _uso_ingredientes_por_consultas(session)
+    session.expunge_all()
+    with medir(engine, "uso_ingredientes (consulta agrupada)"):
+        uso_ingredientes(session)
+    session.close()
+
+# ========== Ranking de menús ==========
+
+def _menus_populares_por_consultas(session: Session):
+    # Algoritmo anterior: todos los menús y un COUNT(*) de pedidos por cada uno
+    conteos = [
+        (menu.nombre, session.query(Pedido).filter_by(menu_id=menu.id).count())
+        for menu in session.query(Menu).all()
+    ]
+    return sorted(conteos, key=lambda fila: fila[1], reverse=True)
+
+def bench_ranking(menus: int = 1000):
+    from crud.estadistica_crud import menus_populares
+    
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, menus=menus)
+    desde = date.today() - timedelta(days=30)
+    
+    with medir(engine, f"ranking de {menus} menús (COUNT por menú)"):
+        _menus_populares_por_consultas(session)
+    session.expunge_all()
+    for criterio in ('pedidos', 'unidades', 'ingresos'):
+        with medir(engine, f"ranking por {criterio} (top 20)"):
+            menus_populares(session, criterio, limite=20)
+    with medir(engine, "ranking por ingresos (top 20, 30 días)"):
+        menus_populares(session, 'ingresos', limite=20, desde=desde)
+    session.close()
+
+# ========== Checkout del carrito ==========
+
+def bench_checkout(checkouts: int = 200, lineas: int = 20):
+    from crud.pedido_crud import crear_pedido, crear_pedidos
+    
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, pedidos=0)
+    azar = random.Random(7)
+    carritos = [
+        [{'menu_id': azar.randint(1, 200), 'cantidad': azar.randint(1, 3)} for _ in range(lineas)]
+        for _ in range(checkouts)
+    ]
+    
+    for etiqueta, realizar in (
+        ("checkout (crear_pedido por item)", lambda c: [crear_pedido(session, 1, i['menu_id'], i['cantidad']) for i in c]),
+        ("checkout (crear_pedidos)", lambda c: crear_pedidos(session, 1, c)),
+    ):
+        inicio = time.perf_counter()
+        with medir(engine, etiqueta):
+            for carrito in carritos:
+                realizar(carrito)
+        transcurrido = time.perf_counter() - inicio
+        print(f"{'':<45} {checkouts * lineas / transcurrido:>8.0f} pedidos/s")
+    session.close()
+
+# ========== Listado de pedidos ==========
+
+def bench_listado_pedidos():
+    from crud.pedido_crud import listar_pedidos
+    
+    # Objetos con carga perezosa (N+1) frente a la proyección en un solo JOIN; que la
+    # proyección no crezca con la tabla lo comprueba tests/test_listado_pedidos.py
+    for pedidos in (100, 10000):
+        engine = crear_base()
+        session = get_session(engine)
+        sembrar_datos(session, pedidos=pedidos)
+        
+        with medir(engine, f"{pedidos} pedidos (objetos + carga perezosa)"):
+            for pedido in listar_pedidos(session):
+                pedido.cliente.nombre, pedido.menu.nombre
+        session.expunge_all()
+        with medir(engine, f"{pedidos} pedidos (proyección)"):
+            listar_pedidos(session, proyeccion=True)
+        session.close()
+
+# ========== Configuración del engine ==========
+
+def bench_motor(escrituras: int = 1000, lecturas: int = 300):
+    from crud.pedido_crud import crear_pedido, listar_pedidos
+    from crud.estadistica_crud import ventas_por_periodo
+    
+    configuraciones = [
+        ("sqlite sin PRAGMAs", lambda: crear_base(pragmas={})),
+        ("sqlite WAL + PRAGMAs", lambda: crear_base()),
+    ]
+    # PostgreSQL opcional: RESTAURANTE_BENCH_PG_URL=postgresql+psycopg2://usuario@host/base_vacia
+    url_pg = os.environ.get('RESTAURANTE_BENCH_PG_URL')
+    if url_pg:
+        configuraciones.append(("postgresql", lambda: init_db(url_pg, informar=None)))
+    
+    for etiqueta, crear in configuraciones:
+        engine = crear()
+        session = get_session(engine)
+        sembrar_datos(session, pedidos=50000)
+        
+        inicio = time.perf_counter()
+        for i in range(escrituras):
+            crear_pedido(session, 1 + i % 1000, 1 + i % 200, 1)
+        transcurrido = time.perf_counter() - inicio
+        print(f"{etiqueta:<25} escritura {escrituras / transcurrido:>10.0f} pedidos/s")
+        
+        inicio = time.perf_counter()
+        for i in range(lecturas):
+            listar_pedidos(session, proyeccion=True, limit=200)
+            ventas_por_periodo(session, 'mensual')
+            session.rollback()
+        transcurrido = time.perf_counter() - inicio
+        print(f"{etiqueta:<25} lectura   {lecturas / transcurrido:>10.0f} consultas/s")
+        session.close()
+        engine.dispose()
+
+# ========== Stock con pedidos concurrentes ==========
+
+def bench_stock_concurrente(hilos: int = 8, pedidos_por_hilo: int = 100):
+    # Varios hilos piden el mismo menú con stock limitado: pedidos aceptados y rechazados
+    # por segundo (que no se pierdan descuentos lo comprueba tests/test_stock.py)
+    from crud.pedido_crud import crear_pedido
+    from crud.ingrediente_crud import consumo_ingredientes
+    
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, pedidos=0)
+    consumo = consumo_ingredientes(session, [{'menu_id': 1, 'cantidad': 1}])
+    
+    # Stock para la mitad de los pedidos: la otra mitad debe rechazarse
+    unidades = hilos * pedidos_por_hilo // 2
+    tabla = Ingrediente.__table__
+    for ingrediente_id, cantidad in consumo.items():
+        session.execute(tabla.update().where(tabla.c.id == ingrediente_id).values(cantidad=cantidad * unidades))
+    session.commit()
+    
+    aceptados = [0] * hilos
+    rechazados = [0] * hilos
+    errores = []
+    
+    def pedir(indice):
+        sesion_hilo = get_session(engine)
+        try:
+            for _ in range(pedidos_por_hilo):
+                try:
+                    crear_pedido(sesion_hilo, 1 + indice, 1, 1)
+                    aceptados[indice] += 1
+                except ValueError:
+                    rechazados[indice] += 1
+        except Exception as e:
+            errores.append(e)
+        finally:
+            sesion_hilo.close()
+    
+    inicio = time.perf_counter()
+    trabajadores = [threading.Thread(target=pedir, args=(i,)) for i in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    transcurrido = time.perf_counter() - inicio
+    
+    session.close()
+    
+    total = sum(aceptados) + sum(rechazados)
+    print(f"{hilos} hilos: {sum(aceptados)} aceptados, {sum(rechazados)} rechazados, "
+          f"{len(errores)} errores en {transcurrido:.3f} s ({total / transcurrido:,.0f} pedidos/s)")
+    if errores:
+        print(f"Primer error: {errores[0]}")
+
+# ========== Unicidad ==========
+
+def _crear_cliente_con_select(session: Session, nombre: str, email: str):
+    # Versión anterior de crear_cliente: SELECT de unicidad antes del INSERT
+    from crud.catalogo import marcar_cambio
+    
+    if session.query(Cliente).filter_by(email=email).first():
+        raise ValueError(f"Ya existe un cliente con el email '{email}'")
+    session.add(Cliente(nombre=nombre, email=email))
+    marcar_cambio(session, 'clientes')
+    session.commit()
+
+def bench_unicidad(hilos: int = 8, emails: int = 200, clientes: int = 2000):
+    # Varios hilos crean los mismos emails a la vez (con crear_cliente y con el upsert).
+    # Después, consultas y tiempo de crear clientes con y sin el SELECT previo. Que no
+    # queden duplicados lo comprueba tests/test_unicidad.py.
+    from crud.cliente_crud import crear_cliente, crear_o_actualizar_cliente
+    
+    engine = crear_base()
+    for etiqueta, funcion in (("crear_cliente", crear_cliente), ("crear_o_actualizar", crear_o_actualizar_cliente)):
+        creados = [0] * hilos
+        rechazados = [0] * hilos
+        errores = []
+        prefijo = etiqueta.replace('_', '')
+        
+        def crear(indice):
+            azar = random.Random(indice)
+            orden = list(range(emails))
+            azar.shuffle(orden)
+            sesion_hilo = get_session(engine)
+            try:
+                for n in orden:
+                    try:
+                        funcion(sesion_hilo, f"Hilo {indice}", f"{prefijo}{n}@example.com")
+                        creados[indice] += 1
+                    except ValueError:
+                        rechazados[indice] += 1
+            except Exception as e:
+                errores.append(e)
+            finally:
+                sesion_hilo.close()
+        
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=crear, args=(i,)) for i in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        transcurrido = time.perf_counter() - inicio
+        
+        session = get_session(engine)
+        filas = session.query(Cliente).filter(Cliente.email.like(f"{prefijo}%")).count()
+        session.close()
+        print(f"{etiqueta:<20} {hilos} hilos x {emails} emails: {filas} clientes, {sum(creados)} aceptados, "
+              f"{sum(rechazados)} rechazados, {len(errores)} errores en {transcurrido:.3f} s")
+    
+    session = get_session(engine)
+    for etiqueta, funcion in (("con SELECT previo", _crear_cliente_con_select), ("crear_cliente", crear_cliente)):
+        prefijo = etiqueta.replace(' ', '')
+        with medir(engine, f"{clientes} nuevos ({etiqueta})"):
+            for c in range(clientes):
+                funcion(session, f"Cliente {c}", f"{prefijo}{c}@example.com")
+        with medir(engine, f"{clientes} repetidos ({etiqueta})"):
+            for c in range(clientes):
+                try:
+                    funcion(session, f"Cliente {c}", f"{prefijo}{c}@example.com")
+                except ValueError:
+                    pass
+    session.close()
+
+# ========== Servidor HTTP ==========
+
+async def _conexion_http(host: str, port: int, solicitudes, resultados):
+    # Una conexión keep-alive que envía sus solicitudes de a una y mide cada respuesta
+    lector, escritor = await asyncio.open_connection(host, port)
+    try:
+        for metodo, ruta, cuerpo in solicitudes:
+            datos = json.dumps(cuerpo).encode('utf-8') if cuerpo is not None else b''
+            inicio = time.perf_counter()
+            escritor.write(
+                f"{metodo} {ruta} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(datos)}\r\n\r\n".encode('latin-1') + datos
+            )
+            await escritor.drain()
+            
+            estado = int((await lector.readline()).split()[1])
+            largo = 0
+            while True:
+                linea = await lector.readline()
+                if linea in (b'\r\n', b''):
+                    break
+                if linea.lower().startswith(b'content-length:'):
+                    largo = int(linea.split(b':')[1])
+            await lector.readexactly(largo)
+            resultados.append((time.perf_counter() - inicio, estado))
+    finally:
+        escritor.close()
+
+def carga_http(host: str, port: int, conexiones: int = 32, pedidos_por_conexion: int = 100, etiqueta: str = ""):
+    # Prueba de carga de POST /pedidos: latencia p50/p99 y pedidos/s
+    azar = random.Random(11)
+    lotes = [
+        [('POST', '/pedidos', {
+            'cliente_id': azar.randint(1, 1000),
+            'items': [{'menu_id': azar.randint(1, 200), 'cantidad': azar.randint(1, 3)}]
+        }) for _ in range(pedidos_por_conexion)]
+        for _ in range(conexiones)
+    ]
+    resultados = []
+    
+    async def correr():
+        await asyncio.gather(*(_conexion_http(host, port, lote, resultados) for lote in lotes))
+    
+    inicio = time.perf_counter()
+    asyncio.run(correr())
+    transcurrido = time.perf_counter() - inicio
+    
+    latencias = sorted(latencia for latencia, _ in resultados)
+    errores = sum(1 for _, estado in resultados if estado != 201)
+    p50 = latencias[len(latencias) // 2] * 1000
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+    print(f"{etiqueta:<25} p50 {p50:>7.1f} ms  p99 {p99:>7.1f} ms  "
+          f"{len(resultados) / transcurrido:>7.0f} pedidos/s  {errores} errores")
+
+def _servidor_en_hilo(engine, **opciones):
+    # Levantar el servidor en un puerto libre, con su propio event loop en otro hilo
+    from servidor import Servidor
+    
+    listo = threading.Event()
+    estado = {}
+    
+    def correr():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        servidor = Servidor(engine, **opciones)
+        escucha = loop.run_until_complete(servidor.iniciar('127.0.0.1', 0))
+        estado.update(loop=loop, servidor=servidor, port=escucha.sockets[0].getsockname()[1])
+        listo.set()
+        loop.run_forever()
+    
+    threading.Thread(target=correr, daemon=True).start()
+    listo.wait()
+    return estado
+
+def bench_servidor(conexiones: int = 32, pedidos_por_conexion: int = 100):
+    # Contra una instancia ya levantada y sembrada: RESTAURANTE_BENCH_URL=http://127.0.0.1:8000
+    url = os.environ.get('RESTAURANTE_BENCH_URL')
+    if url:
+        from urllib.parse import urlsplit
+        partes = urlsplit(url)
+        carga_http(partes.hostname, partes.port or 80, conexiones, pedidos_por_conexion, url)
+        return
+    
+    for etiqueta, maximo_lote in (("sin lotes", 1), ("lotes de hasta 64", 64)):
+        engine = crear_base()
+        session = get_session(engine)
+        sembrar_datos(session, pedidos=0)
+        session.close()
+        
+        estado = _servidor_en_hilo(engine, maximo_lote=maximo_lote)
+        try:
+            carga_http('127.0.0.1', estado['port'], conexiones, pedidos_por_conexion, etiqueta)
+        finally:
+            loop = estado['loop']
+            asyncio.run_coroutine_threadsafe(estado['servidor'].detener(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            engine.dispose()
+
+# ========== Sesiones asíncronas ==========
+
+def _pedidos_de_caja(azar, pedidos: int):
+    return [
+        (azar.randint(1, 1000), [{'menu_id': azar.randint(1, 200), 'cantidad': azar.randint(1, 3)}])
+        for _ in range(pedidos)
+    ]
+
+def bench_async(cajas: int = 32, pedidos_por_caja: int = 50):
+    # Varias cajas tomando pedidos a la vez: un hilo y una Session por caja frente a
+    # una tarea de asyncio y una AsyncSession por caja en un solo event loop
+    from concurrent.futures import ThreadPoolExecutor
+    from database import crear_engine_async, get_async_session
+    from crud.pedido_crud import crear_pedidos
+    from crud import async_crud
+    
+    azar = random.Random(5)
+    cargas = [_pedidos_de_caja(azar, pedidos_por_caja) for _ in range(cajas)]
+    total = cajas * pedidos_por_caja
+    
+    def informar(etiqueta, transcurrido, resultados):
+        latencias = sorted(latencia for caja in resultados for latencia in caja)
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+        errores = total - len(latencias)
+        print(f"{etiqueta:<28} {total / transcurrido:>7.0f} pedidos/s  "
+              f"p50 {latencias[len(latencias) // 2] * 1000:>6.1f} ms  p99 {p99:>6.1f} ms  {errores} errores")
+    
+    # Síncrono: un hilo por caja
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, pedidos=0)
+    session.close()
+    url = str(engine.url)
+    
+    def caja_sync(carga):
+        latencias = []
+        sesion_caja = get_session(engine)
+        try:
+            for cliente_id, items in carga:
+                inicio = time.perf_counter()
+                crear_pedidos(sesion_caja, cliente_id, items)
+                latencias.append(time.perf_counter() - inicio)
+        finally:
+            sesion_caja.close()
+        return latencias
+    
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=cajas) as pool:
+        resultados = list(pool.map(caja_sync, cargas))
+    informar(f"hilos ({cajas})", time.perf_counter() - inicio, resultados)
+    engine.dispose()
+    
+    # Asíncrono: una tarea por caja
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, pedidos=0)
+    session.close()
+    url = str(engine.url)
+    engine.dispose()
+    
+    async def correr():
+        engine_async = crear_engine_async(url)
+        
+        async def caja_async(carga):
+            latencias = []
+            async with get_async_session(engine_async) as sesion_caja:
+                for cliente_id, items in carga:
+                    inicio = time.perf_counter()
+                    await async_crud.crear_pedidos(sesion_caja, cliente_id, items)
+                    latencias.append(time.perf_counter() - inicio)
+            return latencias
+        
+        try:
+            return await asyncio.gather(*(caja_async(carga) for carga in cargas))
+        finally:
+            await engine_async.dispose()
+    
+    inicio = time.perf_counter()
+    resultados = asyncio.run(correr())
+    informar(f"asyncio ({cajas} tareas)", time.perf_counter() - inicio, resultados)
+
+# ========== Memoria de gráficos ==========
+
+def rss_mb() -> float:
+    # Memoria residente actual del proceso (Linux); en otros sistemas, el máximo alcanzado
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / 2 ** 20 if sys.platform == 'darwin' else maximo / 1024
+
+def bench_memoria_graficos(graficos: int = 500, limite_mb: float = 50.0):
+    # Generar gráficos de tipos, períodos y ventanas distintas (más que los que caben en la
+    # caché) con pedidos nuevos entre medio; falla (exit 1) si la memoria sigue creciendo
+    # después del calentamiento
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from graficos import CacheGraficos
+    from crud.pedido_crud import crear_pedido
+    
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, ingredientes=40, menus=30, pedidos=20000, dias=120)
+    
+    cache = CacheGraficos(session)
+    periodos = ['diario', 'semanal', 'mensual', 'anual']
+    hoy = date.today()
+    actualizaciones = 0
+    
+    def generar(i):
+        nonlocal actualizaciones
+        if i % 10 == 0:
+            crear_pedido(session, 1 + i % 1000, 1 + i % 30, 1)
+        tipo = i % 5
+        if tipo < 3:
+            grafico = cache.obtener(
+                'ventas_fecha', periodo=periodos[i % 4], desde=hoy - timedelta(days=30 * (1 + i % 3)), hasta=None
+            )
+        elif tipo == 3:
+            grafico = cache.obtener('menus_populares')
+        else:
+            grafico = cache.obtener('uso_ingredientes')
+        if grafico.aplicar(grafico.preparar(session)):
+            actualizaciones += 1
+            FigureCanvasAgg(grafico.obtener_figura()).draw()
+    
+    calentamiento = graficos // 5
+    for i in range(calentamiento):
+        generar(i)
+    base = rss_mb()
+    
+    inicio = time.perf_counter()
+    for i in range(calentamiento, graficos):
+        generar(i)
+    transcurrido = time.perf_counter() - inicio
+    final = rss_mb()
+    cache.limpiar()
+    session.close()
+    
+    crecimiento = final - base
+    correcto = crecimiento < limite_mb
+    print(f"{graficos} gráficos ({actualizaciones} redibujados): RSS {base:.1f} -> {final:.1f} MB "
+          f"(+{crecimiento:.1f} MB, límite {limite_mb:.0f}) en {transcurrido:.2f} s -> {'ok' if correcto else 'FALLA'}")
+    if not correcto:
+        sys.exit(1)
+
+# ========== Boletas en PDF ==========
+
+def bench_boletas(pedidos: int = 2000):
+    # Boletas por segundo con uno y con varios procesos; la memoria del proceso principal
+    # no debe depender de la cantidad de pedidos (se recorren por lotes)
+    from reportes import generar_boletas
+    
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, pedidos=pedidos)
+    session.close()
+    
+    for procesos in sorted({1, os.cpu_count() or 1}):
+        carpeta = tempfile.mkdtemp(prefix='boletas_')
+        antes = rss_mb()
+        inicio = time.perf_counter()
+        generadas = generar_boletas(engine, carpeta, procesos=procesos)
+        transcurrido = time.perf_counter() - inicio
+        print(f"{procesos} proceso(s): {generadas} boletas en {transcurrido:.2f} s "
+              f"({generadas / transcurrido:.0f}/s), RSS principal {antes:.1f} -> {rss_mb():.1f} MB")
+
+# ========== Exportación ==========
+
+@contextmanager
+def pico_rss(resultado: list):
+    # Sondear la memoria residente en un hilo y dejar el máximo en resultado[0]
+    resultado[:] = [rss_mb()]
+    terminado = threading.Event()
+    
+    def sondear():
+        while not terminado.wait(0.01):
+            resultado[0] = max(resultado[0], rss_mb())
+    
+    hilo = threading.Thread(target=sondear, daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        terminado.set()
+        hilo.join()
+
+def bench_exportar(pedidos: int = 500000):
+    # Filas por segundo y pico de memoria al exportar pedidos en cada formato, contra leer
+    # todo con .all() y escribir después
+    import exportar
+    
+    engine = crear_base()
+    session = get_session(engine)
+    sembrar_datos(session, pedidos=pedidos)
+    carpeta = tempfile.mkdtemp(prefix='exportacion_')
+    pico = [0.0]
+    
+    formatos = ['csv']
+    try:
+        import pyarrow
+        formatos += ['parquet', 'arrow']
+    except ImportError:
+        print("pyarrow no instalado: solo CSV")
+    
+    for formato in formatos:
+        ruta = os.path.join(carpeta, 'pedidos' + exportar.FORMATOS[formato])
+        antes = rss_mb()
+        with pico_rss(pico):
+            inicio = time.perf_counter()
+            filas = exportar.exportar(session, 'pedidos', ruta, formato)
+            transcurrido = time.perf_counter() - inicio
+        print(f"{formato:<8} {filas} filas en {transcurrido:.2f} s ({filas / transcurrido:,.0f} filas/s), "
+              f"pico RSS +{pico[0] - antes:.1f} MB, {os.path.getsize(ruta) / 2 ** 20:.1f} MB en disco")
+    
+    # Referencia: todas las filas en memoria antes de escribir
+    stmt, columnas = exportar._consulta('pedidos')
+    antes = rss_mb()
+    with pico_rss(pico):
+        inicio = time.perf_counter()
+        filas = session.execute(stmt).all()
+        escritor = exportar._EscritorCSV(os.path.join(carpeta, 'pedidos_all.csv'), columnas)
+        escritor.escribir(filas)
+        escritor.cerrar()
+        transcurrido = time.perf_counter() - inicio
+    print(f"{'csv .all()':<8} {len(filas)} filas en {transcurrido:.2f} s ({len(filas) / transcurrido:,.0f} filas/s), "
+          f"pico RSS +{pico[0] - antes:.1f} MB")
+    del filas
+    session.close()
+
+# ========== Importación ==========
+
+def bench_importar(clientes: int = 100000, uno_a_uno: int = 2000):
+    # Importar clientes desde CSV, volver a importarlos actualizando (ON CONFLICT) y, como
+    # referencia, crear una muestra con crear_cliente (SELECT de unicidad + commit por fila)
+    import csv
+    from importar import importar
+    from crud.cliente_crud import crear_cliente
+    
+    carpeta = tempfile.mkdtemp(prefix='importacion_')
+    ruta = os.path.join(carpeta, 'clientes.csv')
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['nombre', 'email'])
+        escritor.writerows((f"Cliente {c}", f"cliente{c}@example.com") for c in range(clientes))
+        escritor.writerow(['Repetido', 'cliente0@example.com'])
+    
+    engine = crear_base()
+    session = get_session(engine)
+    for etiqueta, actualizar in (("importar", False), ("importar --actualizar", True)):
+        inicio = time.perf_counter()
+        resultado = importar(session, 'clientes', ruta, actualizar=actualizar)
+        transcurrido = time.perf_counter() - inicio
+        print(f"{etiqueta:<22} {resultado['insertadas']} insertadas, {resultado['actualizadas']} actualizadas, "
+              f"{len(resultado['rechazadas'])} rechazadas en {transcurrido:.2f} s "
+              f"({(clientes + 1) / transcurrido:,.0f} filas/s)")
+    
+    inicio = time.perf_counter()
+    for c in range(uno_a_uno):
+        crear_cliente(session, f"Nuevo {c}", f"nuevo{c}@example.com")
+    transcurrido = time.perf_counter() - inicio
+    print(f"{'crear_cliente':<22} {uno_a_uno} en {transcurrido:.2f} s ({uno_a_uno / transcurrido:,.0f} filas/s, "
+          f"{clientes} tardarían ~{clientes * transcurrido / uno_a_uno:.0f} s)")
+    session.close()
+
+ESCENARIOS = {
+    'uso_ingredientes': bench_uso_ingredientes,
+    'ranking': bench_ranking,
+    'checkout': bench_checkout,
+    'listado_pedidos': bench_listado_pedidos,
+    'motor': bench_motor,
+    'stock_concurrente': bench_stock_concurrente,
+    'unicidad': bench_unicidad,
+    'servidor': bench_servidor,
+    'async': bench_async,
+    'memoria_graficos': bench_memoria_graficos,
+    'boletas': bench_boletas,
+    'exportar': bench_exportar,
+    'importar': bench_importar,
+}
+
+def main():
+    nombres = sys.argv[1:] or list(ESCENARIOS)
+    for nombre in nombres:
+        if nombre not in ESCENARIOS:
+            print(f"Escenario no válido: {nombre}. Opciones: {', '.join(ESCENARIOS)}")
+            sys.exit(1)
+        print(f"== {nombre} ==")
+        ESCENARIOS[nombre]()
+
+if __name__ == "__main__":
+    main()
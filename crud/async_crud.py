@@ -0,0 +1,147 @@
+import asyncio
+import functools
+import weakref
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud import cliente_crud, ingrediente_crud, menu_crud, pedido_crud, estadistica_crud
+
+# Versiones asíncronas de las funciones crud, para servicios con asyncio que atienden varias
+# cajas desde un solo event loop. Cada una ejecuta la función síncrona con
+# AsyncSession.run_sync: validaciones, mensajes de error, caché del catálogo y descuento de
+# stock son exactamente los mismos, y la E/S con la base (aiosqlite o asyncpg) no bloquea
+# el event loop.
+#
+# Uso:
+#     engine = crear_engine_async()
+#     async with get_async_session(engine) as session:
+#         pedidos = await crear_pedidos(session, cliente_id, items)
+#
+# Las sesiones deben crearse con get_async_session (expire_on_commit=False): fuera de
+# run_sync no se pueden recargar atributos vencidos ni relaciones perezosas.
+#
+# SQLite admite un solo escritor: las funciones que escriben se encolan por engine en el
+# event loop en lugar de competir por el bloqueo de la base, que se espera por sondeo
+# (busy_timeout) y con muchas tareas a la vez agota el plazo. Las lecturas no se encolan.
+# Las que no confirman (descontar_stock, acumular_ventas...) dejan abierta la transacción
+# de escritura: la sesión conserva el turno hasta su commit, rollback o close.
+
+_escritores = weakref.WeakKeyDictionary()  # event loop -> {engine: asyncio.Lock}
+
+def _cargar_vencidos(session, resultado):
+    # Cargar dentro de run_sync los atributos vencidos de las entidades devueltas
+    # (por ejemplo porciones_disponibles tras recalcularlas) para leerlos luego sin E/S
+    for instancia in resultado if isinstance(resultado, list) else [resultado]:
+        estado = inspect(instancia, raiseerr=False)
+        if estado is not None and getattr(estado, 'persistent', False) and estado.expired_attributes:
+            session.refresh(instancia, attribute_names=list(estado.expired_attributes))
+
+def _turno_escritura(session: AsyncSession):
+    # Un asyncio.Lock solo sirve dentro de un event loop: uno por (loop, engine)
+    engine = session.bind.sync_engine
+    if engine.dialect.name != 'sqlite':
+        return None
+    por_engine = _escritores.setdefault(asyncio.get_running_loop(), weakref.WeakKeyDictionary())
+    if engine not in por_engine:
+        por_engine[engine] = asyncio.Lock()
+    return por_engine[engine]
+
+def _contar_commit(session):
+    session.info['commits'] = session.info.get('commits', 0) + 1
+
+def _soltar_turno(session, transaccion):
+    # Fin de la transacción de la sesión (no de un savepoint): liberar el turno retenido
+    if transaccion.parent is None:
+        turno = session.info.pop('turno_escritura', None)
+        if turno is not None:
+            turno.release()
+
+def _vigilar_transacciones(sesion_sync):
+    if not sesion_sync.info.get('vigilada'):
+        sesion_sync.info['vigilada'] = True
+        event.listen(sesion_sync, 'after_commit', _contar_commit)
+        event.listen(sesion_sync, 'after_transaction_end', _soltar_turno)
+
+def _asincrona(funcion, escritura: bool = False):
+    @functools.wraps(funcion)
+    async def envoltura(session: AsyncSession, *args, **kwargs):
+        def ejecutar(sesion_sync):
+            resultado = funcion(sesion_sync, *args, **kwargs)
+            _cargar_vencidos(sesion_sync, resultado)
+            return resultado
+        
+        sesion_sync = session.sync_session
+        turno = None
+        if escritura and 'turno_escritura' not in sesion_sync.info:
+            turno = _turno_escritura(session)
+        if turno is None:
+            # Lectura, otro motor o la sesión ya tiene el turno
+            return await session.run_sync(ejecutar)
+        
+        _vigilar_transacciones(sesion_sync)
+        await turno.acquire()
+        commits = sesion_sync.info.get('commits', 0)
+        try:
+            return await session.run_sync(ejecutar)
+        finally:
+            if sesion_sync.in_transaction() and sesion_sync.info.get('commits', 0) == commits:
+                # Escritura sin confirmar: el turno se libera al terminar la transacción
+                sesion_sync.info['turno_escritura'] = turno
+            else:
+                turno.release()
+    return envoltura
+
+# ========== Clientes ==========
+
+crear_cliente = _asincrona(cliente_crud.crear_cliente, escritura=True)
+crear_o_actualizar_cliente = _asincrona(cliente_crud.crear_o_actualizar_cliente, escritura=True)
+obtener_cliente = _asincrona(cliente_crud.obtener_cliente)
+listar_clientes = _asincrona(cliente_crud.listar_clientes)
+buscar_clientes = _asincrona(cliente_crud.buscar_clientes)
+actualizar_cliente = _asincrona(cliente_crud.actualizar_cliente, escritura=True)
+eliminar_cliente = _asincrona(cliente_crud.eliminar_cliente, escritura=True)
+
+# ========== Ingredientes y stock ==========
+
+crear_ingrediente = _asincrona(ingrediente_crud.crear_ingrediente, escritura=True)
+crear_o_actualizar_ingrediente = _asincrona(ingrediente_crud.crear_o_actualizar_ingrediente, escritura=True)
+obtener_ingrediente = _asincrona(ingrediente_crud.obtener_ingrediente)
+listar_ingredientes = _asincrona(ingrediente_crud.listar_ingredientes)
+buscar_ingredientes = _asincrona(ingrediente_crud.buscar_ingredientes)
+actualizar_ingrediente = _asincrona(ingrediente_crud.actualizar_ingrediente, escritura=True)
+eliminar_ingrediente = _asincrona(ingrediente_crud.eliminar_ingrediente, escritura=True)
+consumo_ingredientes = _asincrona(ingrediente_crud.consumo_ingredientes)
+descontar_stock = _asincrona(ingrediente_crud.descontar_stock, escritura=True)
+reponer_stock = _asincrona(ingrediente_crud.reponer_stock, escritura=True)
+
+# ========== Menús ==========
+
+crear_menu = _asincrona(menu_crud.crear_menu, escritura=True)
+crear_o_actualizar_menu = _asincrona(menu_crud.crear_o_actualizar_menu, escritura=True)
+obtener_menu = _asincrona(menu_crud.obtener_menu)
+listar_menus = _asincrona(menu_crud.listar_menus)
+buscar_menus = _asincrona(menu_crud.buscar_menus)
+actualizar_menu = _asincrona(menu_crud.actualizar_menu, escritura=True)
+eliminar_menu = _asincrona(menu_crud.eliminar_menu, escritura=True)
+recalcular_porciones = _asincrona(menu_crud.recalcular_porciones, escritura=True)
+listar_menus_disponibles = _asincrona(menu_crud.listar_menus_disponibles)
+obtener_ingredientes_menu = _asincrona(menu_crud.obtener_ingredientes_menu)
+
+# ========== Pedidos ==========
+
+crear_pedido = _asincrona(pedido_crud.crear_pedido, escritura=True)
+crear_pedidos = _asincrona(pedido_crud.crear_pedidos, escritura=True)
+crear_pedidos_en_lote = _asincrona(pedido_crud.crear_pedidos_en_lote, escritura=True)
+obtener_pedido = _asincrona(pedido_crud.obtener_pedido)
+listar_pedidos = _asincrona(pedido_crud.listar_pedidos)
+listar_pedidos_por_cliente = _asincrona(pedido_crud.listar_pedidos_por_cliente)
+listar_pedidos_por_ids = _asincrona(pedido_crud.listar_pedidos_por_ids)
+eliminar_pedido = _asincrona(pedido_crud.eliminar_pedido, escritura=True)
+
+# ========== Estadísticas ==========
+
+acumular_ventas = _asincrona(estadistica_crud.acumular_ventas, escritura=True)
+reconstruir_ventas_diarias = _asincrona(estadistica_crud.reconstruir_ventas_diarias, escritura=True)
+resumen_ventas = _asincrona(estadistica_crud.resumen_ventas)
+uso_ingredientes = _asincrona(estadistica_crud.uso_ingredientes)
+ventas_por_periodo = _asincrona(estadistica_crud.ventas_por_periodo)
+menus_populares = _asincrona(estadistica_crud.menus_populares)
\ No newline at end of file
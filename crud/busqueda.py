@@ -0,0 +1,113 @@
+from sqlalchemy import Float, Integer, and_, or_, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from typing import List
+
+# Búsqueda por texto sobre el catálogo. En SQLite se usa un índice FTS5 por tabla
+# (external content: el índice no duplica los datos y lo mantienen triggers); si FTS5 no
+# está disponible, o la base es PostgreSQL, se busca con LIKE sobre las mismas columnas.
+
+# tabla -> columnas indexadas
+INDICES_FTS = {
+    'clientes': ['nombre', 'email'],
+    'menus': ['nombre', 'descripcion'],
+    'ingredientes': ['nombre', 'tipo']
+}
+
+# Largo mínimo de cada palabra buscada: con prefijos de una letra coincide casi toda la
+# tabla (y no hay índice de prefijos para ellos); las palabras más cortas se ignoran
+MINIMO_PREFIJO = 2
+
+_fts_disponible = {}  # url del engine -> bool
+
+def crear_indices_fts(engine) -> bool:
+    # Crear (o reconstruir) las tablas FTS5 y sus triggers. Devuelve False si la base no
+    # soporta FTS5; en ese caso las búsquedas usan LIKE.
+    if engine.dialect.name != 'sqlite':
+        return False
+    
+    with engine.begin() as conexion:
+        for tabla, columnas in INDICES_FTS.items():
+            fts = f"{tabla}_fts"
+            lista = ", ".join(columnas)
+            nuevos = ", ".join(f"new.{columna}" for columna in columnas)
+            viejos = ", ".join(f"old.{columna}" for columna in columnas)
+            try:
+                conexion.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{lista}, content='{tabla}', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                ))
+            except OperationalError:
+                return False  # SQLite compilado sin FTS5
+            
+            conexion.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+                f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END"
+            ))
+            conexion.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); END"
+            ))
+            # Solo al cambiar columnas indexadas (no, p. ej., el stock o las porciones)
+            conexion.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {lista} ON {tabla} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); "
+                f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END"
+            ))
+            conexion.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    
+    _fts_disponible[str(engine.url)] = True
+    return True
+
+def _usa_fts(session: Session) -> bool:
+    engine = session.get_bind()
+    clave = str(engine.url)
+    if clave not in _fts_disponible:
+        _fts_disponible[clave] = engine.dialect.name == 'sqlite' and session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"
+        ), {'nombre': 'clientes_fts'}).first() is not None
+    return _fts_disponible[clave]
+
+def _terminos(texto: str) -> List[str]:
+    return [termino for termino in texto.split() if len(termino) >= MINIMO_PREFIJO]
+
+def _escapar_like(termino: str) -> str:
+    return termino.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def buscar(session: Session, modelo, texto: str, limite: int = 20) -> List:
+    # Las primeras `limite` filas del modelo que contienen todas las palabras del texto
+    # (cada una como prefijo), ordenadas por relevancia. Sin texto: las primeras por id;
+    # con solo palabras más cortas que MINIMO_PREFIJO: ninguna.
+    tabla = modelo.__tablename__
+    columnas = INDICES_FTS[tabla]
+    
+    if not texto.strip():
+        return session.query(modelo).order_by(modelo.id).limit(limite).all()
+    
+    terminos = _terminos(texto)
+    if not terminos:
+        return []
+    
+    if _usa_fts(session):
+        # Ordenar por relevancia todas las coincidencias (no solo las primeras por rowid):
+        # SQLite calcula bm25 por fila y conserva las `limite` mejores
+        consulta = " ".join('"' + termino.replace('"', '""') + '"*' for termino in terminos)
+        coincidencias = text(
+            f"SELECT rowid, rank FROM {tabla}_fts WHERE {tabla}_fts MATCH :consulta "
+            f"ORDER BY rank LIMIT :limite"
+        ).bindparams(consulta=consulta, limite=limite).columns(rowid=Integer, rank=Float).subquery()
+        return (
+            session.query(modelo)
+            .join(coincidencias, coincidencias.c.rowid == modelo.id)
+            .order_by(coincidencias.c.rank)
+            .all()
+        )
+    
+    # Alternativa sin FTS: cada palabra debe aparecer (literal, sin comodines) en alguna
+    # de las columnas
+    condiciones = [
+        or_(*(getattr(modelo, columna).ilike(f"%{_escapar_like(termino)}%", escape='\\') for columna in columnas))
+        for termino in terminos
+    ]
+    return session.query(modelo).filter(and_(*condiciones)).order_by(modelo.nombre).limit(limite).all()
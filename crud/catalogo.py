@@ -0,0 +1,212 @@
+import threading
+import time
+import weakref
+from collections import namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import insert_para
+from models import Ingrediente, Menu, Cliente, VersionCatalogo
+from typing import List, Dict
+
+# Caché en memoria del catálogo (menús, clientes, ingredientes): datos pequeños que cambian
+# poco y se consultan en cada paso de la toma de pedidos. Cada entidad se guarda como una
+# instantánea de filas de solo lectura con índices por id y por nombre (o email), una por
+# engine: dos bases abiertas en el mismo proceso no comparten filas ni versiones.
+#
+# Invalidación:
+# - En este proceso, las funciones crud llaman a marcar_cambio antes de confirmar y la
+#   caché de la entidad se descarta al hacer commit.
+# - Para otros procesos que comparten la base, marcar_cambio incrementa además la versión
+#   de la entidad en catalogo_version; se compara como mucho cada INTERVALO_VERIFICACION
+#   segundos con una sola consulta para todas las entidades.
+#
+# El stock de ingredientes y las porciones de los menús cambian con cada pedido: no forman
+# parte de la instantánea de la entidad sino de una columna aparte, versionada con la clave
+# STOCK. Una venta solo relee (id, stock) y no descarta nombres ni precios.
+#
+# Entidades sin caché aquí (como 'ventas') también pueden llevar versión: otras cachés
+# derivadas (los gráficos) la consultan con versiones().
+
+INTERVALO_VERIFICACION = 2.0
+STOCK = 'stock'
+
+def _engine(session: Session):
+    # get_bind() puede devolver una Connection; ambas exponen .engine
+    return session.get_bind().engine
+
+class _Instantanea:
+    # Estado de la caché de una entidad para un engine
+    def __init__(self):
+        self.base = None
+        self.valores = None
+        self.filas = None
+        self.por_id = {}
+        self.por_nombre = {}
+        self.version = None
+        self.version_stock = None
+
+class Catalogo:
+    def __init__(self, entidad: str, columnas: list, clave_nombre, volatiles: list = ()):
+        self.entidad = entidad
+        self.columnas = columnas
+        self.clave_nombre = clave_nombre
+        self.volatiles = list(volatiles)
+        self.Fila = namedtuple(f"Fila_{entidad}", [columna.key for columna in columnas + self.volatiles])
+        self.instantaneas = weakref.WeakKeyDictionary()  # engine -> _Instantanea
+    
+    def _instantaneas(self, engine=None) -> List[_Instantanea]:
+        # Llamar con _lock tomado. Sin engine, las de todos
+        if engine is None:
+            return list(self.instantaneas.values())
+        instantanea = self.instantaneas.get(engine)
+        return [instantanea] if instantanea is not None else []
+    
+    def invalidar(self, engine=None):
+        with _lock:
+            for instantanea in self._instantaneas(engine):
+                instantanea.base = None
+                instantanea.filas = None
+    
+    def invalidar_stock(self, engine=None):
+        with _lock:
+            for instantanea in self._instantaneas(engine):
+                instantanea.valores = None
+                instantanea.filas = None
+    
+    def _asegurar(self, session: Session):
+        engine = _engine(session)
+        versiones = _versiones(session)
+        version = versiones.get(self.entidad, 0)
+        version_stock = versiones.get(STOCK, 0) if self.volatiles else None
+        with _lock:
+            actual = self.instantaneas.get(engine)
+            if actual is None:
+                actual = self.instantaneas[engine] = _Instantanea()
+            if actual.filas is not None and actual.version == version and actual.version_stock == version_stock:
+                return actual.filas, actual.por_id, actual.por_nombre
+            base = actual.base if actual.version == version else None
+            valores = actual.valores if actual.version_stock == version_stock else None
+        
+        # Recargar fuera del lock solo la parte vencida: una consulta por la entidad y otra,
+        # angosta, por el stock. Con filas nuevas se releen las dos.
+        if base is None:
+            base = session.query(*self.columnas).order_by(self.columnas[0]).all()
+            valores = None
+        if self.volatiles and valores is None:
+            valores = {fila[0]: tuple(fila[1:]) for fila in session.query(self.columnas[0], *self.volatiles).all()}
+        
+        vacios = (None,) * len(self.volatiles)
+        filas = [self.Fila(*fila, *(valores.get(fila.id, vacios) if valores else ())) for fila in base]
+        por_id = {fila.id: fila for fila in filas}
+        por_nombre = {getattr(fila, self.clave_nombre.key): fila for fila in filas}
+        
+        with _lock:
+            actual.base, actual.valores, actual.version, actual.version_stock = base, valores, version, version_stock
+            actual.filas, actual.por_id, actual.por_nombre = filas, por_id, por_nombre
+        return filas, por_id, por_nombre
+    
+    def listar(self, session: Session) -> List:
+        return list(self._asegurar(session)[0])
+    
+    def obtener(self, session: Session, id: int):
+        return self._asegurar(session)[1].get(id)
+    
+    def obtener_por_nombre(self, session: Session, nombre: str):
+        return self._asegurar(session)[2].get(nombre)
+
+menus = Catalogo(
+    'menus', [Menu.id, Menu.nombre, Menu.descripcion, Menu.precio], Menu.nombre,
+    volatiles=[Menu.porciones_disponibles]
+)
+clientes = Catalogo('clientes', [Cliente.id, Cliente.nombre, Cliente.email], Cliente.email)
+ingredientes = Catalogo(
+    'ingredientes', [Ingrediente.id, Ingrediente.nombre, Ingrediente.tipo, Ingrediente.unidad_medida],
+    Ingrediente.nombre, volatiles=[Ingrediente.cantidad]
+)
+
+CATALOGOS = {catalogo.entidad: catalogo for catalogo in (menus, clientes, ingredientes)}
+
+_lock = threading.Lock()
+_verificaciones = weakref.WeakKeyDictionary()  # engine -> (versiones, momento de la lectura)
+
+def _versiones(session: Session) -> Dict[str, int]:
+    # Versiones de todas las entidades, leídas de la base como mucho una vez por intervalo
+    engine = _engine(session)
+    ahora = time.monotonic()
+    with _lock:
+        versiones, ultima = _verificaciones.get(engine, ({}, None))
+        if ultima is not None and ahora - ultima < INTERVALO_VERIFICACION:
+            return versiones
+    
+    versiones = dict(session.query(VersionCatalogo.entidad, VersionCatalogo.version).all())
+    with _lock:
+        _verificaciones[engine] = (versiones, ahora)
+    return versiones
+
+def _releer_versiones(engine=None):
+    # Forzar la lectura de versiones en la próxima consulta (de un engine o de todos)
+    with _lock:
+        for clave in [engine] if engine is not None else list(_verificaciones):
+            if clave in _verificaciones:
+                _verificaciones[clave] = (_verificaciones[clave][0], None)
+
+def versiones(session: Session, entidades) -> tuple:
+    actuales = _versiones(session)
+    return tuple(actuales.get(entidad, 0) for entidad in entidades)
+
+def marcar_cambio(session: Session, entidad: str):
+    # Llamar dentro de la transacción que modifica la entidad, antes del commit.
+    # catalogo_cambios: entidad -> transacción (o savepoint) en la que se incrementó
+    cambios = session.info.setdefault('catalogo_cambios', {})
+    if entidad in cambios:
+        return  # Ya se incrementó en esta transacción
+    
+    tabla = VersionCatalogo.__table__
+    stmt = insert_para(session, tabla).values(entidad=entidad, version=1)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[tabla.c.entidad],
+        set_={'version': tabla.c.version + 1}
+    ))
+    cambios[entidad] = session.get_nested_transaction() or session.get_transaction()
+
+def invalidar_todo():
+    for catalogo in CATALOGOS.values():
+        catalogo.invalidar()
+    _releer_versiones()
+
+@event.listens_for(Session, 'after_commit')
+def _al_confirmar(session):
+    # La versión nueva ya está en la base: descartar la caché local y releer versiones.
+    # También se llama al liberar un savepoint; ahí los cambios aún no están confirmados.
+    if session.in_nested_transaction():
+        return
+    cambios = session.info.pop('catalogo_cambios', None)
+    if not cambios:
+        return
+    engine = _engine(session)
+    for entidad in cambios:
+        if entidad in CATALOGOS:
+            CATALOGOS[entidad].invalidar(engine)
+        elif entidad == STOCK:
+            for catalogo in CATALOGOS.values():
+                if catalogo.volatiles:
+                    catalogo.invalidar_stock(engine)
+    _releer_versiones(engine)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _al_deshacer(session, transaccion_anterior):
+    # Al deshacer la transacción externa se olvidan todas las marcas. Un savepoint deshecho
+    # anula también el incremento de versión que se hizo dentro de él (o de un savepoint
+    # anidado): se olvida esa marca para que un cambio posterior vuelva a incrementarla.
+    if transaccion_anterior.parent is None:
+        session.info.pop('catalogo_cambios', None)
+        return
+    
+    cambios = session.info.get('catalogo_cambios')
+    if not cambios:
+        return
+    for entidad, transaccion in list(cambios.items()):
+        while transaccion is not None and transaccion is not transaccion_anterior:
+            transaccion = transaccion.parent
+        if transaccion is not None:
+            del cambios[entidad]
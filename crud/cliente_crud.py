@@ -1,23 +1,57 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from database import es_clave_duplicada, insert_para
 from models import Cliente
+from crud.catalogo import marcar_cambio
+from crud.busqueda import buscar
 from typing import List, Optional
 
+def _confirmar(session: Session, email: str):
+    # La restricción UNIQUE de email decide si está repetido: sin SELECT previo, y dos cajas
+    # que crean el mismo email a la vez no pueden dejar duplicados
+    try:
+        session.flush()
+        marcar_cambio(session, 'clientes')
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        if es_clave_duplicada(e):
+            raise ValueError(f"Ya existe un cliente con el email '{email}'") from None
+        raise
+
 def crear_cliente(session: Session, nombre: str, email: str) -> Cliente:
-    # Verificar si el cliente ya existe
-    existente = session.query(Cliente).filter_by(email=email).first()
-    if existente:
-        raise ValueError(f"Ya existe un cliente con el email '{email}'")
-    
     cliente = Cliente(nombre=nombre, email=email)
     session.add(cliente)
+    _confirmar(session, email)
+    return cliente
+
+def crear_o_actualizar_cliente(session: Session, nombre: str, email: str) -> Cliente:
+    # Upsert por email en una sola sentencia (INSERT ... ON CONFLICT DO UPDATE ... RETURNING)
+    stmt = insert_para(session, Cliente).values(nombre=nombre, email=email)
+    stmt = stmt.on_conflict_do_update(index_elements=[Cliente.email], set_={'nombre': stmt.excluded.nombre})
+    cliente = session.scalars(
+        stmt.returning(Cliente), execution_options={'populate_existing': True}
+    ).one()
+    marcar_cambio(session, 'clientes')
     session.commit()
     return cliente
 
 def obtener_cliente(session: Session, cliente_id: int) -> Optional[Cliente]:
     return session.query(Cliente).filter_by(id=cliente_id).first()
 
-def listar_clientes(session: Session) -> List[Cliente]:
-    return session.query(Cliente).all()
+def listar_clientes(session: Session, after_id: int = None, limit: int = None) -> List[Cliente]:
+    # Paginación por clave (keyset): filas con id mayor que after_id, como máximo limit
+    query = session.query(Cliente)
+    if after_id is not None:
+        query = query.filter(Cliente.id > after_id)
+    query = query.order_by(Cliente.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def buscar_clientes(session: Session, texto: str, limite: int = 20) -> List[Cliente]:
+    # Búsqueda por prefijo de palabras (índice FTS5 en SQLite), de más a menos relevante
+    return buscar(session, Cliente, texto, limite)
 
 def actualizar_cliente(
     session: Session, 
@@ -33,12 +67,9 @@ def actualizar_cliente(
         cliente.nombre = nombre
     
     if email is not None:
-        # Verificar si el nuevo email ya existe
-        if email != cliente.email and session.query(Cliente).filter_by(email=email).first():
-            raise ValueError(f"Ya existe un cliente con el email '{email}'")
         cliente.email = email
     
-    session.commit()
+    _confirmar(session, email)
     return cliente
 
 def eliminar_cliente(session: Session, cliente_id: int) -> bool:
@@ -47,5 +78,6 @@ def eliminar_cliente(session: Session, cliente_id: int) -> bool:
         return False
     
     session.delete(cliente)
+    marcar_cambio(session, 'clientes')
     session.commit()
     return True
\ No newline at end of file
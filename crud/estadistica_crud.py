@@ -0,0 +1,259 @@
+from sqlalchemy import func, cast, bindparam, Integer, String, select, text
+from sqlalchemy.orm import Session
+from database import insert_para
+from crud.catalogo import marcar_cambio
+from models import Ingrediente, Menu, Pedido, ReconstruccionVentas, VentaDiaria, menu_ingrediente
+from datetime import date
+from typing import List, Tuple, Iterable
+
+# Formato de agrupación (strftime) para cada período de ventas
+FORMATOS_PERIODO = {
+    'diario': '%Y-%m-%d',
+    'semanal': '%Y-%U',
+    'mensual': '%Y-%m',
+    'anual': '%Y'
+}
+
+# Equivalentes de to_char para PostgreSQL (la semana se calcula aparte)
+FORMATOS_PERIODO_POSTGRESQL = {
+    'diario': 'YYYY-MM-DD',
+    'mensual': 'YYYY-MM',
+    'anual': 'YYYY'
+}
+
+# Columna del resumen por la que se ordena el ranking de menús
+CRITERIOS_RANKING = ('pedidos', 'unidades', 'ingresos')
+
+def _expresion_periodo(session: Session, periodo: str, columna):
+    postgresql = session.get_bind().dialect.name == 'postgresql'
+    if periodo != 'semanal':
+        if postgresql:
+            return func.to_char(columna, FORMATOS_PERIODO_POSTGRESQL[periodo])
+        return func.strftime(FORMATOS_PERIODO[periodo], columna)
+    
+    # Semana del año con domingo como primer día (%U de Python), calculada a partir del
+    # día del año y del día de la semana: SQLite < 3.46 no soporta %U y PostgreSQL no lo tiene
+    if postgresql:
+        dia_año = cast(func.extract('doy', columna), Integer) - 1
+        dia_semana = cast(func.extract('dow', columna), Integer)
+        semana = (dia_año + 7 - dia_semana) // 7
+        return func.to_char(columna, 'YYYY') + '-' + func.lpad(cast(semana, String), 2, '0')
+    
+    dia_año = cast(func.strftime('%j', columna), Integer) - 1
+    dia_semana = cast(func.strftime('%w', columna), Integer)
+    semana = (dia_año + 7 - dia_semana) // 7
+    return func.strftime('%Y', columna) + '-' + func.printf('%02d', semana)
+
+# ========== Resumen de ventas diarias ==========
+
+def acumular_ventas(session: Session, pedidos: Iterable[Pedido], signo: int = 1):
+    # Agrupar los pedidos por (fecha, menú) y sumarlos al resumen (o restarlos con signo=-1).
+    # No confirma: se ejecuta dentro de la transacción del pedido.
+    pendientes = None
+    if signo < 0:
+        pendientes = _pendientes_reconstruccion(session)
+    
+    deltas = {}
+    for pedido in pedidos:
+        if pedido.fecha is None or pedido.menu_id is None:
+            continue
+        if pendientes is not None and pendientes[0] < pedido.id <= pendientes[1]:
+            # Todavía no lo sumó la reconstrucción en curso y, ya borrado, no lo sumará
+            continue
+        fila = deltas.setdefault((pedido.fecha, pedido.menu_id), [0, 0, 0.0])
+        fila[0] += signo
+        fila[1] += signo * pedido.cantidad
+        fila[2] += signo * pedido.total
+    
+    if not deltas:
+        return
+    
+    tabla = VentaDiaria.__table__
+    stmt = insert_para(session, tabla)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabla.c.fecha, tabla.c.menu_id],
+        set_={
+            'pedidos': tabla.c.pedidos + stmt.excluded.pedidos,
+            'unidades': tabla.c.unidades + stmt.excluded.unidades,
+            'ingresos': tabla.c.ingresos + stmt.excluded.ingresos
+        }
+    )
+    session.execute(stmt, [
+        {'fecha': fecha, 'menu_id': menu_id, 'pedidos': n, 'unidades': unidades, 'ingresos': ingresos}
+        for (fecha, menu_id), (n, unidades, ingresos) in deltas.items()
+    ])
+    
+    if signo < 0:
+        # Quitar del resumen los días que se quedaron sin pedidos, solo entre los restados
+        session.execute(
+            tabla.delete().where(
+                tabla.c.fecha == bindparam('clave_fecha'),
+                tabla.c.menu_id == bindparam('clave_menu_id'),
+                tabla.c.pedidos <= 0
+            ),
+            [{'clave_fecha': fecha, 'clave_menu_id': menu_id} for fecha, menu_id in deltas]
+        )
+    marcar_cambio(session, 'ventas')
+
+def _pendientes_reconstruccion(session: Session):
+    # Rango de ids (progreso, maximo] que una reconstrucción en curso aún no sumó, o None.
+    # Se lee con el bloqueo de escritura ya tomado (en PostgreSQL, FOR UPDATE) para no
+    # cruzarse con el commit de un lote.
+    query = session.query(ReconstruccionVentas.progreso, ReconstruccionVentas.maximo)
+    if session.get_bind().dialect.name == 'postgresql':
+        query = query.with_for_update()
+    return query.first()
+
+def reconstruir_ventas_diarias(session: Session, lote: int = 50000) -> int:
+    # Recalcular todo el resumen desde la tabla de pedidos (backfill de bases existentes).
+    # Se procesa por rangos de id con un commit por lote para no bloquear la base
+    # durante minutos en historiales grandes.
+    tabla = VentaDiaria.__table__
+    
+    # Borrar el resumen y fijar el último pedido en la misma transacción, sin altas de
+    # pedidos entre medio: los pedidos hasta maximo los suman los lotes y los posteriores ya
+    # los suma acumular_ventas al crearse, así que ninguno se cuenta dos veces.
+    # El avance queda en ventas_reconstruccion: un pedido eliminado antes de que lo
+    # alcance un lote no se resta (el lote ya no lo encuentra).
+    dialecto = session.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    elif dialecto == 'postgresql':
+        session.execute(text("LOCK TABLE pedidos IN SHARE MODE"))
+    maximo = session.query(func.max(Pedido.id)).scalar() or 0
+    session.execute(tabla.delete())
+    session.query(ReconstruccionVentas).delete()
+    session.add(ReconstruccionVentas(id=1, progreso=0, maximo=maximo))
+    marcar_cambio(session, 'ventas')
+    session.commit()
+    
+    try:
+        _sumar_lotes(session, maximo, lote)
+    finally:
+        session.rollback()
+        session.query(ReconstruccionVentas).delete()
+        session.commit()
+    
+    return session.query(VentaDiaria).count()
+
+def _sumar_lotes(session: Session, maximo: int, lote: int):
+    tabla = VentaDiaria.__table__
+    for inicio in range(0, maximo, lote):
+        hasta = min(inicio + lote, maximo)
+        
+        # Primero el avance: toma el bloqueo de escritura antes de leer los pedidos del lote
+        session.query(ReconstruccionVentas).update({'progreso': hasta})
+        resumen = select(
+            Pedido.fecha,
+            Pedido.menu_id,
+            func.count(Pedido.id),
+            func.sum(Pedido.cantidad),
+            func.sum(Pedido.total)
+        ).where(
+            Pedido.id > inicio,
+            Pedido.id <= hasta,
+            Pedido.fecha.isnot(None),
+            Pedido.menu_id.isnot(None)
+        ).group_by(Pedido.fecha, Pedido.menu_id)
+        
+        stmt = insert_para(session, tabla).from_select(
+            ['fecha', 'menu_id', 'pedidos', 'unidades', 'ingresos'], resumen
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c.fecha, tabla.c.menu_id],
+            set_={
+                'pedidos': tabla.c.pedidos + stmt.excluded.pedidos,
+                'unidades': tabla.c.unidades + stmt.excluded.unidades,
+                'ingresos': tabla.c.ingresos + stmt.excluded.ingresos
+            }
+        )
+        session.execute(stmt)
+        marcar_cambio(session, 'ventas')
+        session.commit()
+
+# ========== Consultas para gráficos ==========
+
+def resumen_ventas(session: Session, desde: date = None, hasta: date = None) -> Tuple[int, int, float]:
+    # Totales (pedidos, unidades, ingresos) del rango, desde el resumen diario
+    query = session.query(
+        func.coalesce(func.sum(VentaDiaria.pedidos), 0),
+        func.coalesce(func.sum(VentaDiaria.unidades), 0),
+        func.coalesce(func.sum(VentaDiaria.ingresos), 0.0)
+    )
+    if desde is not None:
+        query = query.filter(VentaDiaria.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(VentaDiaria.fecha <= hasta)
+    return tuple(query.one())
+
+def uso_ingredientes(session: Session) -> List[Tuple[str, float]]:
+    # Uso total = cantidad del ingrediente en la receta x unidades vendidas del menú,
+    # calculado en una sola consulta agrupada sobre el resumen de ventas
+    uso = func.coalesce(func.sum(menu_ingrediente.c.cantidad * VentaDiaria.unidades), 0.0)
+    
+    return (
+        session.query(Ingrediente.nombre, uso.label('uso'))
+        .outerjoin(menu_ingrediente, menu_ingrediente.c.ingrediente_id == Ingrediente.id)
+        .outerjoin(VentaDiaria, VentaDiaria.menu_id == menu_ingrediente.c.menu_id)
+        .group_by(Ingrediente.id, Ingrediente.nombre)
+        .order_by(uso.desc())
+        .all()
+    )
+
+def ventas_por_periodo(
+    session: Session,
+    periodo: str = 'diario',
+    desde: date = None,
+    hasta: date = None
+) -> List[Tuple[str, float, int]]:
+    if periodo not in FORMATOS_PERIODO:
+        raise ValueError(f"Período no válido: {periodo}")
+    
+    # Agrupar en la base de datos: solo vuelve una fila (período, total, pedidos) por barra
+    grupo = _expresion_periodo(session, periodo, VentaDiaria.fecha).label('periodo')
+    query = session.query(
+        grupo,
+        func.sum(VentaDiaria.ingresos).label('total'),
+        func.sum(VentaDiaria.pedidos).label('pedidos')
+    )
+    
+    # Limitar el rango de fechas a la ventana que se va a mostrar
+    if desde is not None:
+        query = query.filter(VentaDiaria.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(VentaDiaria.fecha <= hasta)
+    
+    return query.group_by(grupo).order_by(grupo).all()
+
+def menus_populares(
+    session: Session,
+    criterio: str = 'pedidos',
+    limite: int = None,
+    desde: date = None,
+    hasta: date = None
+) -> List[Tuple[str, float]]:
+    if criterio not in CRITERIOS_RANKING:
+        raise ValueError(f"Criterio no válido: {criterio}")
+    
+    # Ranking de menús (incluidos los que no tienen ventas) en una sola consulta agrupada
+    # sobre el resumen, de mayor a menor. El rango de fechas va en la condición del JOIN
+    # para que los menús sin ventas en la ventana sigan apareciendo con 0; con el índice
+    # (menu_id, fecha) cada menú lee solo sus días dentro de la ventana.
+    condicion = VentaDiaria.menu_id == Menu.id
+    if desde is not None:
+        condicion = condicion & (VentaDiaria.fecha >= desde)
+    if hasta is not None:
+        condicion = condicion & (VentaDiaria.fecha <= hasta)
+    
+    columna = getattr(VentaDiaria, criterio)
+    valor = func.coalesce(func.sum(columna), 0.0 if criterio == 'ingresos' else 0)
+    
+    query = (
+        session.query(Menu.nombre, valor.label(criterio))
+        .outerjoin(VentaDiaria, condicion)
+        .group_by(Menu.id, Menu.nombre)
+        .order_by(valor.desc(), Menu.nombre)
+    )
+    if limite is not None:
+        query = query.limit(limite)
+    return query.all()
\ No newline at end of file
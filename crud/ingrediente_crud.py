@@ -1,13 +1,22 @@
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from models import Ingrediente
-from typing import List, Optional
+from database import es_clave_duplicada, insert_para
+from models import Ingrediente, menu_ingrediente
+from crud.menu_crud import invalidar_recetas, recalcular_porciones
+from crud.catalogo import marcar_cambio
+from crud.busqueda import buscar
+from typing import List, Optional, Dict
+
+def _duplicado(session: Session, error: IntegrityError, nombre: str):
+    # La restricción UNIQUE de nombre decide si está repetido (sin SELECT previo ni carreras
+    # entre cajas): deshacer y traducir al mismo ValueError de siempre
+    session.rollback()
+    if es_clave_duplicada(error):
+        raise ValueError(f"Ya existe un ingrediente con el nombre '{nombre}'") from None
+    raise error
 
 def crear_ingrediente(session: Session, nombre: str, tipo: str, cantidad: float, unidad_medida: str) -> Ingrediente:
-    # Verificar si el ingrediente ya existe
-    existente = session.query(Ingrediente).filter_by(nombre=nombre).first()
-    if existente:
-        raise ValueError(f"Ya existe un ingrediente con el nombre '{nombre}'")
-    
     ingrediente = Ingrediente(
         nombre=nombre,
         tipo=tipo,
@@ -15,14 +24,54 @@ def crear_ingrediente(session: Session, nombre: str, tipo: str, cantidad: float,
         unidad_medida=unidad_medida
     )
     session.add(ingrediente)
+    try:
+        session.flush()
+        marcar_cambio(session, 'ingredientes')
+        session.commit()
+    except IntegrityError as e:
+        _duplicado(session, e, nombre)
+    return ingrediente
+
+def crear_o_actualizar_ingrediente(
+    session: Session,
+    nombre: str,
+    tipo: str,
+    cantidad: float,
+    unidad_medida: str
+) -> Ingrediente:
+    # Upsert por nombre en una sola sentencia (INSERT ... ON CONFLICT DO UPDATE ... RETURNING)
+    stmt = insert_para(session, Ingrediente).values(
+        nombre=nombre, tipo=tipo, cantidad=cantidad, unidad_medida=unidad_medida
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Ingrediente.nombre],
+        set_={columna: stmt.excluded[columna] for columna in ('tipo', 'cantidad', 'unidad_medida')}
+    )
+    ingrediente = session.scalars(
+        stmt.returning(Ingrediente), execution_options={'populate_existing': True}
+    ).one()
+    recalcular_porciones(session, ingrediente_ids=[ingrediente.id])
+    marcar_cambio(session, 'ingredientes')
     session.commit()
+    invalidar_recetas()
     return ingrediente
 
 def obtener_ingrediente(session: Session, ingrediente_id: int) -> Optional[Ingrediente]:
     return session.query(Ingrediente).filter_by(id=ingrediente_id).first()
 
-def listar_ingredientes(session: Session) -> List[Ingrediente]:
-    return session.query(Ingrediente).all()
+def listar_ingredientes(session: Session, after_id: int = None, limit: int = None) -> List[Ingrediente]:
+    # Paginación por clave (keyset): filas con id mayor que after_id, como máximo limit
+    query = session.query(Ingrediente)
+    if after_id is not None:
+        query = query.filter(Ingrediente.id > after_id)
+    query = query.order_by(Ingrediente.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def buscar_ingredientes(session: Session, texto: str, limite: int = 20) -> List[Ingrediente]:
+    # Búsqueda por prefijo de palabras (índice FTS5 en SQLite), de más a menos relevante
+    return buscar(session, Ingrediente, texto, limite)
 
 def actualizar_ingrediente(
     session: Session, 
@@ -37,9 +86,6 @@ def actualizar_ingrediente(
         raise ValueError(f"No se encontró el ingrediente con ID {ingrediente_id}")
     
     if nombre is not None:
-        # Verificar si el nuevo nombre ya existe
-        if nombre != ingrediente.nombre and session.query(Ingrediente).filter_by(nombre=nombre).first():
-            raise ValueError(f"Ya existe un ingrediente con el nombre '{nombre}'")
         ingrediente.nombre = nombre
     
     if tipo is not None:
@@ -49,7 +95,16 @@ def actualizar_ingrediente(
     if unidad_medida is not None:
         ingrediente.unidad_medida = unidad_medida
     
-    session.commit()
+    try:
+        session.flush()
+        if cantidad is not None:
+            recalcular_porciones(session, ingrediente_ids=[ingrediente.id])
+        marcar_cambio(session, 'ingredientes')
+        session.commit()
+    except IntegrityError as e:
+        _duplicado(session, e, nombre)
+    # Las recetas en caché muestran nombre, tipo y unidad del ingrediente
+    invalidar_recetas()
     return ingrediente
 
 def eliminar_ingrediente(session: Session, ingrediente_id: int) -> bool:
@@ -57,6 +112,72 @@ def eliminar_ingrediente(session: Session, ingrediente_id: int) -> bool:
     if not ingrediente:
         return False
     
+    # Los menús que lo usaban pierden ese ingrediente de la receta
+    menu_ids = [menu_id for (menu_id,) in session.query(menu_ingrediente.c.menu_id).filter(
+        menu_ingrediente.c.ingrediente_id == ingrediente_id
+    ).all()]
     session.delete(ingrediente)
+    session.flush()
+    recalcular_porciones(session, menu_ids=menu_ids)
+    marcar_cambio(session, 'ingredientes')
     session.commit()
-    return True
\ No newline at end of file
+    invalidar_recetas()
+    return True
+
+# ========== Stock ==========
+
+def consumo_ingredientes(session: Session, items: List[Dict]) -> Dict[int, float]:
+    # Cantidad total de cada ingrediente que consumen los items (menu_id, cantidad):
+    # cantidad en la receta x unidades pedidas, con una sola consulta de recetas
+    menu_ids = {item['menu_id'] for item in items}
+    recetas = {}
+    for menu_id, ingrediente_id, cantidad in session.query(
+        menu_ingrediente.c.menu_id,
+        menu_ingrediente.c.ingrediente_id,
+        menu_ingrediente.c.cantidad
+    ).filter(menu_ingrediente.c.menu_id.in_(menu_ids)).all():
+        recetas.setdefault(menu_id, []).append((ingrediente_id, cantidad or 0.0))
+    
+    consumo = {}
+    for item in items:
+        for ingrediente_id, cantidad in recetas.get(item['menu_id'], []):
+            consumo[ingrediente_id] = consumo.get(ingrediente_id, 0.0) + cantidad * item['cantidad']
+    return consumo
+
+def descontar_stock(session: Session, consumo: Dict[int, float]):
+    # Un solo UPDATE condicional para todos los ingredientes: cada fila solo se descuenta
+    # si alcanza el stock, y la comprobación es atómica aunque haya pedidos concurrentes.
+    # No confirma: si falta stock, quien llama debe deshacer la transacción.
+    if not consumo:
+        return
+    
+    tabla = Ingrediente.__table__
+    requerido = case(consumo, value=tabla.c.id)
+    descontados = set(session.execute(
+        tabla.update()
+        .where(tabla.c.id.in_(list(consumo)), tabla.c.cantidad >= requerido)
+        .values(cantidad=tabla.c.cantidad - requerido)
+        .returning(tabla.c.id)
+    ).scalars())
+    
+    faltantes = [ingrediente_id for ingrediente_id in consumo if ingrediente_id not in descontados]
+    if faltantes:
+        nombres = [nombre for (nombre,) in session.query(Ingrediente.nombre).filter(
+            Ingrediente.id.in_(faltantes)
+        ).order_by(Ingrediente.nombre).all()]
+        raise ValueError(f"Stock insuficiente de: {', '.join(nombres)}")
+    
+    recalcular_porciones(session, ingrediente_ids=consumo)
+
+def reponer_stock(session: Session, consumo: Dict[int, float]):
+    # Devolver al stock lo consumido (p. ej. al eliminar un pedido). No confirma.
+    if not consumo:
+        return
+    
+    tabla = Ingrediente.__table__
+    session.execute(
+        tabla.update()
+        .where(tabla.c.id.in_(list(consumo)))
+        .values(cantidad=tabla.c.cantidad + case(consumo, value=tabla.c.id))
+    )
+    recalcular_porciones(session, ingrediente_ids=consumo)
\ No newline at end of file
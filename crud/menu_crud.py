@@ -1,7 +1,57 @@
+import threading
+import weakref
+from sqlalchemy import Integer, case, cast, func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from database import es_clave_duplicada, insert_para
 from models import Menu, Ingrediente, menu_ingrediente  # Importa menu_ingrediente desde models
-from typing import List, Optional, Dict
+from crud.catalogo import STOCK, marcar_cambio
+from crud.busqueda import buscar
+from typing import List, Optional, Dict, Iterable
 
+# Caché en proceso de recetas por engine y id de menú. Se invalida al crear, actualizar o
+# eliminar un menú y al modificar ingredientes; la versión evita guardar una receta leída
+# antes de una invalidación concurrente (otro hilo del ejecutor).
+_recetas = weakref.WeakKeyDictionary()  # engine -> {menu_id: receta}
+_version_recetas = 0
+_lock_recetas = threading.Lock()
+
+def invalidar_recetas(menu_id: int = None):
+    # Sin menu_id se descarta toda la caché (p. ej. al renombrar un ingrediente). Se
+    # descarta en todos los engines: quien invalida no siempre tiene la sesión a mano.
+    global _version_recetas
+    with _lock_recetas:
+        _version_recetas += 1
+        for recetas in _recetas.values():
+            if menu_id is None:
+                recetas.clear()
+            else:
+                recetas.pop(menu_id, None)
+
+def _validar_ingredientes(session: Session, ingredientes: Dict[int, float]):
+    # Verificar que todos los ingredientes existan con una sola consulta IN
+    existentes = {
+        ingrediente_id for (ingrediente_id,) in
+        session.query(Ingrediente.id).filter(Ingrediente.id.in_(list(ingredientes))).all()
+    }
+    for ingrediente_id in ingredientes:
+        if ingrediente_id not in existentes:
+            raise ValueError(f"No se encontró el ingrediente con ID {ingrediente_id}")
+
+def _guardar_receta(session: Session, menu_id: int, ingredientes: Dict[int, float]):
+    # Escribir las filas de la tabla de asociación con su cantidad en un solo executemany
+    if ingredientes:
+        session.execute(menu_ingrediente.insert(), [
+            {'menu_id': menu_id, 'ingrediente_id': ingrediente_id, 'cantidad': cantidad}
+            for ingrediente_id, cantidad in ingredientes.items()
+        ])
+
+def _duplicado(error: IntegrityError, nombre: str):
+    # La restricción UNIQUE de nombre decide si está repetido (sin SELECT previo ni carreras
+    # entre cajas); quien llama ya deshizo la transacción
+    if es_clave_duplicada(error):
+        raise ValueError(f"Ya existe un menú con el nombre '{nombre}'") from None
+    raise error
 
 def crear_menu(
     session: Session, 
@@ -10,41 +60,72 @@ def crear_menu(
     precio: float, 
     ingredientes: Dict[int, float]
 ) -> Menu:
-    # Verificar si el menú ya existe
-    existente = session.query(Menu).filter_by(nombre=nombre).first()
-    if existente:
-        raise ValueError(f"Ya existe un menú con el nombre '{nombre}'")
-    
-    # Verificar que todos los ingredientes existan
-    ingredientes_obj = []
-    for ingrediente_id, cantidad in ingredientes.items():
-        ingrediente = session.query(Ingrediente).filter_by(id=ingrediente_id).first()
-        if not ingrediente:
-            raise ValueError(f"No se encontró el ingrediente con ID {ingrediente_id}")
-        ingredientes_obj.append((ingrediente, cantidad))
+    _validar_ingredientes(session, ingredientes)
     
+    # Menú y receta se guardan en la misma transacción, con un solo commit
     menu = Menu(nombre=nombre, descripcion=descripcion, precio=precio)
-    session.add(menu)
-    session.commit()
-    
-    # Asociar ingredientes al menú
-    for ingrediente, cantidad in ingredientes_obj:
-        menu.ingredientes.append(ingrediente)
-        # Actualizar la cantidad en la tabla de asociación
-        stmt = menu_ingrediente.update().where(
-            (menu_ingrediente.c.menu_id == menu.id) & 
-            (menu_ingrediente.c.ingrediente_id == ingrediente.id)
-        ).values(cantidad=cantidad)
-        session.execute(stmt)
+    try:
+        session.add(menu)
+        session.flush()  # Obtener menu.id sin confirmar
+        _guardar_receta(session, menu.id, ingredientes)
+        recalcular_porciones(session, menu_ids=[menu.id])
+        session.expire(menu, ['porciones_disponibles'])  # Calculado con un UPDATE fuera del ORM
+        marcar_cambio(session, 'menus')
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        _duplicado(e, nombre)
+    except Exception:
+        session.rollback()
+        raise
+    invalidar_recetas(menu.id)
+    return menu
+
+def crear_o_actualizar_menu(
+    session: Session,
+    nombre: str,
+    descripcion: str,
+    precio: float,
+    ingredientes: Dict[int, float]
+) -> Menu:
+    # Upsert por nombre (INSERT ... ON CONFLICT DO UPDATE ... RETURNING) y reemplazo de la receta
+    _validar_ingredientes(session, ingredientes)
     
-    session.commit()
+    stmt = insert_para(session, Menu).values(nombre=nombre, descripcion=descripcion, precio=precio)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Menu.nombre],
+        set_={'descripcion': stmt.excluded.descripcion, 'precio': stmt.excluded.precio}
+    )
+    try:
+        menu = session.scalars(stmt.returning(Menu), execution_options={'populate_existing': True}).one()
+        session.execute(menu_ingrediente.delete().where(menu_ingrediente.c.menu_id == menu.id))
+        _guardar_receta(session, menu.id, ingredientes)
+        recalcular_porciones(session, menu_ids=[menu.id])
+        session.expire(menu, ['porciones_disponibles'])
+        marcar_cambio(session, 'menus')
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    invalidar_recetas(menu.id)
     return menu
 
 def obtener_menu(session: Session, menu_id: int) -> Optional[Menu]:
     return session.query(Menu).filter_by(id=menu_id).first()
 
-def listar_menus(session: Session) -> List[Menu]:
-    return session.query(Menu).all()
+def listar_menus(session: Session, after_id: int = None, limit: int = None) -> List[Menu]:
+    # Paginación por clave (keyset): filas con id mayor que after_id, como máximo limit
+    query = session.query(Menu)
+    if after_id is not None:
+        query = query.filter(Menu.id > after_id)
+    query = query.order_by(Menu.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def buscar_menus(session: Session, texto: str, limite: int = 20) -> List[Menu]:
+    # Búsqueda por prefijo de palabras (índice FTS5 en SQLite), de más a menos relevante
+    return buscar(session, Menu, texto, limite)
 
 def actualizar_menu(
     session: Session, 
@@ -59,9 +140,6 @@ def actualizar_menu(
         raise ValueError(f"No se encontró el menú con ID {menu_id}")
     
     if nombre is not None:
-        # Verificar si el nuevo nombre ya existe
-        if nombre != menu.nombre and session.query(Menu).filter_by(nombre=nombre).first():
-            raise ValueError(f"Ya existe un menú con el nombre '{nombre}'")
         menu.nombre = nombre
     
     if descripcion is not None:
@@ -69,22 +147,25 @@ def actualizar_menu(
     if precio is not None:
         menu.precio = precio
     
-    if ingredientes is not None:
-        # Actualizar ingredientes
-        menu.ingredientes.clear()
-        for ingrediente_id, cantidad in ingredientes.items():
-            ingrediente = session.query(Ingrediente).filter_by(id=ingrediente_id).first()
-            if not ingrediente:
-                raise ValueError(f"No se encontró el ingrediente con ID {ingrediente_id}")
-            menu.ingredientes.append(ingrediente)
-            # Actualizar la cantidad en la tabla de asociación
-            stmt = menu_ingrediente.update().where(
-                (menu_ingrediente.c.menu_id == menu.id) & 
-                (menu_ingrediente.c.ingrediente_id == ingrediente.id)
-            ).values(cantidad=cantidad)
-            session.execute(stmt)
-    
-    session.commit()
+    try:
+        if ingredientes is not None:
+            # Reemplazar la receta completa: validar, borrar e insertar con su cantidad
+            _validar_ingredientes(session, ingredientes)
+            session.execute(menu_ingrediente.delete().where(menu_ingrediente.c.menu_id == menu.id))
+            _guardar_receta(session, menu.id, ingredientes)
+            recalcular_porciones(session, menu_ids=[menu.id])
+            session.expire(menu, ['porciones_disponibles'])
+        
+        session.flush()
+        marcar_cambio(session, 'menus')
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        _duplicado(e, nombre)
+    except Exception:
+        session.rollback()
+        raise
+    invalidar_recetas(menu_id)
     return menu
 
 def eliminar_menu(session: Session, menu_id: int) -> bool:
@@ -93,29 +174,89 @@ def eliminar_menu(session: Session, menu_id: int) -> bool:
         return False
     
     session.delete(menu)
+    marcar_cambio(session, 'menus')
     session.commit()
+    invalidar_recetas(menu_id)
     return True
 
+# ========== Porciones disponibles ==========
+
+def recalcular_porciones(
+    session: Session, 
+    menu_ids: Iterable[int] = None, 
+    ingrediente_ids: Iterable[int] = None
+):
+    # Recalcula Menu.porciones_disponibles con un solo UPDATE y una subconsulta agrupada:
+    # de todos los menús (sin filtros), de los indicados o de los que usan esos ingredientes.
+    # No confirma: se ejecuta dentro de la transacción que cambió stock o recetas, y marca
+    # el cambio de STOCK (porciones y cantidades de ingredientes en el catálogo).
+    menus = Menu.__table__
+    ingredientes = Ingrediente.__table__
+    
+    porciones = ingredientes.c.cantidad / menu_ingrediente.c.cantidad
+    if session.get_bind().dialect.name == 'postgresql':
+        porciones = func.floor(porciones)  # CAST redondea en PostgreSQL; en SQLite trunca
+    porciones = cast(porciones, Integer)
+    minimo = (
+        select(func.min(case((porciones < 0, 0), else_=porciones)))
+        .select_from(menu_ingrediente.join(ingredientes, ingredientes.c.id == menu_ingrediente.c.ingrediente_id))
+        .where(menu_ingrediente.c.menu_id == menus.c.id, menu_ingrediente.c.cantidad > 0)
+        .scalar_subquery()
+    )
+    
+    stmt = menus.update().values(porciones_disponibles=minimo)
+    if menu_ids is not None or ingrediente_ids is not None:
+        condiciones = []
+        if menu_ids is not None:
+            condiciones.append(menus.c.id.in_(list(menu_ids)))
+        if ingrediente_ids is not None:
+            condiciones.append(menus.c.id.in_(
+                select(menu_ingrediente.c.menu_id)
+                .where(menu_ingrediente.c.ingrediente_id.in_(list(ingrediente_ids)))
+            ))
+        stmt = stmt.where(condiciones[0] if len(condiciones) == 1 else condiciones[0] | condiciones[1])
+    session.execute(stmt)
+    marcar_cambio(session, STOCK)
+
+def listar_menus_disponibles(session: Session, solo_disponibles: bool = False) -> List[Menu]:
+    # Menús con sus porciones precalculadas; solo_disponibles excluye los agotados
+    query = session.query(Menu)
+    if solo_disponibles:
+        query = query.filter((Menu.porciones_disponibles.is_(None)) | (Menu.porciones_disponibles > 0))
+    return query.order_by(Menu.id).all()
+
 def obtener_ingredientes_menu(session: Session, menu_id: int) -> List[Dict]:
-    menu = obtener_menu(session, menu_id)
-    if not menu:
-        return []
+    engine = session.get_bind().engine
+    with _lock_recetas:
+        receta = _recetas.get(engine, {}).get(menu_id)
+        version = _version_recetas
     
-    ingredientes = []
-    for ingrediente in menu.ingredientes:
-        stmt = menu_ingrediente.select().where(
-            (menu_ingrediente.c.menu_id == menu.id) & 
-            (menu_ingrediente.c.ingrediente_id == ingrediente.id)
+    if receta is None:
+        # Ingredientes y cantidades de la receta en una sola consulta con join
+        filas = (
+            session.query(
+                Ingrediente.id,
+                Ingrediente.nombre,
+                Ingrediente.tipo,
+                menu_ingrediente.c.cantidad,
+                Ingrediente.unidad_medida
+            )
+            .join(menu_ingrediente, menu_ingrediente.c.ingrediente_id == Ingrediente.id)
+            .filter(menu_ingrediente.c.menu_id == menu_id)
+            .order_by(Ingrediente.id)
+            .all()
         )
-        result = session.execute(stmt).first()
-        cantidad = result.cantidad if result else 0.0
+        receta = [{
+            'id': fila.id,
+            'nombre': fila.nombre,
+            'tipo': fila.tipo,
+            'cantidad': fila.cantidad if fila.cantidad is not None else 0.0,
+            'unidad_medida': fila.unidad_medida
+        } for fila in filas]
         
-        ingredientes.append({
-            'id': ingrediente.id,
-            'nombre': ingrediente.nombre,
-            'tipo': ingrediente.tipo,
-            'cantidad': cantidad,
-            'unidad_medida': ingrediente.unidad_medida
-        })
+        with _lock_recetas:
+            if version == _version_recetas:
+                _recetas.setdefault(engine, {})[menu_id] = receta
     
-    return ingredientes
\ No newline at end of file
+    # Copias para que quien llama no modifique la caché
+    return [dict(ingrediente) for ingrediente in receta]
\ No newline at end of file
@@ -1,7 +1,10 @@
+from sqlalchemy import insert, or_, and_
 from sqlalchemy.orm import Session
 from models import Pedido
-from datetime import datetime
-from typing import List, Optional
+from crud.estadistica_crud import acumular_ventas
+from crud.ingrediente_crud import consumo_ingredientes, descontar_stock, reponer_stock
+from datetime import date, datetime
+from typing import List, Optional, Dict, Iterator
 
 def crear_pedido(
     session: Session, 
@@ -10,44 +13,181 @@ def crear_pedido(
     cantidad: int, 
     descripcion: str = None
 ) -> Pedido:
+    return crear_pedidos(session, cliente_id, [{
+        'menu_id': menu_id,
+        'cantidad': cantidad,
+        'descripcion': descripcion
+    }])[0]
+
+def crear_pedidos(session: Session, cliente_id: int, items: List[Dict], confirmar: bool = True) -> List[Pedido]:
     from models import Cliente, Menu  # Importación local para evitar circularidad
     
-    cliente = session.query(Cliente).filter_by(id=cliente_id).first()
-    if not cliente:
-        raise ValueError(f"No se encontró el cliente con ID {cliente_id}")
+    if not items:
+        raise ValueError("El pedido debe tener al menos un item")
     
-    menu = session.query(Menu).filter_by(id=menu_id).first()
-    if not menu:
-        raise ValueError(f"No se encontró el menú con ID {menu_id}")
+    # Antes de tocar el stock: una cantidad negativa lo repondría y restaría ventas
+    for item in items:
+        cantidad = item.get('cantidad')
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad <= 0:
+            raise ValueError(f"La cantidad debe ser un número entero mayor que cero (menú {item.get('menu_id')})")
+    
+    if not session.query(Cliente.id).filter_by(id=cliente_id).first():
+        raise ValueError(f"No se encontró el cliente con ID {cliente_id}")
     
-    total = menu.precio * cantidad
+    # Resolver todos los menús del carrito en una sola consulta
+    menu_ids = {item['menu_id'] for item in items}
+    menus = {menu.id: menu for menu in session.query(Menu).filter(Menu.id.in_(menu_ids)).all()}
     
-    pedido = Pedido(
-        descripcion=descripcion or f"{cantidad} x {menu.nombre}",
-        total=total,
-        cantidad=cantidad,
-        cliente_id=cliente_id,
-        menu_id=menu_id
-    )
+    filas = []
+    for item in items:
+        menu = menus.get(item['menu_id'])
+        if not menu:
+            raise ValueError(f"No se encontró el menú con ID {item['menu_id']}")
+        
+        cantidad = item['cantidad']
+        filas.append({
+            'descripcion': item.get('descripcion') or f"{cantidad} x {menu.nombre}",
+            'total': menu.precio * cantidad,
+            'fecha': datetime.now(),
+            'cantidad': cantidad,
+            'cliente_id': cliente_id,
+            'menu_id': menu.id
+        })
     
-    session.add(pedido)
-    session.commit()
-    return pedido
+    # Descontar el stock de todo el carrito e insertar los pedidos en un solo INSERT,
+    # confirmando una sola vez: o se guardan todos los pedidos o ninguno.
+    # Con confirmar=False la transacción (o el savepoint) queda a cargo de quien llama.
+    # Los pedidos se devuelven en el orden de items (sort_by_parameter_order).
+    consumo = consumo_ingredientes(session, items)
+    try:
+        descontar_stock(session, consumo)
+        pedidos = session.scalars(
+            insert(Pedido).returning(Pedido, sort_by_parameter_order=True),
+            filas
+        ).all()
+        acumular_ventas(session, pedidos)
+        if confirmar:
+            session.commit()
+    except Exception:
+        if confirmar:
+            session.rollback()
+        raise
+    return pedidos
+
+def crear_pedidos_en_lote(session: Session, solicitudes: List[Dict]) -> List:
+    # Varios carritos ({'cliente_id', 'items'}) en una sola transacción con un savepoint por
+    # carrito: uno rechazado (cliente inexistente, sin stock...) no afecta a los demás y
+    # todo el lote se confirma con un solo commit. Devuelve, en el mismo orden, la lista
+    # de pedidos de cada carrito o el ValueError que lo rechazó.
+    resultados = []
+    try:
+        if session.get_bind().dialect.name == 'sqlite':
+            # pysqlite no abre la transacción antes de un SAVEPOINT y RELEASE confirmaría
+            # cada carrito por separado: abrirla explícitamente (y tomar ya el bloqueo de escritura)
+            session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        
+        for solicitud in solicitudes:
+            try:
+                with session.begin_nested():
+                    resultados.append(crear_pedidos(
+                        session, solicitud['cliente_id'], solicitud['items'], confirmar=False
+                    ))
+            except ValueError as e:
+                resultados.append(e)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return resultados
 
 def obtener_pedido(session: Session, pedido_id: int) -> Optional[Pedido]:
     return session.query(Pedido).filter_by(id=pedido_id).first()
 
-def listar_pedidos(session: Session) -> List[Pedido]:
-    return session.query(Pedido).order_by(Pedido.fecha.desc()).all()
+def _consulta_filas_pedidos(session: Session):
+    from models import Cliente, Menu  # Importación local para evitar circularidad
+    
+    # Filas planas (id, cliente, menu, cantidad, total, fecha) en un solo JOIN,
+    # sin hidratar objetos ni disparar cargas perezosas por fila
+    return session.query(
+        Pedido.id,
+        Cliente.nombre.label('cliente'),
+        Menu.nombre.label('menu'),
+        Pedido.cantidad,
+        Pedido.total,
+        Pedido.fecha
+    ).outerjoin(Cliente, Pedido.cliente_id == Cliente.id).outerjoin(Menu, Pedido.menu_id == Menu.id)
+
+def _paginar_pedidos(session: Session, query, after_id: int = None, limit: int = None):
+    # Orden estable (fecha, id) descendente; after_id continúa justo después de ese pedido
+    if after_id is not None:
+        fecha_ref = session.query(Pedido.fecha).filter(Pedido.id == after_id).scalar_subquery()
+        query = query.filter(or_(
+            Pedido.fecha < fecha_ref,
+            and_(Pedido.fecha == fecha_ref, Pedido.id < after_id)
+        ))
+    query = query.order_by(Pedido.fecha.desc(), Pedido.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def listar_pedidos(
+    session: Session, 
+    proyeccion: bool = False, 
+    after_id: int = None, 
+    limit: int = None
+) -> List[Pedido]:
+    query = _consulta_filas_pedidos(session) if proyeccion else session.query(Pedido)
+    return _paginar_pedidos(session, query, after_id, limit)
+
+def listar_pedidos_por_cliente(
+    session: Session, 
+    cliente_id: int, 
+    proyeccion: bool = False, 
+    after_id: int = None, 
+    limit: int = None
+) -> List[Pedido]:
+    query = _consulta_filas_pedidos(session) if proyeccion else session.query(Pedido)
+    query = query.filter(Pedido.cliente_id == cliente_id)
+    return _paginar_pedidos(session, query, after_id, limit)
+
+def listar_pedidos_por_ids(session: Session, pedido_ids: List[int]):
+    # Filas planas de pedidos concretos (p. ej. los recién creados) para actualizar la vista
+    query = _consulta_filas_pedidos(session).filter(Pedido.id.in_(pedido_ids))
+    return query.order_by(Pedido.fecha.desc(), Pedido.id.desc()).all()
 
-def listar_pedidos_por_cliente(session: Session, cliente_id: int) -> List[Pedido]:
-    return session.query(Pedido).filter_by(cliente_id=cliente_id).order_by(Pedido.fecha.desc()).all()
+def iterar_pedidos(
+    session: Session,
+    desde: date = None,
+    hasta: date = None,
+    lote: int = 1000
+) -> Iterator:
+    # Filas planas de los pedidos del rango, en orden de id, leídas de a lote filas
+    # (yield_per) para recorrer historiales grandes sin cargarlos enteros en memoria
+    query = _consulta_filas_pedidos(session)
+    if desde is not None:
+        query = query.filter(Pedido.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(Pedido.fecha <= hasta)
+    return query.order_by(Pedido.id).yield_per(lote)
 
 def eliminar_pedido(session: Session, pedido_id: int) -> bool:
     pedido = obtener_pedido(session, pedido_id)
     if not pedido:
         return False
     
-    session.delete(pedido)
-    session.commit()
+    try:
+        # Se repone según la receta actual del menú
+        if pedido.menu_id is not None:
+            reponer_stock(session, consumo_ingredientes(session, [
+                {'menu_id': pedido.menu_id, 'cantidad': pedido.cantidad}
+            ]))
+        # Borrar antes de restar: el borrado toma el bloqueo de escritura y acumular_ventas
+        # ve el avance de una reconstrucción en curso ya sin lotes a medio confirmar
+        session.delete(pedido)
+        session.flush()
+        acumular_ventas(session, [pedido], signo=-1)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
     return True
\ No newline at end of file
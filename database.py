@@ -1,13 +1,117 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 Base = declarative_base()
 
-def init_db():
-    engine = create_engine('sqlite:///restaurante.db')
+# Configuración por variables de entorno (o argumentos de crear_engine)
+URL_POR_DEFECTO = 'sqlite:///restaurante.db'
+
+# PRAGMAs aplicados a cada conexión SQLite nueva
+PRAGMAS_SQLITE = {
+    'journal_mode': 'WAL',        # lectores y escritor no se bloquean entre sí
+    'synchronous': 'NORMAL',      # con WAL es seguro y evita un fsync por commit
+    'cache_size': -64000,         # 64 MB de caché de páginas (negativo = KiB)
+    'mmap_size': 268435456,       # 256 MB de lectura mapeada en memoria
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000
+}
+
+# Fábrica de sesiones única para todo el módulo; init_db la asocia al engine
+SessionLocal = sessionmaker()
+
+def _opciones_entorno(url: str, echo: bool, pool_size: int):
+    url = url or os.environ.get('RESTAURANTE_DB_URL', URL_POR_DEFECTO)
+    if echo is None:
+        echo = os.environ.get('RESTAURANTE_DB_ECHO', '').lower() in ('1', 'true', 'si', 'sí')
+    if pool_size is None:
+        pool_size = int(os.environ.get('RESTAURANTE_DB_POOL_SIZE', 5))
+    return url, echo, pool_size
+
+def _configurar_pragmas(engine, pragmas: dict = None):
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = PRAGMAS_SQLITE if pragmas is None else pragmas
+    
+    @event.listens_for(engine, 'connect')
+    def aplicar_pragmas(conexion, registro):
+        cursor = conexion.cursor()
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre}={valor}")
+        cursor.close()
+
+def crear_engine(url: str = None, echo: bool = None, pool_size: int = None, pragmas: dict = None):
+    url, echo, pool_size = _opciones_entorno(url, echo, pool_size)
+    engine = create_engine(url, echo=echo, pool_size=pool_size, pool_pre_ping=True)
+    _configurar_pragmas(engine, pragmas)
+    return engine
+
+def init_db(url: str = None, informar=print, **opciones):
+    import models  # Registrar las tablas en Base.metadata
+    from migraciones import aplicar_migraciones
+    
+    # create_all crea las tablas nuevas; las migraciones actualizan las existentes
+    engine = crear_engine(url, **opciones)
     Base.metadata.create_all(engine)
+    aplicar_migraciones(engine, informar)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+def get_session(engine=None):
+    if engine is None:
+        return SessionLocal()
+    return SessionLocal(bind=engine)
+
+def insert_para(session, tabla):
+    # INSERT del dialecto en uso, con soporte de ON CONFLICT (SQLite y PostgreSQL)
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(tabla)
+
+def es_clave_duplicada(error) -> bool:
+    # IntegrityError por una restricción UNIQUE (no por NOT NULL ni claves foráneas)
+    original = getattr(error, 'orig', error)
+    codigo = getattr(original, 'sqlite_errorname', None) or getattr(original, 'pgcode', None)
+    if codigo:
+        return codigo in ('SQLITE_CONSTRAINT_UNIQUE', '23505')
+    return 'unique' in str(original).lower()
+
+# ========== Acceso asíncrono ==========
+
+# Controlador asíncrono equivalente a cada controlador síncrono de las URL configuradas
+DRIVERS_ASYNC = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg'
+}
+
+def url_async(url: str) -> str:
+    esquema, resto = url.split('://', 1)
+    dialecto = esquema.split('+', 1)[0]
+    if dialecto not in DRIVERS_ASYNC:
+        raise ValueError(f"No hay controlador asíncrono para {dialecto}")
+    return f"{DRIVERS_ASYNC[dialecto]}://{resto}"
+
+def crear_engine_async(url: str = None, echo: bool = None, pool_size: int = None, pragmas: dict = None):
+    # Requiere aiosqlite (SQLite) o asyncpg (PostgreSQL). No crea ni migra el esquema:
+    # la base debe haberse inicializado antes con init_db.
+    from sqlalchemy.ext.asyncio import create_async_engine
+    
+    url, echo, pool_size = _opciones_entorno(url, echo, pool_size)
+    engine = create_async_engine(url_async(url), echo=echo, pool_size=pool_size, pool_pre_ping=True)
+    _configurar_pragmas(engine.sync_engine, pragmas)
     return engine
 
-def get_session(engine):
-    Session = sessionmaker(bind=engine)
-    return Session()
\ No newline at end of file
+def _releer_existentes(estado):
+    if estado.is_select:
+        estado.update_execution_options(populate_existing=True)
+
+def get_async_session(engine):
+    # expire_on_commit=False: fuera de run_sync no se pueden recargar atributos vencidos.
+    # A cambio, cada SELECT sobrescribe las entidades ya cargadas para no devolver
+    # valores anteriores al commit (stock, porciones...)
+    from sqlalchemy.ext.asyncio import AsyncSession
+    session = AsyncSession(engine, expire_on_commit=False)
+    event.listen(session.sync_session, 'do_orm_execute', _releer_existentes)
+    return session
\ No newline at end of file
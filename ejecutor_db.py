@@ -0,0 +1,120 @@
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from database import get_session
+
+class EjecutorDB:
+    # Ejecuta consultas y escrituras fuera del hilo de Tk. Cada hilo del pool usa su propia
+    # sesión y los resultados vuelven al hilo de la interfaz mediante after(), nunca desde
+    # el worker.
+    def __init__(self, engine, widget, hilos: int = 2, intervalo_ms: int = 30):
+        self.engine = engine
+        self.widget = widget
+        self.intervalo_ms = intervalo_ms
+        self.pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='db')
+        self.local = threading.local()
+        self.resultados = queue.Queue()
+        self.generaciones = {}
+        self.escrituras = set()  # claves de las escrituras enviadas y aún no entregadas
+        self.numero_escritura = 0
+        self.activas = 0
+        self.al_cambiar_ocupado = None  # callback(bool) para el indicador de carga
+    
+    def _session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = get_session(self.engine)
+            # Los objetos que devuelven los crud (que confirman) se entregan a la interfaz
+            # ya desligados: conservar sus atributos en lugar de vencerlos en el commit
+            session.expire_on_commit = False
+        return session
+    
+    def enviar(self, clave: str, funcion, al_terminar, al_fallar=None):
+        # Solo desde el hilo de Tk. Una solicitud nueva con la misma clave reemplaza
+        # a la anterior: si esta aún no terminó, su resultado se descarta.
+        generacion = self.generaciones.get(clave, 0) + 1
+        self.generaciones[clave] = generacion
+        
+        self._cambiar_activas(1)
+        self.pool.submit(self._trabajo, clave, generacion, funcion, al_terminar, al_fallar)
+    
+    def escribir(self, funcion, al_terminar, al_fallar=None):
+        # Solo desde el hilo de Tk. Cada escritura lleva una clave propia: ninguna reemplaza
+        # a otra ni se descarta, y al cerrar se completan las ya enviadas.
+        self.numero_escritura += 1
+        clave = f"escritura-{self.numero_escritura}"
+        self.escrituras.add(clave)
+        self.enviar(clave, funcion, al_terminar, al_fallar)
+    
+    def cancelar(self, clave: str):
+        self.generaciones[clave] = self.generaciones.get(clave, 0) + 1
+    
+    def cerrar(self):
+        # Descartar las lecturas pendientes; el intérprete espera a los hilos del pool antes
+        # de salir, así que las escrituras en cola terminan igual
+        for clave in list(self.generaciones):
+            if clave not in self.escrituras:
+                self.cancelar(clave)
+        self.pool.shutdown(wait=False)
+    
+    def _vigente(self, clave: str, generacion: int) -> bool:
+        return self.generaciones.get(clave) == generacion
+    
+    def _trabajo(self, clave, generacion, funcion, al_terminar, al_fallar):
+        # Corre en un hilo del pool
+        if not self._vigente(clave, generacion):
+            self.resultados.put((clave, generacion, None, None, None))
+            return
+        
+        session = self._session()
+        try:
+            resultado = funcion(session)
+            self.resultados.put((clave, generacion, al_terminar, resultado, None))
+        except Exception as e:
+            session.rollback()
+            self.resultados.put((clave, generacion, al_fallar, None, e))
+        finally:
+            # Cerrar la transacción para que la próxima consulta vea datos nuevos;
+            # los objetos quedan desligados con sus atributos ya cargados
+            session.close()
+    
+    def _despachar(self):
+        # Corre en el hilo de Tk: entregar los resultados que sigan vigentes
+        while True:
+            try:
+                clave, generacion, callback, resultado, error = self.resultados.get_nowait()
+            except queue.Empty:
+                break
+            
+            self._cambiar_activas(-1)
+            vigente = self._vigente(clave, generacion)
+            if clave in self.escrituras:
+                # La clave de una escritura no se reutiliza: olvidarla una vez entregada
+                self.escrituras.discard(clave)
+                self.generaciones.pop(clave, None)
+            if not vigente:
+                continue
+            
+            if callback is None:
+                # Un error sin al_fallar no se pierde en silencio: va al manejador de Tk
+                if error is not None:
+                    self.widget.report_callback_exception(type(error), error, error.__traceback__)
+                continue
+            try:
+                callback(error if error is not None else resultado)
+            except Exception:
+                # Un callback con error no debe detener la entrega de los demás resultados
+                self.widget.report_callback_exception(*sys.exc_info())
+        
+        if self.activas:
+            self.widget.after(self.intervalo_ms, self._despachar)
+    
+    def _cambiar_activas(self, delta: int):
+        antes = self.activas
+        self.activas += delta
+        
+        if antes == 0 and self.activas > 0:
+            self.widget.after(self.intervalo_ms, self._despachar)
+        if self.al_cambiar_ocupado and (antes == 0) != (self.activas == 0):
+            self.al_cambiar_ocupado(self.activas > 0)
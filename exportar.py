@@ -0,0 +1,172 @@
+import argparse
+import csv
+import os
+from datetime import date
+from sqlalchemy import Date, Float, Integer, select
+from sqlalchemy.orm import Session
+from database import init_db, get_session
+from models import Cliente, Ingrediente, Menu, Pedido
+from typing import Dict, List
+
+# Exportación de pedidos y catálogo a CSV, Parquet o Arrow (IPC) para contabilidad.
+# Las filas se leen con cursor del lado del servidor (stream_results) de a lote filas y cada
+# lote se escribe antes de leer el siguiente: la memoria no depende del tamaño de la tabla.
+# Parquet y Arrow requieren pyarrow.
+#
+# Uso: python exportar.py [pedidos clientes menus ingredientes] --formato csv|parquet|arrow
+
+FORMATOS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+ENTIDADES = ('pedidos', 'clientes', 'menus', 'ingredientes')
+
+def _columnas(entidad: str) -> List:
+    if entidad == 'pedidos':
+        return [
+            Pedido.id,
+            Pedido.fecha,
+            Pedido.cliente_id,
+            Cliente.nombre.label('cliente'),
+            Cliente.email.label('cliente_email'),
+            Pedido.menu_id,
+            Menu.nombre.label('menu'),
+            Pedido.cantidad,
+            Pedido.total,
+            Pedido.descripcion
+        ]
+    if entidad == 'clientes':
+        return [Cliente.id, Cliente.nombre, Cliente.email]
+    if entidad == 'menus':
+        return [Menu.id, Menu.nombre, Menu.descripcion, Menu.precio, Menu.porciones_disponibles]
+    if entidad == 'ingredientes':
+        return [Ingrediente.id, Ingrediente.nombre, Ingrediente.tipo, Ingrediente.cantidad, Ingrediente.unidad_medida]
+    raise ValueError(f"Entidad no válida: {entidad}")
+
+def _consulta(entidad: str, desde: date = None, hasta: date = None):
+    columnas = _columnas(entidad)
+    stmt = select(*columnas)
+    if entidad == 'pedidos':
+        stmt = stmt.outerjoin(Cliente, Pedido.cliente_id == Cliente.id).outerjoin(Menu, Pedido.menu_id == Menu.id)
+        if desde is not None:
+            stmt = stmt.where(Pedido.fecha >= desde)
+        if hasta is not None:
+            stmt = stmt.where(Pedido.fecha <= hasta)
+    return stmt.order_by(columnas[0]), columnas
+
+def _esquema_arrow(columnas):
+    import pyarrow as pa
+    
+    def tipo(columna):
+        if isinstance(columna.type, Integer):
+            return pa.int64()
+        if isinstance(columna.type, Float):
+            return pa.float64()
+        if isinstance(columna.type, Date):
+            return pa.date32()
+        return pa.string()
+    
+    return pa.schema([(columna.key, tipo(columna)) for columna in columnas])
+
+class _EscritorCSV:
+    def __init__(self, ruta: str, columnas):
+        self.archivo = open(ruta, 'w', newline='', encoding='utf-8')
+        self.escritor = csv.writer(self.archivo)
+        self.escritor.writerow([columna.key for columna in columnas])
+    
+    def escribir(self, filas):
+        self.escritor.writerows(filas)
+    
+    def cerrar(self):
+        self.archivo.close()
+
+class _EscritorArrow:
+    # Parquet (ParquetWriter, un row group por lote) o Arrow IPC en formato archivo
+    def __init__(self, ruta: str, columnas, formato: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError(f"Exportar a {formato} requiere pyarrow (pip install pyarrow)")
+        
+        self.pa = pa
+        self.esquema = _esquema_arrow(columnas)
+        if formato == 'parquet':
+            self.escritor = pq.ParquetWriter(ruta, self.esquema, compression='snappy')
+        else:
+            self.escritor = pa.ipc.new_file(ruta, self.esquema)
+    
+    def escribir(self, filas):
+        # Por columnas: una lista por campo en lugar de un dict por fila
+        columnas = list(zip(*filas))
+        self.escritor.write_batch(self.pa.record_batch(
+            [self.pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self.esquema)],
+            schema=self.esquema
+        ))
+    
+    def cerrar(self):
+        self.escritor.close()
+
+def exportar(
+    session: Session,
+    entidad: str,
+    ruta: str,
+    formato: str = 'csv',
+    desde: date = None,
+    hasta: date = None,
+    lote: int = 10000
+) -> int:
+    # Devuelve la cantidad de filas escritas. desde/hasta solo filtran pedidos.
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no válido: {formato}")
+    
+    stmt, columnas = _consulta(entidad, desde, hasta)
+    escritor = _EscritorCSV(ruta, columnas) if formato == 'csv' else _EscritorArrow(ruta, columnas, formato)
+    filas = 0
+    try:
+        resultado = session.execute(stmt.execution_options(stream_results=True, yield_per=lote))
+        for particion in resultado.partitions():
+            escritor.escribir(particion)
+            filas += len(particion)
+    finally:
+        escritor.cerrar()
+    return filas
+
+def exportar_todo(
+    session: Session,
+    carpeta: str,
+    formato: str = 'csv',
+    entidades=ENTIDADES,
+    desde: date = None,
+    hasta: date = None
+) -> Dict[str, int]:
+    os.makedirs(carpeta, exist_ok=True)
+    return {
+        entidad: exportar(session, entidad, os.path.join(carpeta, entidad + FORMATOS[formato]), formato, desde, hasta)
+        for entidad in entidades
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar pedidos y catálogo a CSV, Parquet o Arrow")
+    parser.add_argument('entidades', nargs='*', help=f"Entre {', '.join(ENTIDADES)} (por defecto todas)")
+    parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+    parser.add_argument('--carpeta', default='exportacion')
+    parser.add_argument('--desde', type=date.fromisoformat, help="Solo pedidos desde AAAA-MM-DD")
+    parser.add_argument('--hasta', type=date.fromisoformat, help="Solo pedidos hasta AAAA-MM-DD")
+    argumentos = parser.parse_args()
+    for entidad in argumentos.entidades:
+        if entidad not in ENTIDADES:
+            parser.error(f"Entidad no válida: {entidad}")
+    
+    engine = init_db(informar=None)
+    session = get_session(engine)
+    try:
+        filas = exportar_todo(
+            session, argumentos.carpeta, argumentos.formato,
+            argumentos.entidades or ENTIDADES, argumentos.desde, argumentos.hasta
+        )
+    finally:
+        session.close()
+    
+    for entidad, cantidad in filas.items():
+        print(f"{entidad}: {cantidad} filas -> {os.path.join(argumentos.carpeta, entidad + FORMATOS[argumentos.formato])}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,8 +1,8 @@
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from collections import OrderedDict
+from matplotlib.figure import Figure
 from sqlalchemy.orm import Session
 from models import Pedido, Menu
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Dict
 import numpy as np
 
@@ -18,157 +18,226 @@ class GraficoFactory:
         else:
             raise ValueError(f"Tipo de gráfico no válido: {tipo}")
 
+class CacheGraficos:
+    # Los gráficos usados más recientemente, uno por tipo y parámetros (período, fechas),
+    # cada uno con su figura y la versión de los datos con que se dibujó. Si la versión
+    # cambió, preparar vuelve a consultar y aplicar actualiza esa misma figura; los que
+    # salen de la caché se cierran (al_descartar permite soltar antes su canvas). Sin
+    # session, los gráficos solo se actualizan con preparar(session) y aplicar, no con generar.
+    def __init__(self, session: Session = None, maximo: int = 6, al_descartar=None):
+        self.session = session
+        self.maximo = maximo
+        self.al_descartar = al_descartar
+        self.graficos = OrderedDict()
+    
+    def obtener(self, tipo: str, **kwargs):
+        clave = (tipo, tuple(sorted(kwargs.items())))
+        grafico = self.graficos.pop(clave, None)
+        if grafico is None:
+            grafico = GraficoFactory.crear_grafico(tipo, self.session, **kwargs)
+        self.graficos[clave] = grafico
+        
+        while len(self.graficos) > self.maximo:
+            _, descartado = self.graficos.popitem(last=False)
+            self._descartar(descartado)
+        return grafico
+    
+    def limpiar(self):
+        while self.graficos:
+            _, descartado = self.graficos.popitem()
+            self._descartar(descartado)
+    
+    def _descartar(self, grafico):
+        if self.al_descartar:
+            self.al_descartar(grafico)
+        grafico.cerrar()
+
 class GraficoBase:
+    # Entidades de catalogo_version de las que dependen los datos del gráfico
+    ENTIDADES = ('ventas',)
+    
     def __init__(self, session: Session):
         self.session = session
-        self.fig, self.ax = plt.subplots(figsize=(8, 5))
+        # Figure sin pyplot: no queda registrada en el gestor global de figuras, así que
+        # se libera al descartarla en lugar de acumularse con cada gráfico
+        self.fig = Figure(figsize=(8, 5))
+        self.ax = self.fig.add_subplot()
+        self.version = None
+        self.dibujado = False
     
     def generar(self):
-        raise NotImplementedError("Método 'generar' debe ser implementado por subclases")
+        self.aplicar(self.preparar(self.session))
+    
+    # obtener_datos y preparar solo consultan la base (pueden correr en otro hilo con otra
+    # sesión); dibujar y aplicar solo usan matplotlib y deben correr en el hilo de la interfaz
+    def obtener_datos(self, session: Session):
+        raise NotImplementedError("Método 'obtener_datos' debe ser implementado por subclases")
+    
+    def dibujar(self, datos):
+        raise NotImplementedError("Método 'dibujar' debe ser implementado por subclases")
+    
+    def preparar(self, session: Session):
+        # None si los datos no cambiaron desde el último dibujo: la figura sirve tal cual
+        from crud.catalogo import versiones
+        
+        version = versiones(session, self.ENTIDADES)
+        if self.dibujado and version == self.version:
+            return None
+        return version, self.obtener_datos(session)
+    
+    def aplicar(self, preparado) -> bool:
+        # Devuelve True si la figura cambió y hay que volver a pintarla
+        if preparado is None:
+            return False
+        
+        version, datos = preparado
+        if not (self.dibujado and self.actualizar_artistas(datos)):
+            self.dibujado = False
+            self.ax.clear()
+            self.dibujar(datos)
+        self.version = version
+        self.dibujado = True
+        return True
+    
+    def actualizar_artistas(self, datos) -> bool:
+        # Cambios solo de valores: modificar los artistas existentes sin rehacer el gráfico.
+        # False si cambiaron las categorías y hay que redibujar (sobre la misma figura).
+        return False
+    
+    def cerrar(self):
+        self.fig.clear()
+        self.dibujado = False
     
     def obtener_figura(self):
         return self.fig
 
 class GraficoVentasPorFecha(GraficoBase):
-    def __init__(self, session: Session, periodo: str = 'diario'):
+    # Título y etiqueta del eje X para cada período
+    PERIODOS = {
+        'diario': ('Ventas Diarias', 'Fecha'),
+        'semanal': ('Ventas Semanales', 'Semana (Año-Número)'),
+        'mensual': ('Ventas Mensuales', 'Mes'),
+        'anual': ('Ventas Anuales', 'Año')
+    }
+    
+    def __init__(self, session: Session, periodo: str = 'diario', desde: date = None, hasta: date = None):
         super().__init__(session)
         self.periodo = periodo
+        self.desde = desde
+        self.hasta = hasta
     
-    def generar(self):
-        pedidos = self.session.query(Pedido).order_by(Pedido.fecha).all()
+    def obtener_datos(self, session: Session):
+        from crud.estadistica_crud import ventas_por_periodo
+        
+        if self.periodo not in self.PERIODOS:
+            raise ValueError(f"Período no válido: {self.periodo}")
         
-        if not pedidos:
+        return ventas_por_periodo(session, self.periodo, self.desde, self.hasta)
+    
+    def dibujar(self, ventas):
+        self.barras = None
+        if not ventas:
             self.ax.text(0.5, 0.5, 'No hay datos de pedidos', ha='center', va='center')
             self.ax.set_title('Ventas por Fecha - Sin Datos')
             return
         
-        fechas = [p.fecha for p in pedidos]
-        montos = [p.total for p in pedidos]
-        
-        if self.periodo == 'diario':
-            fechas_str = [fecha.strftime('%Y-%m-%d') for fecha in fechas]
-            self.ax.bar(fechas_str, montos)
-            self.ax.set_title('Ventas Diarias')
-            self.ax.set_xlabel('Fecha')
-            self.ax.set_ylabel('Total Ventas ($)')
-            plt.xticks(rotation=45)
-        
-        elif self.periodo == 'semanal':
-            # Agrupar por semana
-            semanas = {}
-            for fecha, monto in zip(fechas, montos):
-                semana = fecha.strftime('%Y-%U')
-                if semana not in semanas:
-                    semanas[semana] = 0.0
-                semanas[semana] += monto
-            
-            semanas_ordenadas = sorted(semanas.items())
-            self.ax.bar([s[0] for s in semanas_ordenadas], [s[1] for s in semanas_ordenadas])
-            self.ax.set_title('Ventas Semanales')
-            self.ax.set_xlabel('Semana (Año-Número)')
-            self.ax.set_ylabel('Total Ventas ($)')
-            plt.xticks(rotation=45)
-        
-        elif self.periodo == 'mensual':
-            # Agrupar por mes
-            meses = {}
-            for fecha, monto in zip(fechas, montos):
-                mes = fecha.strftime('%Y-%m')
-                if mes not in meses:
-                    meses[mes] = 0.0
-                meses[mes] += monto
-            
-            meses_ordenados = sorted(meses.items())
-            self.ax.bar([m[0] for m in meses_ordenados], [m[1] for m in meses_ordenados])
-            self.ax.set_title('Ventas Mensuales')
-            self.ax.set_xlabel('Mes')
-            self.ax.set_ylabel('Total Ventas ($)')
-            plt.xticks(rotation=45)
-        
-        elif self.periodo == 'anual':
-            # Agrupar por año
-            años = {}
-            for fecha, monto in zip(fechas, montos):
-                año = fecha.strftime('%Y')
-                if año not in años:
-                    años[año] = 0.0
-                años[año] += monto
-            
-            años_ordenados = sorted(años.items())
-            self.ax.bar([a[0] for a in años_ordenados], [a[1] for a in años_ordenados])
-            self.ax.set_title('Ventas Anuales')
-            self.ax.set_xlabel('Año')
-            self.ax.set_ylabel('Total Ventas ($)')
-        
-        else:
-            raise ValueError(f"Período no válido: {self.periodo}")
+        titulo, etiqueta = self.PERIODOS[self.periodo]
+        self.periodos = [v[0] for v in ventas]
+        self.barras = self.ax.bar(self.periodos, [v[1] for v in ventas])
+        self.ax.set_title(titulo)
+        self.ax.set_xlabel(etiqueta)
+        self.ax.set_ylabel('Total Ventas ($)')
+        if self.periodo != 'anual':
+            self.ax.tick_params(axis='x', rotation=45)
+    
+    def actualizar_artistas(self, ventas) -> bool:
+        # Pedidos nuevos en períodos ya dibujados: solo cambian las alturas
+        if self.barras is None or [v[0] for v in ventas] != self.periodos:
+            return False
+        for barra, venta in zip(self.barras, ventas):
+            barra.set_height(venta[1])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return True
 
 class GraficoMenusPopulares(GraficoBase):
-    def generar(self):
-        # Obtener todos los menús con la cantidad de pedidos
-        menus = self.session.query(Menu).all()
-        if not menus:
+    ENTIDADES = ('ventas', 'menus')
+    
+    # Título y etiqueta del eje X para cada criterio de ranking
+    CRITERIOS = {
+        'pedidos': ('Menús Más Comprados', 'Cantidad de Pedidos'),
+        'unidades': ('Menús Más Vendidos', 'Unidades Vendidas'),
+        'ingresos': ('Menús con Más Ingresos', 'Ingresos ($)')
+    }
+    
+    def __init__(
+        self,
+        session: Session,
+        criterio: str = 'pedidos',
+        limite: int = 20,
+        desde: date = None,
+        hasta: date = None
+    ):
+        super().__init__(session)
+        self.criterio = criterio
+        self.limite = limite
+        self.desde = desde
+        self.hasta = hasta
+    
+    def obtener_datos(self, session: Session):
+        from crud.estadistica_crud import menus_populares
+        
+        if self.criterio not in self.CRITERIOS:
+            raise ValueError(f"Criterio no válido: {self.criterio}")
+        
+        # Los limite primeros del ranking, ya ordenados por la base de datos
+        return menus_populares(session, self.criterio, self.limite, self.desde, self.hasta)
+    
+    def dibujar(self, menu_data):
+        self.barras = None
+        if not menu_data:
             self.ax.text(0.5, 0.5, 'No hay menús registrados', ha='center', va='center')
             self.ax.set_title('Menús Populares - Sin Datos')
             return
         
-        menu_data = []
-        for menu in menus:
-            cantidad_pedidos = self.session.query(Pedido).filter_by(menu_id=menu.id).count()
-            menu_data.append((menu.nombre, cantidad_pedidos))
-        
-        # Ordenar por cantidad de pedidos
-        menu_data.sort(key=lambda x: x[1], reverse=True)
-        
-        nombres = [m[0] for m in menu_data]
-        cantidades = [m[1] for m in menu_data]
+        # El primero del ranking arriba
+        self.nombres = [m[0] for m in reversed(menu_data)]
+        valores = [m[1] for m in reversed(menu_data)]
         
-        self.ax.barh(nombres, cantidades)
-        self.ax.set_title('Menús Más Comprados')
-        self.ax.set_xlabel('Cantidad de Pedidos')
+        titulo, etiqueta = self.CRITERIOS[self.criterio]
+        self.barras = self.ax.barh(self.nombres, valores)
+        self.ax.set_title(titulo)
+        self.ax.set_xlabel(etiqueta)
         self.ax.set_ylabel('Menú')
         
         # Ajustar diseño para nombres largos
-        plt.tight_layout()
+        self.fig.tight_layout()
+    
+    def actualizar_artistas(self, menu_data) -> bool:
+        # Mismo ranking que el dibujado: solo cambian los largos de las barras
+        if self.barras is None or [m[0] for m in reversed(menu_data)] != self.nombres:
+            return False
+        for barra, menu in zip(self.barras, reversed(menu_data)):
+            barra.set_width(menu[1])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return True
 
 class GraficoUsoIngredientes(GraficoBase):
-    def generar(self):
-        from models import Ingrediente, menu_ingrediente, Pedido
+    ENTIDADES = ('ventas', 'menus', 'ingredientes')
+    
+    def obtener_datos(self, session: Session):
+        from crud.estadistica_crud import uso_ingredientes
         
-        # Obtener todos los ingredientes
-        ingredientes = self.session.query(Ingrediente).all()
-        if not ingredientes:
+        # Uso de cada ingrediente ponderado por las unidades pedidas
+        return uso_ingredientes(session)
+    
+    def dibujar(self, ingredientes_ordenados):
+        if not ingredientes_ordenados:
             self.ax.text(0.5, 0.5, 'No hay ingredientes registrados', ha='center', va='center')
             self.ax.set_title('Uso de Ingredientes - Sin Datos')
             return
         
-        # Calcular el uso total de cada ingrediente
-        uso_ingredientes = {}
-        for ingrediente in ingredientes:
-            # Obtener todos los menús que usan este ingrediente
-            menus_con_ingrediente = self.session.query(Menu).join(
-                menu_ingrediente, Menu.id == menu_ingrediente.c.menu_id
-            ).filter(menu_ingrediente.c.ingrediente_id == ingrediente.id).all()
-            
-            total_uso = 0.0
-            for menu in menus_con_ingrediente:
-                # Obtener cantidad de este ingrediente en el menú
-                stmt = menu_ingrediente.select().where(
-                    (menu_ingrediente.c.menu_id == menu.id) & 
-                    (menu_ingrediente.c.ingrediente_id == ingrediente.id)
-                )
-                result = self.session.execute(stmt).first()
-                cantidad_por_menu = result.cantidad if result else 0.0
-                
-                # Obtener cantidad de pedidos de este menú
-                cantidad_pedidos = self.session.query(Pedido).filter_by(menu_id=menu.id).count()
-                
-                total_uso += cantidad_por_menu * cantidad_pedidos
-            
-            uso_ingredientes[ingrediente.nombre] = total_uso
-        
-        # Ordenar ingredientes por uso
-        ingredientes_ordenados = sorted(uso_ingredientes.items(), key=lambda x: x[1], reverse=True)
         nombres = [i[0] for i in ingredientes_ordenados]
         usos = [i[1] for i in ingredientes_ordenados]
         
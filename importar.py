@@ -0,0 +1,219 @@
+import argparse
+import csv
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import init_db, get_session, insert_para
+from models import Cliente, Ingrediente, Menu, menu_ingrediente
+from crud.catalogo import marcar_cambio
+from crud.menu_crud import invalidar_recetas, recalcular_porciones
+from typing import Dict, List
+
+# Importación masiva de clientes, ingredientes y menús desde CSV (alta de una sucursal).
+# Las claves únicas existentes se leen una sola vez; cada fila se valida contra ese
+# conjunto y contra las filas anteriores del archivo, y las válidas se insertan por lotes
+# (executemany) dentro de una sola transacción. Las filas inválidas no detienen la
+# importación: se devuelven con su número de línea y el motivo.
+#
+# Con actualizar=True las claves existentes se actualizan (INSERT ... ON CONFLICT DO UPDATE)
+# en lugar de rechazarse.
+#
+# Columnas (con encabezado, UTF-8):
+#     clientes:     nombre,email
+#     ingredientes: nombre,tipo,cantidad,unidad_medida
+#     menus:        nombre,descripcion,precio,ingredientes
+# La columna ingredientes de los menús es la receta: "Harina:200;Huevo:2" (nombre del
+# ingrediente y cantidad). Vacía en un menú existente, conserva la receta actual.
+#
+# Uso: python importar.py clientes|ingredientes|menus archivo.csv [--actualizar]
+
+COLUMNAS = {
+    'clientes': ('nombre', 'email'),
+    'ingredientes': ('nombre', 'tipo', 'cantidad', 'unidad_medida'),
+    'menus': ('nombre', 'descripcion', 'precio', 'ingredientes')
+}
+
+# entidad -> (modelo, columna única, texto del mensaje de duplicado como en los crud)
+CLAVES = {
+    'clientes': (Cliente, 'email', "un cliente con el email"),
+    'ingredientes': (Ingrediente, 'nombre', "un ingrediente con el nombre"),
+    'menus': (Menu, 'nombre', "un menú con el nombre")
+}
+
+def _texto(fila: Dict, columna: str, obligatorio: bool = True) -> str:
+    valor = (fila.get(columna) or '').strip()
+    if obligatorio and not valor:
+        raise ValueError(f"Falta {columna}")
+    return valor
+
+def _numero(fila: Dict, columna: str) -> float:
+    valor = _texto(fila, columna)
+    try:
+        numero = float(valor.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"{columna} no es un número: '{valor}'")
+    if numero < 0:
+        raise ValueError(f"{columna} no puede ser negativo")
+    return numero
+
+def _receta(texto: str, ingredientes: Dict[str, int]) -> Dict[int, float]:
+    receta = {}
+    for parte in filter(None, (parte.strip() for parte in texto.split(';'))):
+        nombre, _, cantidad = parte.rpartition(':')
+        nombre = nombre.strip()
+        if not nombre:
+            raise ValueError(f"Ingrediente sin cantidad: '{parte}'")
+        if nombre not in ingredientes:
+            raise ValueError(f"No se encontró el ingrediente '{nombre}'")
+        receta[ingredientes[nombre]] = _numero({'cantidad': cantidad}, 'cantidad')
+    if not receta:
+        # Una celda como ";" no es "sin receta": con actualizar borraría la existente
+        raise ValueError(f"Receta sin ingredientes: '{texto}'")
+    return receta
+
+def _validar(entidad: str, fila: Dict, ingredientes: Dict[str, int]) -> Dict:
+    if entidad == 'clientes':
+        return {'nombre': _texto(fila, 'nombre'), 'email': _texto(fila, 'email')}
+    if entidad == 'ingredientes':
+        return {
+            'nombre': _texto(fila, 'nombre'),
+            'tipo': _texto(fila, 'tipo'),
+            'cantidad': _numero(fila, 'cantidad'),
+            'unidad_medida': _texto(fila, 'unidad_medida')
+        }
+    receta = _texto(fila, 'ingredientes', obligatorio=False)
+    return {
+        'nombre': _texto(fila, 'nombre'),
+        'descripcion': _texto(fila, 'descripcion', obligatorio=False) or None,
+        'precio': _numero(fila, 'precio'),
+        'receta': _receta(receta, ingredientes) if receta else None
+    }
+
+def _escribir(session: Session, entidad: str, filas: List[Dict], actualizar: bool) -> List[int]:
+    # Un executemany por lote; devuelve los ids de los menús escritos (para sus recetas)
+    modelo, clave, _ = CLAVES[entidad]
+    tabla = modelo.__table__
+    recetas = {fila['nombre']: fila.pop('receta') for fila in filas} if entidad == 'menus' else None
+    
+    if actualizar:
+        stmt = insert_para(session, tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c[clave]],
+            set_={columna: stmt.excluded[columna] for columna in filas[0] if columna != clave}
+        )
+    else:
+        stmt = tabla.insert()
+    session.execute(stmt, filas)
+    
+    if recetas is None:
+        return []
+    
+    ids = dict(session.execute(select(Menu.nombre, Menu.id).where(Menu.nombre.in_(list(recetas)))).all())
+    con_receta = [ids[nombre] for nombre, receta in recetas.items() if receta is not None]
+    if actualizar and con_receta:
+        session.execute(menu_ingrediente.delete().where(menu_ingrediente.c.menu_id.in_(con_receta)))
+    asociaciones = [
+        {'menu_id': ids[nombre], 'ingrediente_id': ingrediente_id, 'cantidad': cantidad}
+        for nombre, receta in recetas.items() if receta
+        for ingrediente_id, cantidad in receta.items()
+    ]
+    if asociaciones:
+        session.execute(menu_ingrediente.insert(), asociaciones)
+    return list(ids.values())
+
+def importar(
+    session: Session,
+    entidad: str,
+    ruta: str,
+    actualizar: bool = False,
+    lote: int = 5000
+) -> Dict:
+    # Devuelve {'insertadas': n, 'actualizadas': n, 'rechazadas': [(línea, motivo), ...]}
+    if entidad not in CLAVES:
+        raise ValueError(f"Entidad no válida: {entidad}")
+    
+    modelo, clave, descripcion = CLAVES[entidad]
+    existentes = {valor for (valor,) in session.query(getattr(modelo, clave)).all()}
+    ingredientes = dict(session.query(Ingrediente.nombre, Ingrediente.id).all()) if entidad == 'menus' else {}
+    
+    vistas = {}  # clave -> línea donde apareció en el archivo
+    pendientes = []
+    menu_ids = []
+    resultado = {'insertadas': 0, 'actualizadas': 0, 'rechazadas': []}
+    
+    try:
+        with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+            lector = csv.DictReader(archivo)
+            faltantes = [columna for columna in COLUMNAS[entidad] if columna not in (lector.fieldnames or [])]
+            if faltantes and faltantes != ['ingredientes']:
+                raise ValueError(f"Faltan columnas en {ruta}: {', '.join(faltantes)}")
+            
+            for fila in lector:
+                linea = lector.line_num
+                try:
+                    datos = _validar(entidad, fila, ingredientes)
+                    valor = datos[clave]
+                    if valor in vistas:
+                        raise ValueError(f"'{valor}' repetido (línea {vistas[valor]})")
+                    if valor in existentes and not actualizar:
+                        raise ValueError(f"Ya existe {descripcion} '{valor}'")
+                except ValueError as e:
+                    resultado['rechazadas'].append((linea, str(e)))
+                    continue
+                
+                vistas[valor] = linea
+                resultado['actualizadas' if valor in existentes else 'insertadas'] += 1
+                pendientes.append(datos)
+                if len(pendientes) >= lote:
+                    menu_ids += _escribir(session, entidad, pendientes, actualizar)
+                    pendientes = []
+        
+        if pendientes:
+            menu_ids += _escribir(session, entidad, pendientes, actualizar)
+        
+        if vistas:
+            if menu_ids:
+                recalcular_porciones(session, menu_ids=menu_ids)
+            elif entidad == 'ingredientes' and resultado['actualizadas']:
+                recalcular_porciones(session)  # Cambió el stock de ingredientes ya usados
+            marcar_cambio(session, entidad)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    
+    if entidad != 'clientes' and vistas:
+        invalidar_recetas()
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar clientes, ingredientes o menús desde CSV")
+    parser.add_argument('entidad', choices=list(COLUMNAS))
+    parser.add_argument('archivo')
+    parser.add_argument('--actualizar', action='store_true', help="Actualizar las filas existentes en lugar de rechazarlas")
+    parser.add_argument('--rechazos', help="Guardar las filas rechazadas (línea, motivo) en este CSV")
+    argumentos = parser.parse_args()
+    
+    engine = init_db(informar=None)
+    session = get_session(engine)
+    try:
+        resultado = importar(session, argumentos.entidad, argumentos.archivo, argumentos.actualizar)
+    except (ValueError, OSError) as e:
+        parser.exit(1, f"Error: {e}\n")
+    finally:
+        session.close()
+    
+    rechazadas = resultado['rechazadas']
+    print(f"{resultado['insertadas']} insertadas, {resultado['actualizadas']} actualizadas, {len(rechazadas)} rechazadas")
+    if argumentos.rechazos:
+        with open(argumentos.rechazos, 'w', newline='', encoding='utf-8') as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(['linea', 'motivo'])
+            escritor.writerows(rechazadas)
+    else:
+        for linea, motivo in rechazadas[:20]:
+            print(f"  línea {linea}: {motivo}")
+        if len(rechazadas) > 20:
+            print(f"  ... y {len(rechazadas) - 20} más (use --rechazos archivo.csv)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,9 +1,24 @@
-from database import init_db
+import sys
+from database import init_db, get_session
+from migraciones import version_actual
+
+def reconstruir_ventas(engine):
+    from crud.estadistica_crud import reconstruir_ventas_diarias
+    
+    print("Reconstruyendo resumen de ventas diarias...")
+    session = get_session(engine)
+    filas = reconstruir_ventas_diarias(session)
+    session.close()
+    print(f"Resumen reconstruido: {filas} filas (día x menú)")
 
 def main():
     print("Inicializando base de datos...")
     engine = init_db()
-    print("Base de datos creada exitosamente en 'restaurante.db'")
+    print(f"Base de datos lista (versión de esquema {version_actual(engine)})")
+    
+    # python main.py --reconstruir-ventas: backfill del resumen en una base existente
+    if "--reconstruir-ventas" in sys.argv[1:]:
+        reconstruir_ventas(engine)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
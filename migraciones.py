@@ -0,0 +1,115 @@
+import time
+from datetime import datetime
+from sqlalchemy import func, inspect, text
+from database import Base, get_session
+from typing import List, Tuple
+
+# Migraciones de esquema versionadas. init_db crea con create_all las tablas nuevas y
+# después aplica, en orden, los pasos cuya versión aún no figura en schema_version.
+# Cada paso recibe el engine, debe ser idempotente y hacer sus backfills por lotes
+# (un commit por lote) para que la base siga disponible mientras corre.
+
+def _crear_indices(engine):
+    # create_all no modifica tablas existentes: crear los índices que les falten
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(engine, checkfirst=True)
+    
+    # Bases anteriores sin clave primaria en menu_ingrediente: quitar filas duplicadas
+    # (se conserva la primera con cantidad, no una con cantidad NULL) y garantizar la
+    # unicidad (menu_id, ingrediente_id) con un índice único
+    if engine.dialect.name == 'sqlite' and not inspect(engine).get_pk_constraint('menu_ingrediente')['constrained_columns']:
+        with engine.begin() as conexion:
+            conexion.execute(text(
+                "DELETE FROM menu_ingrediente WHERE rowid IN ("
+                "SELECT fila FROM (SELECT rowid AS fila, ROW_NUMBER() OVER ("
+                "PARTITION BY menu_id, ingrediente_id ORDER BY cantidad IS NULL, rowid"
+                ") AS orden FROM menu_ingrediente) WHERE orden > 1)"
+            ))
+            conexion.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_menu_ingrediente "
+                "ON menu_ingrediente (menu_id, ingrediente_id)"
+            ))
+
+def _backfill_ventas_diarias(engine):
+    from crud.estadistica_crud import reconstruir_ventas_diarias
+    
+    session = get_session(engine)
+    try:
+        reconstruir_ventas_diarias(session)
+    finally:
+        session.close()
+
+def _porciones_disponibles(engine):
+    from crud.menu_crud import recalcular_porciones
+    
+    columnas = {columna['name'] for columna in inspect(engine).get_columns('menus')}
+    if 'porciones_disponibles' not in columnas:
+        with engine.begin() as conexion:
+            conexion.execute(text("ALTER TABLE menus ADD COLUMN porciones_disponibles INTEGER"))
+    
+    session = get_session(engine)
+    try:
+        recalcular_porciones(session)
+        session.commit()
+    finally:
+        session.close()
+
+def _indices_busqueda(engine):
+    from crud.busqueda import crear_indices_fts
+    crear_indices_fts(engine)
+
+def _indice_ventas_menu_fecha(engine):
+    # (menu_id, fecha) reemplaza al índice de menu_id solo: también sirve para buscar por menú
+    _crear_indices(engine)
+    with engine.begin() as conexion:
+        conexion.execute(text("DROP INDEX IF EXISTS ix_ventas_diarias_menu_id"))
+
+MIGRACIONES = [
+    (1, "Índices de claves foráneas y columnas de filtro", _crear_indices),
+    (2, "Resumen ventas_diarias desde el historial de pedidos", _backfill_ventas_diarias),
+    (3, "Porciones disponibles por menú según el stock", _porciones_disponibles),
+    (4, "Índices de búsqueda por texto (FTS5)", _indices_busqueda),
+    (5, "Índice (menu_id, fecha) del resumen de ventas", _indice_ventas_menu_fecha),
+]
+
+def aplicar_migraciones(engine, informar=print) -> List[Tuple[int, str, float]]:
+    from models import VersionEsquema
+    
+    session = get_session(engine)
+    try:
+        aplicadas = {version for (version,) in session.query(VersionEsquema.version).all()}
+        session.rollback()
+        
+        informe = []
+        for version, descripcion, paso in MIGRACIONES:
+            if version in aplicadas:
+                continue
+            
+            inicio = time.perf_counter()
+            paso(engine)
+            segundos = time.perf_counter() - inicio
+            
+            session.add(VersionEsquema(
+                version=version,
+                descripcion=descripcion,
+                aplicada=datetime.now(),
+                segundos=segundos
+            ))
+            session.commit()
+            
+            informe.append((version, descripcion, segundos))
+            if informar:
+                informar(f"Migración {version} ({descripcion}): {segundos:.2f} s")
+        return informe
+    finally:
+        session.close()
+
+def version_actual(engine) -> int:
+    from models import VersionEsquema
+    
+    session = get_session(engine)
+    try:
+        return session.query(func.max(VersionEsquema.version)).scalar() or 0
+    finally:
+        session.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -7,9 +7,11 @@ from database import Base
 menu_ingrediente = Table(
     'menu_ingrediente', 
     Base.metadata,
-    Column('menu_id', Integer, ForeignKey('menus.id')),
-    Column('ingrediente_id', Integer, ForeignKey('ingredientes.id')),
-    Column('cantidad', Float)
+    Column('menu_id', Integer, ForeignKey('menus.id'), primary_key=True),
+    Column('ingrediente_id', Integer, ForeignKey('ingredientes.id'), primary_key=True),
+    Column('cantidad', Float),
+    # La clave primaria cubre las búsquedas por menú; este índice, las búsquedas por ingrediente
+    Index('ix_menu_ingrediente_ingrediente_id', 'ingrediente_id')
 )
 
 class Ingrediente(Base):
@@ -33,6 +35,9 @@ class Menu(Base):
     nombre = Column(String(100), unique=True, nullable=False)
     descripcion = Column(String(255))
     precio = Column(Float, nullable=False)
+    # Porciones que alcanza el stock actual (mínimo de stock / cantidad en la receta);
+    # NULL si la receta no tiene ingredientes. Ver recalcular_porciones en crud/menu_crud.py
+    porciones_disponibles = Column(Integer)
     
     ingredientes = relationship('Ingrediente', secondary=menu_ingrediente, back_populates='menus')
     pedidos = relationship('Pedido', back_populates='menu')
@@ -58,14 +63,68 @@ class Pedido(Base):
     id = Column(Integer, primary_key=True)
     descripcion = Column(String(255))
     total = Column(Float, nullable=False)
-    fecha = Column(Date, default=datetime.now)
+    fecha = Column(Date, default=datetime.now, index=True)
     cantidad = Column(Integer, nullable=False)
     
     cliente_id = Column(Integer, ForeignKey('clientes.id'))
-    menu_id = Column(Integer, ForeignKey('menus.id'))
+    menu_id = Column(Integer, ForeignKey('menus.id'), index=True)
+    
+    # Pedidos de un cliente ordenados por fecha (el índice también cubre cliente_id solo)
+    __table_args__ = (Index('ix_pedidos_cliente_id_fecha', 'cliente_id', 'fecha'),)
     
     cliente = relationship('Cliente', back_populates='pedidos')
     menu = relationship('Menu', back_populates='pedidos')
     
     def __repr__(self):
-        return f"Pedido(total={self.total}, fecha='{self.fecha}')"
\ No newline at end of file
+        return f"Pedido(total={self.total}, fecha='{self.fecha}')"
+
+class VentaDiaria(Base):
+    # Resumen materializado de ventas por día y menú, mantenido al crear/eliminar pedidos
+    __tablename__ = 'ventas_diarias'
+    
+    fecha = Column(Date, primary_key=True)
+    menu_id = Column(Integer, primary_key=True)  # Sin FK: conserva las ventas de menús eliminados
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Float, nullable=False, default=0.0)
+    
+    # Ventas de un menú dentro de un rango de fechas (ranking por ventana)
+    __table_args__ = (Index('ix_ventas_diarias_menu_id_fecha', 'menu_id', 'fecha'),)
+    
+    def __repr__(self):
+        return f"VentaDiaria(fecha='{self.fecha}', menu_id={self.menu_id}, pedidos={self.pedidos})"
+
+class ReconstruccionVentas(Base):
+    # Avance de reconstruir_ventas_diarias mientras corre (una sola fila, se borra al terminar):
+    # los pedidos con id en (progreso, maximo] todavía no están en el resumen
+    __tablename__ = 'ventas_reconstruccion'
+    
+    id = Column(Integer, primary_key=True)
+    progreso = Column(Integer, nullable=False, default=0)
+    maximo = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"ReconstruccionVentas(progreso={self.progreso}, maximo={self.maximo})"
+
+class VersionEsquema(Base):
+    # Migraciones aplicadas a la base (ver migraciones.py)
+    __tablename__ = 'schema_version'
+    
+    version = Column(Integer, primary_key=True)
+    descripcion = Column(String(255), nullable=False)
+    aplicada = Column(DateTime, default=datetime.now)
+    segundos = Column(Float)
+    
+    def __repr__(self):
+        return f"VersionEsquema(version={self.version}, descripcion='{self.descripcion}')"
+
+class VersionCatalogo(Base):
+    # Contador de cambios por entidad del catálogo (menus, clientes, ingredientes) para que
+    # las cachés de otros procesos que comparten la base detecten que deben recargarse
+    __tablename__ = 'catalogo_version'
+    
+    entidad = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"VersionCatalogo(entidad='{self.entidad}', version={self.version})"
\ No newline at end of file
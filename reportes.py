@@ -0,0 +1,336 @@
+import argparse
+import multiprocessing
+import os
+import threading
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime, timedelta
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+from sqlalchemy.orm import Session
+from database import init_db, crear_engine, get_session
+from models import Pedido
+from graficos import GraficoVentasPorFecha, GraficoMenusPopulares
+from typing import List, Iterator
+
+# Boletas y reportes de ventas en PDF sin interfaz (ni Tk ni pyplot): las páginas son
+# Figure de matplotlib guardadas con el backend PDF, y los gráficos son las mismas clases
+# de graficos.py que usa la pestaña Estadísticas. Los pedidos se leen por lotes
+# (yield_per), así que ni los reportes ni la generación masiva de boletas cargan el
+# historial entero en memoria.
+#
+# Uso: python reportes.py diario|mensual|boletas [opciones]
+
+CARPETA_BOLETAS = os.environ.get('RESTAURANTE_BOLETAS', 'boletas')
+
+ANCHO_BOLETA = 40  # caracteres por línea (papel de 80 mm)
+LINEAS_POR_PAGINA = 70
+TAMAÑO_A4 = (8.27, 11.69)
+
+# Las páginas de solo texto usan las fuentes estándar del PDF (Courier, Helvetica) en lugar
+# de incrustar DejaVu: unas 10 veces más rápido y archivos más chicos. Los gráficos
+# conservan las fuentes de matplotlib. Las fuentes estándar solo se eligen con rcParams,
+# que es global al proceso: nunca se cambian en el de la interfaz, donde Tk dibuja los
+# gráficos mientras otro hilo genera la boleta. Las boletas se dibujan en procesos que
+# solo generan PDF; los reportes, en la línea de comandos.
+FUENTES_PDF = {'pdf.use14corefonts': True}
+
+def _usar_fuentes_pdf():
+    matplotlib.rcParams.update(FUENTES_PDF)
+
+# ========== Boletas ==========
+
+def _consulta_boletas(session: Session):
+    from models import Cliente, Menu  # Importación local para evitar circularidad
+    
+    return session.query(
+        Pedido.id,
+        Pedido.fecha,
+        Pedido.cantidad,
+        Pedido.total,
+        Pedido.descripcion,
+        Cliente.nombre.label('cliente'),
+        Cliente.email,
+        Menu.nombre.label('menu')
+    ).outerjoin(Cliente, Pedido.cliente_id == Cliente.id).outerjoin(Menu, Pedido.menu_id == Menu.id)
+
+def _renglon(izquierda: str, derecha: str) -> str:
+    espacio = ANCHO_BOLETA - len(derecha) - 1
+    return f"{izquierda[:espacio]:<{espacio}} {derecha}"
+
+def lineas_boleta(filas) -> List[str]:
+    # Texto de la boleta de un carrito (filas de _consulta_boletas del mismo cliente)
+    primera = filas[0]
+    separador = '-' * ANCHO_BOLETA
+    lineas = [
+        'RESTAURANTE'.center(ANCHO_BOLETA),
+        f"Boleta N° {primera.id:06d}".center(ANCHO_BOLETA),
+        separador,
+        f"Fecha:   {primera.fecha}",
+        f"Cliente: {primera.cliente or '-'}"[:ANCHO_BOLETA],
+    ]
+    if primera.email:
+        lineas.append(f"         {primera.email}"[:ANCHO_BOLETA])
+    lineas.append(separador)
+    
+    for fila in filas:
+        detalle = f"{fila.cantidad} x {fila.menu}" if fila.menu else (fila.descripcion or f"Pedido {fila.id}")
+        lineas.append(_renglon(detalle, f"${fila.total:,.2f}"))
+    
+    lineas += [
+        separador,
+        _renglon('TOTAL', f"${sum(fila.total for fila in filas):,.2f}"),
+        '',
+        '¡Gracias por su compra!'.center(ANCHO_BOLETA)
+    ]
+    return lineas
+
+def dibujar_boleta(filas) -> Figure:
+    return _figura_boleta(lineas_boleta(filas))
+
+def _figura_boleta(lineas: List[str]) -> Figure:
+    alto = 0.6 + 0.17 * len(lineas)
+    figura = Figure(figsize=(3.15, alto))
+    figura.text(
+        0.5, 1 - 0.3 / alto, '\n'.join(lineas),
+        ha='center', va='top', multialignment='left',
+        family='monospace', weight='medium', fontsize=8, linespacing=1.4
+    )
+    return figura
+
+def _guardar_texto(figura: Figure, destino):
+    # destino: ruta o PdfPages. Con las fuentes que tenga activas el proceso
+    if isinstance(destino, PdfPages):
+        destino.savefig(figura)
+    else:
+        figura.savefig(destino, format='pdf')
+
+# Las boletas que se piden desde la interfaz se dibujan en un proceso aparte, con las
+# fuentes estándar; el hilo que llama solo consulta los pedidos y espera el resultado.
+_pool_boletas = None
+_pool_boletas_lock = threading.Lock()
+
+def _proceso_boletas() -> ProcessPoolExecutor:
+    global _pool_boletas
+    with _pool_boletas_lock:
+        if _pool_boletas is None:
+            # spawn: no copiar por fork un proceso con hilos (Tk, EjecutorDB)
+            _pool_boletas = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn'), initializer=_usar_fuentes_pdf
+            )
+        return _pool_boletas
+
+def _guardar_boleta_pdf(lineas: List[str], ruta: str) -> str:
+    _guardar_texto(_figura_boleta(lineas), ruta)
+    return ruta
+
+def guardar_boleta(session: Session, pedido_ids: List[int], ruta: str = None, carpeta: str = CARPETA_BOLETAS) -> str:
+    # Una boleta para los pedidos de un carrito; devuelve la ruta del PDF
+    filas = _consulta_boletas(session).filter(Pedido.id.in_(pedido_ids)).order_by(Pedido.id).all()
+    if not filas:
+        raise ValueError("No se encontraron los pedidos de la boleta")
+    
+    if ruta is None:
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, f"boleta_{filas[0].id:06d}.pdf")
+    return _proceso_boletas().submit(_guardar_boleta_pdf, lineas_boleta(filas), ruta).result()
+
+# Generación masiva: el proceso principal recorre los ids por lotes y cada trabajador del
+# pool consulta y dibuja su lote con su propio engine. Como mucho hay 2 lotes por
+# trabajador en vuelo, así que la memoria no depende de la cantidad de pedidos.
+
+_engine_trabajador = None
+
+def _iniciar_trabajador(url: str):
+    global _engine_trabajador
+    _engine_trabajador = crear_engine(url, pool_size=1)
+    _usar_fuentes_pdf()
+
+def _generar_lote(pedido_ids: List[int], carpeta: str) -> int:
+    session = get_session(_engine_trabajador)
+    try:
+        generadas = 0
+        for fila in _consulta_boletas(session).filter(Pedido.id.in_(pedido_ids)).order_by(Pedido.id):
+            _guardar_texto(dibujar_boleta([fila]), os.path.join(carpeta, f"boleta_{fila.id:06d}.pdf"))
+            generadas += 1
+        return generadas
+    finally:
+        session.close()
+
+def generar_boletas(
+    engine,
+    carpeta: str = CARPETA_BOLETAS,
+    desde: date = None,
+    hasta: date = None,
+    procesos: int = None,
+    lote: int = 200
+) -> int:
+    # Una boleta por pedido del rango; devuelve cuántas se generaron
+    os.makedirs(carpeta, exist_ok=True)
+    procesos = procesos or os.cpu_count() or 1
+    url = engine.url.render_as_string(hide_password=False)
+    
+    session = get_session(engine)
+    query = session.query(Pedido.id)
+    if desde is not None:
+        query = query.filter(Pedido.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(Pedido.fecha <= hasta)
+    
+    generadas = 0
+    pendientes = set()
+    
+    def esperar(maximo: int):
+        nonlocal generadas
+        while len(pendientes) > maximo:
+            listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                pendientes.discard(futuro)
+                generadas += futuro.result()
+    
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador, initargs=(url,)) as pool:
+        ids = []
+        try:
+            for (pedido_id,) in query.order_by(Pedido.id).yield_per(lote):
+                ids.append(pedido_id)
+                if len(ids) == lote:
+                    pendientes.add(pool.submit(_generar_lote, ids, carpeta))
+                    ids = []
+                    esperar(2 * procesos)
+            if ids:
+                pendientes.add(pool.submit(_generar_lote, ids, carpeta))
+            esperar(0)
+        finally:
+            session.close()
+    return generadas
+
+# ========== Reportes de ventas ==========
+
+def _pagina_texto(titulo: str, lineas: List[str]) -> Figure:
+    figura = Figure(figsize=TAMAÑO_A4)
+    figura.text(0.08, 0.95, titulo, ha='left', va='top', fontsize=14, weight='bold')
+    figura.text(
+        0.08, 0.91, '\n'.join(lineas),
+        ha='left', va='top', family='monospace', weight='medium', fontsize=7.5, linespacing=1.35
+    )
+    return figura
+
+def _pagina_resumen(session: Session, titulo: str, desde: date, hasta: date) -> Figure:
+    from crud.estadistica_crud import resumen_ventas, menus_populares
+    
+    pedidos, unidades, ingresos = resumen_ventas(session, desde, hasta)
+    lineas = [
+        f"Período:   {desde} a {hasta}",
+        f"Generado:  {datetime.now():%Y-%m-%d %H:%M}",
+        '',
+        f"Pedidos:   {pedidos:>12,}",
+        f"Unidades:  {unidades:>12,}",
+        f"Ingresos:  {ingresos:>12,.2f}",
+        f"Promedio:  {(ingresos / pedidos if pedidos else 0.0):>12,.2f} por pedido",
+        '',
+        'Menús con más ingresos:',
+        ''
+    ]
+    for posicion, (nombre, total) in enumerate(menus_populares(session, 'ingresos', 15, desde, hasta), 1):
+        lineas.append(f"{posicion:>3}. {nombre[:40]:<40} {total:>12,.2f}")
+    return _pagina_texto(titulo, lineas)
+
+def _paginas_detalle(session: Session, desde: date, hasta: date) -> Iterator[Figure]:
+    # Una página por cada LINEAS_POR_PAGINA pedidos, generada a medida que se leen
+    from crud.pedido_crud import iterar_pedidos
+    
+    encabezado = [f"{'N°':>8} {'Fecha':<10} {'Cliente':<22} {'Menú':<24} {'Cant':>4} {'Total':>10}", '-' * 83]
+    lineas = []
+    pagina = 1
+    for fila in iterar_pedidos(session, desde, hasta):
+        lineas.append(
+            f"{fila.id:>8} {str(fila.fecha):<10} {(fila.cliente or '-')[:22]:<22} "
+            f"{(fila.menu or '-')[:24]:<24} {fila.cantidad:>4} {fila.total:>10,.2f}"
+        )
+        if len(lineas) == LINEAS_POR_PAGINA:
+            yield _pagina_texto(f"Detalle de pedidos ({pagina})", encabezado + lineas)
+            lineas = []
+            pagina += 1
+    if lineas or pagina == 1:
+        yield _pagina_texto(f"Detalle de pedidos ({pagina})", encabezado + (lineas or ['Sin pedidos en el período']))
+
+def reporte_ventas(
+    session: Session,
+    desde: date,
+    hasta: date,
+    ruta: str,
+    titulo: str = 'Reporte de ventas',
+    periodo: str = 'diario',
+    detalle: bool = True
+) -> str:
+    # Cambia rcParams mientras guarda las páginas de texto: solo para procesos sin
+    # interfaz (la línea de comandos), no para llamarla desde un hilo de la aplicación
+    with PdfPages(ruta) as pdf:
+        with matplotlib.rc_context(FUENTES_PDF):
+            _guardar_texto(_pagina_resumen(session, titulo, desde, hasta), pdf)
+        
+        for grafico in (
+            GraficoVentasPorFecha(session, periodo, desde, hasta),
+            GraficoMenusPopulares(session, 'ingresos', 15, desde, hasta)
+        ):
+            grafico.generar()
+            grafico.obtener_figura().tight_layout()
+            pdf.savefig(grafico.obtener_figura())
+            grafico.cerrar()
+        
+        if detalle:
+            with matplotlib.rc_context(FUENTES_PDF):
+                for pagina in _paginas_detalle(session, desde, hasta):
+                    _guardar_texto(pagina, pdf)
+    return ruta
+
+def reporte_diario(session: Session, dia: date, ruta: str = None) -> str:
+    ruta = ruta or f"reporte_{dia:%Y-%m-%d}.pdf"
+    return reporte_ventas(session, dia, dia, ruta, f"Reporte diario {dia}")
+
+def reporte_mensual(session: Session, año: int, mes: int, ruta: str = None) -> str:
+    desde = date(año, mes, 1)
+    hasta = (desde + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    ruta = ruta or f"reporte_{desde:%Y-%m}.pdf"
+    return reporte_ventas(session, desde, hasta, ruta, f"Reporte mensual {desde:%Y-%m}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Boletas y reportes de ventas en PDF")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    
+    diario = sub.add_parser('diario', help="Reporte de un día (por defecto hoy)")
+    diario.add_argument('--fecha', type=date.fromisoformat, default=date.today())
+    diario.add_argument('--salida')
+    
+    mensual = sub.add_parser('mensual', help="Reporte de un mes (por defecto el actual), AAAA-MM")
+    mensual.add_argument('--mes', default=f"{date.today():%Y-%m}")
+    mensual.add_argument('--salida')
+    
+    boletas = sub.add_parser('boletas', help="Una boleta por pedido del rango")
+    boletas.add_argument('--desde', type=date.fromisoformat)
+    boletas.add_argument('--hasta', type=date.fromisoformat)
+    boletas.add_argument('--carpeta', default=CARPETA_BOLETAS)
+    boletas.add_argument('--procesos', type=int)
+    argumentos = parser.parse_args()
+    
+    engine = init_db(informar=None)
+    if argumentos.comando == 'boletas':
+        cantidad = generar_boletas(
+            engine, argumentos.carpeta, argumentos.desde, argumentos.hasta, argumentos.procesos
+        )
+        print(f"{cantidad} boletas en {argumentos.carpeta}")
+        return
+    
+    session = get_session(engine)
+    try:
+        if argumentos.comando == 'diario':
+            ruta = reporte_diario(session, argumentos.fecha, argumentos.salida)
+        else:
+            año, mes = (int(parte) for parte in argumentos.mes.split('-'))
+            ruta = reporte_mensual(session, año, mes, argumentos.salida)
+        print(f"Reporte guardado en {ruta}")
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,432 @@
+import argparse
+import asyncio
+import json
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from urllib.parse import urlsplit, parse_qs
+from sqlalchemy import inspect
+from database import init_db, get_session
+from crud.cliente_crud import (
+    crear_cliente, obtener_cliente, listar_clientes, actualizar_cliente, eliminar_cliente, buscar_clientes
+)
+from crud.ingrediente_crud import (
+    crear_ingrediente, obtener_ingrediente, listar_ingredientes, actualizar_ingrediente,
+    eliminar_ingrediente, buscar_ingredientes
+)
+from crud.menu_crud import (
+    crear_menu, obtener_menu, listar_menus, actualizar_menu, eliminar_menu,
+    obtener_ingredientes_menu, buscar_menus
+)
+from crud.pedido_crud import (
+    obtener_pedido, listar_pedidos, listar_pedidos_por_cliente, eliminar_pedido, crear_pedidos_en_lote
+)
+
+# Servidor HTTP/JSON (solo biblioteca estándar) sobre la capa crud, para que otras cajas,
+# la pantalla de cocina y la web compartan la base con la aplicación de escritorio.
+# Cada solicitud corre en un hilo del pool con su propia sesión (conexiones del pool del
+# engine). Los pedidos que llegan casi a la vez se agrupan: un solo commit por lote y un
+# savepoint por carrito.
+#
+# Uso: python servidor.py [--host 127.0.0.1] [--port 8000]
+
+ESTADOS = {
+    200: 'OK',
+    201: 'Created',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error'
+}
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(mensaje)
+        self.estado = estado
+
+def a_json(valor):
+    # Objetos ORM -> dict de columnas, filas de consultas -> dict, fechas -> ISO 8601
+    if isinstance(valor, (list, tuple)) and not hasattr(valor, '_asdict'):
+        return [a_json(elemento) for elemento in valor]
+    if isinstance(valor, dict):
+        return {clave: a_json(elemento) for clave, elemento in valor.items()}
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if hasattr(valor, '_asdict'):
+        return a_json(valor._asdict())
+    if hasattr(valor, '__table__'):
+        return {
+            atributo.key: a_json(getattr(valor, atributo.key))
+            for atributo in inspect(valor).mapper.column_attrs
+        }
+    return valor
+
+# ========== Rutas ==========
+
+RUTAS = []  # (método, patrón, función(session, consulta, cuerpo, *grupos))
+
+def ruta(metodo: str, patron: str):
+    def registrar(funcion):
+        RUTAS.append((metodo, re.compile(patron + '$'), funcion))
+        return funcion
+    return registrar
+
+def _entero(consulta: dict, nombre: str, por_defecto: int = None) -> int:
+    valores = consulta.get(nombre)
+    if not valores:
+        return por_defecto
+    try:
+        return int(valores[0])
+    except ValueError:
+        raise ErrorHTTP(400, f"Parámetro '{nombre}' inválido")
+
+def _pagina(consulta: dict):
+    limite = min(_entero(consulta, 'limit', LIMITE_POR_DEFECTO), LIMITE_MAXIMO)
+    return _entero(consulta, 'after_id'), limite
+
+def _texto(consulta: dict, nombre: str) -> str:
+    valores = consulta.get(nombre)
+    return valores[0] if valores else ''
+
+def _cantidad(valor) -> int:
+    # Entero mayor o igual a 1 (2 o "2" valen; 1.5, 0 o negativos no)
+    try:
+        cantidad = int(valor)
+        entero = not isinstance(valor, bool) and cantidad == float(valor)
+    except (TypeError, ValueError, OverflowError):
+        entero = False
+    if not entero or cantidad < 1:
+        raise ErrorHTTP(400, f"'cantidad' debe ser un número entero mayor o igual a 1: {valor!r}")
+    return cantidad
+
+def _encontrado(valor, mensaje: str):
+    if not valor:
+        raise ErrorHTTP(404, mensaje)
+    return valor
+
+# Clientes
+@ruta('GET', r'/clientes')
+def _listar_clientes(session, consulta, cuerpo):
+    after_id, limite = _pagina(consulta)
+    return listar_clientes(session, after_id=after_id, limit=limite)
+
+@ruta('GET', r'/clientes/buscar')
+def _buscar_clientes(session, consulta, cuerpo):
+    return buscar_clientes(session, _texto(consulta, 'q'), _entero(consulta, 'limit', 20))
+
+@ruta('GET', r'/clientes/(\d+)')
+def _obtener_cliente(session, consulta, cuerpo, cliente_id):
+    return _encontrado(obtener_cliente(session, int(cliente_id)), "Cliente no encontrado")
+
+@ruta('POST', r'/clientes')
+def _crear_cliente(session, consulta, cuerpo):
+    return 201, crear_cliente(session, cuerpo['nombre'], cuerpo['email'])
+
+@ruta('PUT', r'/clientes/(\d+)')
+def _actualizar_cliente(session, consulta, cuerpo, cliente_id):
+    return actualizar_cliente(session, int(cliente_id), cuerpo.get('nombre'), cuerpo.get('email'))
+
+@ruta('DELETE', r'/clientes/(\d+)')
+def _eliminar_cliente(session, consulta, cuerpo, cliente_id):
+    return {'eliminado': _encontrado(eliminar_cliente(session, int(cliente_id)), "Cliente no encontrado")}
+
+# Ingredientes
+@ruta('GET', r'/ingredientes')
+def _listar_ingredientes(session, consulta, cuerpo):
+    after_id, limite = _pagina(consulta)
+    return listar_ingredientes(session, after_id=after_id, limit=limite)
+
+@ruta('GET', r'/ingredientes/buscar')
+def _buscar_ingredientes(session, consulta, cuerpo):
+    return buscar_ingredientes(session, _texto(consulta, 'q'), _entero(consulta, 'limit', 20))
+
+@ruta('GET', r'/ingredientes/(\d+)')
+def _obtener_ingrediente(session, consulta, cuerpo, ingrediente_id):
+    return _encontrado(obtener_ingrediente(session, int(ingrediente_id)), "Ingrediente no encontrado")
+
+@ruta('POST', r'/ingredientes')
+def _crear_ingrediente(session, consulta, cuerpo):
+    return 201, crear_ingrediente(
+        session, cuerpo['nombre'], cuerpo['tipo'], float(cuerpo['cantidad']), cuerpo['unidad_medida']
+    )
+
+@ruta('PUT', r'/ingredientes/(\d+)')
+def _actualizar_ingrediente(session, consulta, cuerpo, ingrediente_id):
+    cantidad = cuerpo.get('cantidad')
+    return actualizar_ingrediente(
+        session, int(ingrediente_id), cuerpo.get('nombre'), cuerpo.get('tipo'),
+        float(cantidad) if cantidad is not None else None, cuerpo.get('unidad_medida')
+    )
+
+@ruta('DELETE', r'/ingredientes/(\d+)')
+def _eliminar_ingrediente(session, consulta, cuerpo, ingrediente_id):
+    return {'eliminado': _encontrado(eliminar_ingrediente(session, int(ingrediente_id)), "Ingrediente no encontrado")}
+
+# Menús (ingredientes de la receta como {"id_ingrediente": cantidad})
+def _receta(cuerpo):
+    ingredientes = cuerpo.get('ingredientes')
+    if ingredientes is None:
+        return None
+    return {int(ingrediente_id): float(cantidad) for ingrediente_id, cantidad in ingredientes.items()}
+
+@ruta('GET', r'/menus')
+def _listar_menus(session, consulta, cuerpo):
+    after_id, limite = _pagina(consulta)
+    return listar_menus(session, after_id=after_id, limit=limite)
+
+@ruta('GET', r'/menus/buscar')
+def _buscar_menus(session, consulta, cuerpo):
+    return buscar_menus(session, _texto(consulta, 'q'), _entero(consulta, 'limit', 20))
+
+@ruta('GET', r'/menus/(\d+)')
+def _obtener_menu(session, consulta, cuerpo, menu_id):
+    return _encontrado(obtener_menu(session, int(menu_id)), "Menú no encontrado")
+
+@ruta('GET', r'/menus/(\d+)/ingredientes')
+def _ingredientes_menu(session, consulta, cuerpo, menu_id):
+    return obtener_ingredientes_menu(session, int(menu_id))
+
+@ruta('POST', r'/menus')
+def _crear_menu(session, consulta, cuerpo):
+    return 201, crear_menu(
+        session, cuerpo['nombre'], cuerpo.get('descripcion'), float(cuerpo['precio']), _receta(cuerpo) or {}
+    )
+
+@ruta('PUT', r'/menus/(\d+)')
+def _actualizar_menu(session, consulta, cuerpo, menu_id):
+    precio = cuerpo.get('precio')
+    return actualizar_menu(
+        session, int(menu_id), cuerpo.get('nombre'), cuerpo.get('descripcion'),
+        float(precio) if precio is not None else None, _receta(cuerpo)
+    )
+
+@ruta('DELETE', r'/menus/(\d+)')
+def _eliminar_menu(session, consulta, cuerpo, menu_id):
+    return {'eliminado': _encontrado(eliminar_menu(session, int(menu_id)), "Menú no encontrado")}
+
+# Pedidos (POST /pedidos se atiende por lotes en Servidor.crear_pedidos)
+@ruta('GET', r'/pedidos')
+def _listar_pedidos(session, consulta, cuerpo):
+    after_id, limite = _pagina(consulta)
+    cliente_id = _entero(consulta, 'cliente_id')
+    if cliente_id is not None:
+        return listar_pedidos_por_cliente(session, cliente_id, proyeccion=True, after_id=after_id, limit=limite)
+    return listar_pedidos(session, proyeccion=True, after_id=after_id, limit=limite)
+
+@ruta('GET', r'/pedidos/(\d+)')
+def _obtener_pedido(session, consulta, cuerpo, pedido_id):
+    return _encontrado(obtener_pedido(session, int(pedido_id)), "Pedido no encontrado")
+
+@ruta('DELETE', r'/pedidos/(\d+)')
+def _eliminar_pedido(session, consulta, cuerpo, pedido_id):
+    return {'eliminado': _encontrado(eliminar_pedido(session, int(pedido_id)), "Pedido no encontrado")}
+
+# ========== Servidor ==========
+
+class Servidor:
+    def __init__(self, engine, hilos: int = 8, espera_lote: float = 0.005, maximo_lote: int = 64):
+        self.engine = engine
+        self.pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='http')
+        # SQLite admite un solo escritor: los lotes de pedidos se confirman de a uno
+        self.pool_pedidos = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pedidos')
+        self.espera_lote = espera_lote
+        self.maximo_lote = maximo_lote
+        self.pendientes = []  # (solicitud, futuro)
+        self.temporizador = None
+        self.servidor = None
+        self.conexiones = set()
+    
+    async def iniciar(self, host: str = '127.0.0.1', port: int = 8000):
+        self.servidor = await asyncio.start_server(self.atender, host, port)
+        return self.servidor
+    
+    async def detener(self):
+        # Dejar de aceptar conexiones, cortar las abiertas y liberar los pools
+        if self.servidor:
+            self.servidor.close()
+        for tarea in list(self.conexiones):
+            tarea.cancel()
+        await asyncio.gather(*self.conexiones, return_exceptions=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool_pedidos.shutdown(wait=False, cancel_futures=True)
+    
+    def _con_sesion(self, funcion, *args):
+        # Corre en un hilo del pool. Sin expirar al confirmar: los objetos devueltos se
+        # serializan después del commit sin volver a consultarse.
+        session = get_session(self.engine)
+        session.expire_on_commit = False
+        try:
+            return funcion(session, *args)
+        finally:
+            session.close()
+    
+    def _ejecutar_ruta(self, session, funcion, consulta, cuerpo, grupos):
+        resultado = funcion(session, consulta, cuerpo, *grupos)
+        estado, datos = resultado if isinstance(resultado, tuple) and len(resultado) == 2 and isinstance(resultado[0], int) else (200, resultado)
+        return estado, a_json(datos)
+    
+    # ---- Pedidos por lotes ----
+    
+    async def crear_pedidos(self, cuerpo):
+        if not isinstance(cuerpo.get('items'), list):
+            raise ErrorHTTP(400, "El pedido debe incluir 'cliente_id' e 'items'")
+        solicitud = {
+            'cliente_id': int(cuerpo['cliente_id']),
+            'items': [
+                {'menu_id': int(item['menu_id']), 'cantidad': _cantidad(item['cantidad']), 'descripcion': item.get('descripcion')}
+                for item in cuerpo['items']
+            ]
+        }
+        
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendientes.append((solicitud, futuro))
+        if len(self.pendientes) >= self.maximo_lote:
+            self._despachar_lote()
+        elif self.temporizador is None:
+            self.temporizador = asyncio.get_running_loop().call_later(self.espera_lote, self._despachar_lote)
+        
+        resultado = await futuro
+        if isinstance(resultado, ValueError):
+            raise resultado
+        return 201, resultado
+    
+    def _despachar_lote(self):
+        if self.temporizador is not None:
+            self.temporizador.cancel()
+            self.temporizador = None
+        lote, self.pendientes = self.pendientes, []
+        if not lote:
+            return
+        
+        def crear(session):
+            return [
+                resultado if isinstance(resultado, ValueError) else a_json(resultado)
+                for resultado in crear_pedidos_en_lote(session, [solicitud for solicitud, _ in lote])
+            ]
+        
+        def entregar(tarea):
+            error = tarea.exception()
+            for indice, (_, futuro) in enumerate(lote):
+                if futuro.done():
+                    continue
+                if error is not None:
+                    futuro.set_exception(error)
+                else:
+                    futuro.set_result(tarea.result()[indice])
+        
+        tarea = asyncio.get_running_loop().run_in_executor(self.pool_pedidos, self._con_sesion, crear)
+        tarea.add_done_callback(entregar)
+    
+    # ---- HTTP ----
+    
+    async def resolver(self, metodo: str, objetivo: str, cuerpo_bytes: bytes):
+        partes = urlsplit(objetivo)
+        ruta_pedida = partes.path.rstrip('/') or '/'
+        consulta = parse_qs(partes.query)
+        
+        try:
+            cuerpo = json.loads(cuerpo_bytes) if cuerpo_bytes else {}
+            if not isinstance(cuerpo, dict):
+                raise ErrorHTTP(400, "El cuerpo debe ser un objeto JSON")
+            
+            if metodo == 'POST' and ruta_pedida == '/pedidos':
+                return await self.crear_pedidos(cuerpo)
+            
+            metodo_valido = False
+            for metodo_ruta, patron, funcion in RUTAS:
+                coincidencia = patron.match(ruta_pedida)
+                if not coincidencia:
+                    continue
+                if metodo_ruta != metodo:
+                    metodo_valido = True
+                    continue
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.pool, self._con_sesion, self._ejecutar_ruta,
+                    funcion, consulta, cuerpo, coincidencia.groups()
+                )
+            
+            if metodo_valido:
+                raise ErrorHTTP(405, f"Método {metodo} no permitido en {ruta_pedida}")
+            raise ErrorHTTP(404, f"Ruta no encontrada: {ruta_pedida}")
+        except ErrorHTTP as e:
+            return e.estado, {'error': str(e)}
+        except ValueError as e:
+            # Errores de validación de la capa crud (y JSON o números mal formados)
+            return 400, {'error': str(e)}
+        except (KeyError, TypeError) as e:
+            return 400, {'error': f"Cuerpo inválido: falta o sobra el campo {e}"}
+        except Exception as e:
+            traceback.print_exc()
+            return 500, {'error': str(e)}
+    
+    async def atender(self, lector, escritor):
+        # Conexiones persistentes (keep-alive) de HTTP/1.1; una solicitud a la vez por conexión
+        tarea = asyncio.current_task()
+        self.conexiones.add(tarea)
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                metodo, objetivo, version = linea.decode('latin-1').split()
+                
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    nombre, _, valor = linea.decode('latin-1').partition(':')
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                
+                largo = int(cabeceras.get('content-length', 0))
+                cuerpo = await lector.readexactly(largo) if largo else b''
+                
+                estado, datos = await self.resolver(metodo.upper(), objetivo, cuerpo)
+                contenido = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+                mantener = version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+                
+                encabezado = (
+                    f"HTTP/1.1 {estado} {ESTADOS.get(estado, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(contenido)}\r\n"
+                    + ("" if mantener else "Connection: close\r\n")
+                    + "\r\n"
+                )
+                escritor.write(encabezado.encode('latin-1') + contenido)
+                await escritor.drain()
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Cliente desconectado o solicitud mal formada
+        finally:
+            self.conexiones.discard(tarea)
+            escritor.close()
+
+async def servir(host: str, port: int, hilos: int):
+    engine = init_db()
+    servidor = Servidor(engine, hilos=hilos)
+    await servidor.iniciar(host, port)
+    print(f"Servidor escuchando en http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.detener()
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON del sistema de restaurante")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--hilos', type=int, default=8)
+    argumentos = parser.parse_args()
+    
+    try:
+        asyncio.run(servir(argumentos.host, argumentos.port, argumentos.hilos))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
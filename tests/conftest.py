@@ -0,0 +1,55 @@
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from database import init_db, get_session
+from crud.cliente_crud import crear_cliente
+from crud.ingrediente_crud import crear_ingrediente
+from crud.menu_crud import crear_menu
+
+# Pruebas de correctitud sobre SQLite en memoria; los tiempos quedan en benchmark.py.
+# Ejecutar desde la raíz del repositorio: python -m pytest
+
+@pytest.fixture
+def engine():
+    engine = init_db('sqlite://', informar=None)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session(engine):
+    session = get_session(engine)
+    yield session
+    session.close()
+
+@pytest.fixture
+def datos(session):
+    # Pan lleva 2 de harina; Torta, 1 de harina y 1 de azúcar. Stock para 10 panes.
+    harina = crear_ingrediente(session, 'Harina', 'Cereal', 20, 'g')
+    azucar = crear_ingrediente(session, 'Azúcar', 'Dulce', 20, 'g')
+    pan = crear_menu(session, 'Pan', 'Pan casero', 2.0, {harina.id: 2})
+    torta = crear_menu(session, 'Torta', 'Torta de azúcar', 5.0, {harina.id: 1, azucar.id: 1})
+    cliente = crear_cliente(session, 'Ana', 'ana@example.com')
+    return {
+        'harina': harina.id,
+        'azucar': azucar.id,
+        'pan': pan.id,
+        'torta': torta.id,
+        'cliente': cliente.id
+    }
+
+@pytest.fixture
+def contar_sentencias(engine):
+    # with contar_sentencias() as sentencias: ... -> sentencias[0] al salir del bloque
+    @contextmanager
+    def contar():
+        sentencias = [0]
+        
+        def sumar(*args):
+            sentencias[0] += 1
+        
+        event.listen(engine, 'before_cursor_execute', sumar)
+        try:
+            yield sentencias
+        finally:
+            event.remove(engine, 'before_cursor_execute', sumar)
+    return contar
\ No newline at end of file
@@ -0,0 +1,92 @@
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event, func
+from crud.estadistica_crud import menus_populares, reconstruir_ventas_diarias, uso_ingredientes, ventas_por_periodo
+from crud.pedido_crud import _consulta_filas_pedidos
+from models import Pedido, menu_ingrediente
+
+# Consultas frecuentes que no deben recorrer entera una tabla que debería usar índice
+# ni (si el orden debe venir del índice) ordenar en una tabla temporal
+
+DESDE = date.today() - timedelta(days=30)
+
+def _pagina(session, sentencia):
+    return _consulta_filas_pedidos(session).order_by(Pedido.fecha.desc(), Pedido.id.desc()).limit(200)
+
+def _por_cliente(session, sentencia):
+    return _consulta_filas_pedidos(session).filter(Pedido.cliente_id == 1).order_by(Pedido.fecha.desc(), Pedido.id.desc())
+
+# etiqueta -> (consulta, tablas que no deben recorrerse enteras, si el orden debe venir del índice)
+CONSULTAS = {
+    'listar_pedidos (página)': (_pagina, ['pedidos'], True),
+    'listar_pedidos_por_cliente': (_por_cliente, ['pedidos'], True),
+    'pedidos por menú': (
+        lambda session, sentencia: session.query(func.count(Pedido.id)).filter(Pedido.menu_id == 2),
+        ['pedidos'], False
+    ),
+    'receta de un menú': (
+        lambda session, sentencia: menu_ingrediente.select().where(menu_ingrediente.c.menu_id == 2),
+        ['menu_ingrediente'], False
+    ),
+    'menús con un ingrediente': (
+        lambda session, sentencia: menu_ingrediente.select().where(menu_ingrediente.c.ingrediente_id == 2),
+        ['menu_ingrediente'], False
+    ),
+    'uso_ingredientes': (
+        lambda session, sentencia: sentencia(uso_ingredientes),
+        ['menu_ingrediente', 'ventas_diarias'], False
+    ),
+    'ventas_por_periodo (30 días)': (
+        lambda session, sentencia: sentencia(ventas_por_periodo, 'diario', DESDE),
+        ['ventas_diarias'], False
+    ),
+    'menus_populares (30 días)': (
+        lambda session, sentencia: sentencia(menus_populares, 'ingresos', 20, DESDE),
+        ['ventas_diarias'], False
+    ),
+}
+
+def _plan(session, consulta) -> list:
+    stmt = consulta.statement if hasattr(consulta, 'statement') else consulta
+    compilado = stmt.compile(dialect=session.get_bind().dialect)
+    parametros = tuple(compilado.params[nombre] for nombre in compilado.positiontup)
+    filas = session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compilado), parametros).all()
+    return [fila[-1] for fila in filas]
+
+@pytest.fixture
+def sentencia(engine, session):
+    # Última sentencia que ejecuta una función crud que hace .all() directamente
+    def capturar_sentencia(funcion, *args):
+        capturadas = []
+        
+        def capturar(conn, cursor, sql, parametros, contexto, executemany):
+            capturadas.append(contexto.compiled.statement)
+        
+        event.listen(engine, 'before_cursor_execute', capturar)
+        try:
+            funcion(session, *args)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capturar)
+        return capturadas[-1]
+    return capturar_sentencia
+
+@pytest.mark.parametrize('etiqueta', list(CONSULTAS))
+def test_consulta_usa_indices(session, datos, sentencia, etiqueta):
+    session.execute(Pedido.__table__.insert(), [{
+        'total': 2.0,
+        'fecha': date.today() - timedelta(days=n % 90),
+        'cantidad': 1,
+        'cliente_id': datos['cliente'],
+        'menu_id': (datos['pan'], datos['torta'])[n % 2]
+    } for n in range(500)])
+    session.commit()
+    reconstruir_ventas_diarias(session)
+    
+    construir, tablas, orden_por_indice = CONSULTAS[etiqueta]
+    plan = _plan(session, construir(session, sentencia))
+    malos = [
+        paso for paso in plan
+        if (orden_por_indice and 'USE TEMP B-TREE FOR ORDER BY' in paso)
+        or any(paso == f"SCAN {tabla}" or paso.startswith(f"SCAN {tabla} ") and 'INDEX' not in paso for tabla in tablas)
+    ]
+    assert not malos, ' | '.join(plan)
\ No newline at end of file
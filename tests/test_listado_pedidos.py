@@ -0,0 +1,41 @@
+from datetime import date
+from crud.cliente_crud import crear_cliente
+from crud.pedido_crud import listar_pedidos, listar_pedidos_por_cliente, listar_pedidos_por_ids
+from models import Pedido
+
+def _sembrar_pedidos(session, datos, cantidad: int, clientes: list):
+    # Pedidos insertados directamente: el listado no depende del stock
+    menus = [datos['pan'], datos['torta']]
+    session.execute(Pedido.__table__.insert(), [{
+        'total': 2.0,
+        'fecha': date(2024, 1, 1 + n % 28),
+        'cantidad': 1,
+        'cliente_id': clientes[n % len(clientes)],
+        'menu_id': menus[n % len(menus)]
+    } for n in range(cantidad)])
+    session.commit()
+
+def test_proyeccion_no_depende_del_numero_de_filas(session, datos, contar_sentencias):
+    clientes = [datos['cliente']] + [crear_cliente(session, f"Cliente {c}", f"c{c}@example.com").id for c in range(5)]
+    
+    sentencias = []
+    for cantidad in (5, 200):
+        _sembrar_pedidos(session, datos, cantidad, clientes)
+        session.expunge_all()
+        with contar_sentencias() as contadas:
+            filas = listar_pedidos(session, proyeccion=True)
+            por_cliente = listar_pedidos_por_cliente(session, clientes[1], proyeccion=True)
+        sentencias.append(contadas[0])
+    
+    assert sentencias[0] == sentencias[1]
+    assert len(filas) == 205
+    assert {fila.cliente for fila in por_cliente} == {'Cliente 0'}
+    assert {fila.menu for fila in filas} == {'Pan', 'Torta'}
+
+def test_proyeccion_por_ids(session, datos):
+    _sembrar_pedidos(session, datos, 10, [datos['cliente']])
+    ids = [pedido_id for (pedido_id,) in session.query(Pedido.id).order_by(Pedido.id).limit(3)]
+    
+    filas = listar_pedidos_por_ids(session, ids)
+    assert sorted(fila.id for fila in filas) == ids
+    assert all(fila.cliente == 'Ana' for fila in filas)
\ No newline at end of file
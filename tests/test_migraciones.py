@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, text
+from database import Base
+from migraciones import _crear_indices
+
+def test_deduplicar_receta_conserva_la_fila_con_cantidad():
+    # Tabla de asociación de bases anteriores: sin clave primaria y con filas repetidas
+    engine = create_engine('sqlite://')
+    with engine.begin() as conexion:
+        conexion.execute(text("CREATE TABLE menu_ingrediente (menu_id INTEGER, ingrediente_id INTEGER, cantidad FLOAT)"))
+        conexion.execute(text(
+            "INSERT INTO menu_ingrediente VALUES "
+            "(1, 1, NULL), (1, 1, 3.0), (1, 1, 4.0), (1, 2, NULL), (1, 2, NULL), (2, 1, 5.0), (2, 1, NULL)"
+        ))
+    
+    # Como init_db: create_all agrega las demás tablas y las migraciones crean los índices
+    Base.metadata.create_all(engine)
+    _crear_indices(engine)
+    
+    with engine.connect() as conexion:
+        filas = conexion.execute(text("SELECT * FROM menu_ingrediente ORDER BY menu_id, ingrediente_id")).all()
+        indices = {fila[1] for fila in conexion.execute(text("PRAGMA index_list(menu_ingrediente)"))}
+    engine.dispose()
+    
+    # La primera fila con cantidad de cada par; si ninguna la tiene, una sola con NULL
+    assert [tuple(fila) for fila in filas] == [(1, 1, 3.0), (1, 2, None), (2, 1, 5.0)]
+    assert 'ux_menu_ingrediente' in indices
\ No newline at end of file
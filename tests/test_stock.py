@@ -0,0 +1,51 @@
+import pytest
+from crud.pedido_crud import crear_pedido, crear_pedidos, eliminar_pedido
+from models import Ingrediente, Pedido, VentaDiaria
+
+def _stock(session, ingrediente_id: int) -> float:
+    session.expire_all()
+    return session.get(Ingrediente, ingrediente_id).cantidad
+
+@pytest.mark.parametrize('cantidad', [-1, 0, 1.5, '2', True, None])
+def test_cantidad_invalida_no_toca_el_stock(session, datos, cantidad):
+    with pytest.raises(ValueError):
+        crear_pedidos(session, datos['cliente'], [
+            {'menu_id': datos['torta'], 'cantidad': 1},
+            {'menu_id': datos['pan'], 'cantidad': cantidad}
+        ])
+    
+    assert _stock(session, datos['harina']) == 20
+    assert _stock(session, datos['azucar']) == 20
+    assert session.query(Pedido).count() == 0
+    assert session.query(VentaDiaria).count() == 0
+
+def test_stock_insuficiente_rechaza_todo_el_carrito(session, datos):
+    with pytest.raises(ValueError):
+        crear_pedidos(session, datos['cliente'], [
+            {'menu_id': datos['torta'], 'cantidad': 5},
+            {'menu_id': datos['pan'], 'cantidad': 8}
+        ])
+    
+    assert _stock(session, datos['harina']) == 20
+    assert session.query(Pedido).count() == 0
+
+def test_el_stock_nunca_queda_negativo(session, datos):
+    # Stock para 10 panes: de 15 pedidos de uno, 5 se rechazan
+    aceptados = rechazados = 0
+    for _ in range(15):
+        try:
+            crear_pedido(session, datos['cliente'], datos['pan'], 1)
+            aceptados += 1
+        except ValueError:
+            rechazados += 1
+    
+    assert (aceptados, rechazados) == (10, 5)
+    assert _stock(session, datos['harina']) == 0
+    assert session.query(Pedido).count() == 10
+
+def test_eliminar_pedido_repone_el_stock(session, datos):
+    pedido = crear_pedido(session, datos['cliente'], datos['torta'], 3)
+    assert (_stock(session, datos['harina']), _stock(session, datos['azucar'])) == (17, 17)
+    
+    assert eliminar_pedido(session, pedido.id)
+    assert (_stock(session, datos['harina']), _stock(session, datos['azucar'])) == (20, 20)
\ No newline at end of file
@@ -0,0 +1,50 @@
+import pytest
+from crud.cliente_crud import actualizar_cliente, crear_cliente, crear_o_actualizar_cliente
+from crud.ingrediente_crud import actualizar_ingrediente, crear_ingrediente, crear_o_actualizar_ingrediente
+from crud.menu_crud import actualizar_menu, crear_menu, crear_o_actualizar_menu
+from models import Cliente, Ingrediente, Menu
+
+def test_crear_cliente_rechaza_email_repetido(session, datos):
+    with pytest.raises(ValueError, match='ana@example.com'):
+        crear_cliente(session, 'Otra Ana', 'ana@example.com')
+    
+    # La sesión sigue usable después del rechazo
+    crear_cliente(session, 'Beto', 'beto@example.com')
+    assert session.query(Cliente).filter_by(email='ana@example.com').count() == 1
+    assert session.query(Cliente).count() == 2
+
+def test_actualizar_cliente_rechaza_email_de_otro(session, datos):
+    beto = crear_cliente(session, 'Beto', 'beto@example.com')
+    with pytest.raises(ValueError, match='Ya existe'):
+        actualizar_cliente(session, beto.id, email='ana@example.com')
+    
+    session.expire_all()
+    assert session.get(Cliente, beto.id).email == 'beto@example.com'
+
+def test_crear_o_actualizar_cliente(session, datos):
+    ana = crear_o_actualizar_cliente(session, 'Ana María', 'ana@example.com')
+    nuevo = crear_o_actualizar_cliente(session, 'Beto', 'beto@example.com')
+    
+    assert ana.id == datos['cliente'] and ana.nombre == 'Ana María'
+    assert nuevo.id != ana.id
+    assert session.query(Cliente).count() == 2
+
+def test_ingredientes_por_nombre(session, datos):
+    with pytest.raises(ValueError, match='Ya existe'):
+        crear_ingrediente(session, 'Harina', 'Cereal', 5, 'g')
+    with pytest.raises(ValueError, match='Ya existe'):
+        actualizar_ingrediente(session, datos['azucar'], nombre='Harina')
+    
+    harina = crear_o_actualizar_ingrediente(session, 'Harina', 'Cereal', 50, 'g')
+    assert harina.id == datos['harina'] and harina.cantidad == 50
+    assert session.query(Ingrediente).count() == 2
+
+def test_menus_por_nombre(session, datos):
+    with pytest.raises(ValueError, match='Ya existe'):
+        crear_menu(session, 'Pan', 'Otro pan', 3.0, {datos['harina']: 1})
+    with pytest.raises(ValueError, match='Ya existe'):
+        actualizar_menu(session, datos['torta'], nombre='Pan')
+    
+    pan = crear_o_actualizar_menu(session, 'Pan', 'Pan integral', 2.5, {datos['azucar']: 1})
+    assert pan.id == datos['pan'] and pan.precio == 2.5
+    assert session.query(Menu).count() == 2
\ No newline at end of file
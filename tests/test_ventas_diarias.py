@@ -0,0 +1,67 @@
+from sqlalchemy import event, func
+from crud.estadistica_crud import reconstruir_ventas_diarias
+from crud.pedido_crud import crear_pedido, crear_pedidos, eliminar_pedido
+from database import get_session
+from models import Pedido, ReconstruccionVentas, VentaDiaria
+
+def _resumen(session):
+    session.expire_all()
+    return {
+        (fila.fecha, fila.menu_id): (fila.pedidos, fila.unidades, fila.ingresos)
+        for fila in session.query(VentaDiaria).all()
+    }
+
+def _esperado(session):
+    # El mismo resumen calculado directamente desde los pedidos
+    filas = session.query(
+        Pedido.fecha, Pedido.menu_id, func.count(Pedido.id), func.sum(Pedido.cantidad), func.sum(Pedido.total)
+    ).group_by(Pedido.fecha, Pedido.menu_id).all()
+    return {(fecha, menu_id): (n, unidades, ingresos) for fecha, menu_id, n, unidades, ingresos in filas}
+
+def test_eliminar_pedido_resta_del_resumen(session, datos):
+    pedidos = crear_pedidos(session, datos['cliente'], [
+        {'menu_id': datos['pan'], 'cantidad': 2},
+        {'menu_id': datos['pan'], 'cantidad': 1},
+        {'menu_id': datos['torta'], 'cantidad': 3}
+    ])
+    assert _resumen(session) == _esperado(session)
+    
+    eliminar_pedido(session, pedidos[0].id)
+    assert _resumen(session) == _esperado(session)
+    
+    # Al quedar sin pedidos, la fila del menú desaparece del resumen
+    eliminar_pedido(session, pedidos[2].id)
+    assert _resumen(session) == _esperado(session)
+    assert all(menu_id != datos['torta'] for _, menu_id in _resumen(session))
+
+def test_eliminar_pedido_no_borra_otras_filas_vacias(session, datos):
+    pedido = crear_pedido(session, datos['cliente'], datos['pan'], 1)
+    otra = VentaDiaria(fecha=pedido.fecha.replace(year=2000), menu_id=datos['torta'], pedidos=0, unidades=0, ingresos=0.0)
+    session.add(otra)
+    session.commit()
+    
+    eliminar_pedido(session, pedido.id)
+    assert list(_resumen(session)) == [(otra.fecha, datos['torta'])]
+
+def test_eliminar_durante_reconstruccion(engine, session, datos):
+    # Pedidos eliminados entre los lotes de la reconstrucción, antes y después de que
+    # el lote los sume: el resumen final debe coincidir con los pedidos que quedan
+    ids = [crear_pedido(session, datos['cliente'], datos['pan'], 1).id for _ in range(9)]
+    otra = get_session(engine)
+    por_eliminar = iter([ids[7], ids[0], ids[5], ids[2]])
+    
+    def eliminar_siguiente(sesion):
+        pedido_id = next(por_eliminar, None)
+        if pedido_id is not None:
+            eliminar_pedido(otra, pedido_id)
+    
+    event.listen(session, 'after_commit', eliminar_siguiente)
+    try:
+        reconstruir_ventas_diarias(session, lote=2)
+    finally:
+        event.remove(session, 'after_commit', eliminar_siguiente)
+        otra.close()
+    
+    assert _resumen(session) == _esperado(session)
+    assert session.query(Pedido).count() == 5
+    assert session.query(ReconstruccionVentas).count() == 0
\ No newline at end of file